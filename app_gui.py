@@ -5,8 +5,8 @@ Features: Video preview, trimming, audio mixing, font customization, real-time p
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import subprocess
 import threading
+import queue
 from pathlib import Path
 import os
 import sys
@@ -14,22 +14,49 @@ import json
 import tempfile
 import shutil
 from datetime import timedelta
-import cv2
-import numpy as np
-from PIL import Image, ImageTk, ImageFont, ImageDraw
-import pygame
+import importlib.util
 import time
+import io
+
+from dataclasses import asdict
+from src.video_cli.audio_playback import AudioClock, PygameSink
+from src.video_cli.catalog import MediaCatalog
+from src.video_cli.export_queue import DONE, FAILED, QUEUED, RUNNING, ExportQueue
+from src.video_cli.playback import (
+    FFmpegFrameReader, FrameCache, KeyframeSeeker, PlaybackClock, SequentialDecoder, fit_size
+)
+from src.video_cli.proxy import ProxyManager
+from src.video_cli.pipeline import probe_media, probe_duration, probe_keyframes, probe_loudness
+from src.video_cli.project import PROJECT_SUFFIX, Project, collect_media, restore_media, stored_durations
+from src.video_cli.startup import StartupTimer
+from src.video_cli.timeline import TimelineAnalyzer
+
+# cv2, NumPy, Pillow and pygame (and the modules built on them: overlay, mixer,
+# waveform) are imported where they are first used, so the window opens without them.
+
+
+# Timeline geometry
+TIMELINE_PX_PER_SECOND = 2
+TIMELINE_MIN_BLOCK = 100
+TIMELINE_THUMB_HEIGHT = 40
+TIMELINE_THUMB_SLOT = 72
+TIMELINE_MAX_THUMBS = 24
+WAVEFORM_ROW_HEIGHT = 36
+
+# Per-track mix settings kept on audio track dicts and saved in projects
+TRACK_MIX_KEYS = ("gain", "mute", "offset", "fade_in", "fade_out")
+WINDOW_TITLE = "Advanced Video Editor - Preview, Trim & Mix"
 
 
 class VideoEditorGUI:
     def __init__(self, root):
         self.root = root
-        self.root.title("Advanced Video Editor - Preview, Trim & Mix")
+        self.root.title(WINDOW_TITLE)
         self.root.geometry("1200x900")
         self.root.minsize(1000, 700)
         
-        # Initialize pygame for audio
-        pygame.mixer.init()
+        # pygame's mixer is opened on first playback (init_audio_output)
+        self.audio_output_ready = False
         
         # Video and audio state
         self.video_files = []  # All loaded videos
@@ -41,11 +68,38 @@ class VideoEditorGUI:
         self.fps = 30
         self.current_frame = 0
         self.is_playing = False
+        self.decoder = None  # Background sequential decoder while playing
+        self.playback_clock = PlaybackClock(self.fps)
+        self.preview_size = (640, 360)  # Canvas size, readable from worker threads
+        self.video_size = (0, 0)  # Source resolution of the loaded video
+        self.resize_restart_pending = False
+        self.seeker = None  # Keyframe-aware random access on video_cap
+        self.frame_cache = FrameCache(max_bytes=256 * 1024 * 1024)  # Scaled frames for scrubbing
+        self.scrubbing = False
+        self.scrub_target = None
         self.temp_dir = Path(tempfile.mkdtemp())
+        self.project_path = None  # Project file being edited, once saved or opened
+        
+        # Shared media catalog (probe data, loudness, thumbnails)
+        self.catalog = MediaCatalog()
+        
+        # Persistent export queue; jobs left over from the last session resume
+        self.export_queue = ExportQueue(catalog=self.catalog)
+        self.media_durations = {}  # Path -> seconds, filled by background indexing
+        self.proxies = ProxyManager(catalog=self.catalog)  # Low-res preview copies of heavy clips
+        self.preview_source = None  # File decoded for preview: a proxy or the original
+        self.timeline_analyzer = TimelineAnalyzer(self.catalog, filmstrip_count=self.timeline_thumb_count,
+                                                  source_for=self.proxies.proxy_for)
+        self.timeline_thumbs = {}  # (Path, slot) -> (slot count, decoded PIL image)
+        self.timeline_photos = []  # Keeps PhotoImages drawn on the timeline alive
+        self.timeline_blocks = []  # (x_start, x_end, duration) per timeline video
         
         # Audio state
-        self.audio_tracks = []
+        self.audio_tracks = []  # {"path", "type", "name", "mix": MixTrack} per loaded track
         self.current_audio = None
+        self.loading_track_controls = False
+        self.waveforms = {}  # Path -> PeakPyramid, or None for files without audio
+        self.waveform_redraw_pending = False
         
         # Subtitle state
         self.subtitle_files = []
@@ -57,10 +111,12 @@ class VideoEditorGUI:
         self.font_size = 24
         self.font_color = "#FFFFFF"
         self.subtitle_text = ""
+        self.subtitle_sprites = None  # SpriteCache of rendered subtitle images, created on first use
         
-        # Trim state
+        # Trim state: the current clip's range, and every trimmed clip by path
         self.trim_start = 0
         self.trim_end = 0
+        self.clip_trims = {}  # Path -> (start, end) seconds; untrimmed clips have no entry
         
         # Configure style
         style = ttk.Style()
@@ -71,16 +127,35 @@ class VideoEditorGUI:
         
         # Create UI
         self.create_widgets()
+        self.refresh_export_queue()
+        self.export_queue.start()
         
         # Bind cleanup
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
+        # Stream background timeline analysis into the canvas
+        self.root.after(100, self.poll_timeline_events)
+        self.root.after(200, self.poll_export_events)
+        
     def setup_variables(self):
         """Initialize all tkinter variables"""
         self.video_position = tk.DoubleVar()
         self.audio_volume = tk.DoubleVar(value=0.5)
         self.bgm_volume = tk.DoubleVar(value=0.3)
+        # Mix settings of the track selected in the audio list
+        self.track_gain = tk.DoubleVar(value=1.0)
+        self.track_mute = tk.BooleanVar(value=False)
+        self.track_offset = tk.DoubleVar(value=0.0)
+        self.track_fade_in = tk.DoubleVar(value=0.0)
+        self.track_fade_out = tk.DoubleVar(value=0.0)
+        for var in (self.track_gain, self.track_mute, self.track_offset, self.track_fade_in, self.track_fade_out):
+            var.trace_add("write", self.on_track_control_change)
         self.preview_subtitle = tk.BooleanVar(value=True)
+        self.show_av_debug = tk.BooleanVar(value=False)
+        self.use_proxies = tk.BooleanVar(value=True)
+        self.export_priority = tk.IntVar(value=0)
+        self.export_concurrency = tk.IntVar(value=2)
+        self.waveform_zoom = tk.DoubleVar(value=10.0)  # Seconds shown in the waveform view
         self.subtitle_position_y = tk.DoubleVar(value=0.85)
         
     def create_widgets(self):
@@ -147,6 +222,10 @@ class VideoEditorGUI:
                   command=self.remove_from_timeline).grid(row=0, column=0, sticky=(tk.W, tk.E), padx=(0, 2))
         ttk.Button(timeline_controls, text="Move Up", 
                   command=self.move_up_timeline).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(2, 0))
+        ttk.Button(timeline_controls, text="Open Project", 
+                  command=self.open_project).grid(row=1, column=0, sticky=(tk.W, tk.E), padx=(0, 2), pady=(2, 0))
+        ttk.Button(timeline_controls, text="Save Project", 
+                  command=self.save_project).grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(2, 0), pady=(2, 0))
         
         # Playback Controls
         playback_frame = ttk.LabelFrame(parent, text="Playback Controls", padding="10")
@@ -166,11 +245,17 @@ class VideoEditorGUI:
         # Position slider
         ttk.Label(playback_frame, text="Position:").grid(row=1, column=0, sticky=tk.W)
         self.position_scale = ttk.Scale(playback_frame, from_=0, to=100, 
-                                       variable=self.video_position, orient=tk.HORIZONTAL)
+                                       variable=self.video_position, orient=tk.HORIZONTAL,
+                                       command=self.on_scrub)
         self.position_scale.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(5, 0))
         self.position_scale.bind('<Button-1>', self.on_seek_start)
         self.position_scale.bind('<ButtonRelease-1>', self.on_seek_end)
         
+        ttk.Checkbutton(playback_frame, text="Show A/V sync debug",
+                       variable=self.show_av_debug).grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+        ttk.Checkbutton(playback_frame, text="Preview with proxies", variable=self.use_proxies,
+                       command=self.switch_preview_source).grid(row=3, column=0, columnspan=2, sticky=tk.W)
+        
         # Trim Controls
         trim_frame = ttk.LabelFrame(parent, text="Trim Settings", padding="10")
         trim_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -202,6 +287,7 @@ class VideoEditorGUI:
         # Canvas for video
         self.video_canvas = tk.Canvas(video_frame, bg='black', width=640, height=360)
         self.video_canvas.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.video_canvas.bind('<Configure>', self.on_video_canvas_resize)
         
         # Video info
         info_frame = ttk.Frame(video_frame)
@@ -232,6 +318,19 @@ class VideoEditorGUI:
         # Audio list
         self.audio_listbox = tk.Listbox(audio_frame, height=3)
         self.audio_listbox.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        self.audio_listbox.bind('<<ListboxSelect>>', self.on_audio_track_select)
+        
+        # Waveforms of the clip audio and loaded tracks around the playhead
+        self.waveform_canvas = tk.Canvas(audio_frame, height=WAVEFORM_ROW_HEIGHT * 3, bg='black')
+        self.waveform_canvas.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        self.waveform_canvas.bind('<Configure>', lambda e: self.schedule_waveform_redraw())
+        
+        zoom_frame = ttk.Frame(audio_frame)
+        zoom_frame.grid(row=4, column=0, sticky=(tk.W, tk.E))
+        zoom_frame.columnconfigure(1, weight=1)
+        ttk.Label(zoom_frame, text="Zoom:").grid(row=0, column=0, sticky=tk.W)
+        ttk.Scale(zoom_frame, from_=1.0, to=600.0, variable=self.waveform_zoom, orient=tk.HORIZONTAL,
+                  command=lambda v: self.schedule_waveform_redraw()).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(5, 0))
         
         # Volume Controls
         volume_frame = ttk.LabelFrame(parent, text="Volume Controls", padding="10")
@@ -245,6 +344,21 @@ class VideoEditorGUI:
         ttk.Label(volume_frame, text="BGM:").grid(row=1, column=0, sticky=tk.W)
         bgm_scale = ttk.Scale(volume_frame, from_=0.0, to=1.0, variable=self.bgm_volume, orient=tk.HORIZONTAL)
         bgm_scale.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(5, 0))
+        audio_scale.config(command=lambda v: self.sync_mix_tracks())
+        bgm_scale.config(command=lambda v: self.sync_mix_tracks())
+        
+        # Selected track: heard live in the preview mix and applied at export
+        ttk.Label(volume_frame, text="Track gain:").grid(row=2, column=0, sticky=tk.W, pady=(5, 0))
+        ttk.Scale(volume_frame, from_=0.0, to=2.0, variable=self.track_gain,
+                  orient=tk.HORIZONTAL).grid(row=2, column=1, sticky=(tk.W, tk.E), padx=(5, 0), pady=(5, 0))
+        ttk.Checkbutton(volume_frame, text="Mute", variable=self.track_mute).grid(row=3, column=0, sticky=tk.W)
+        track_frame = ttk.Frame(volume_frame)
+        track_frame.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        for column, (label, var) in enumerate((("Offset", self.track_offset), ("Fade in", self.track_fade_in),
+                                               ("Fade out", self.track_fade_out))):
+            ttk.Label(track_frame, text=f"{label}:").grid(row=0, column=column * 2, sticky=tk.W)
+            ttk.Spinbox(track_frame, from_=-3600 if var is self.track_offset else 0, to=3600, increment=0.5,
+                        textvariable=var, width=5).grid(row=0, column=column * 2 + 1, sticky=tk.W, padx=(2, 6))
         
         # Font and Subtitle Controls
         font_frame = ttk.LabelFrame(parent, text="Subtitle & Font", padding="10")
@@ -350,9 +464,34 @@ class VideoEditorGUI:
         ttk.Checkbutton(options_frame, text="Include Audio Mix", 
                        variable=self.include_audio_mix).grid(row=1, column=0, sticky=tk.W)
         
-        # Progress
-        self.progress = ttk.Progressbar(export_frame, mode='indeterminate')
-        self.progress.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+        ttk.Label(options_frame, text="Priority:").grid(row=2, column=0, sticky=tk.W)
+        ttk.Spinbox(options_frame, from_=-9, to=9, textvariable=self.export_priority,
+                    width=4).grid(row=2, column=1, sticky=tk.W, padx=(5, 0))
+        ttk.Label(options_frame, text="Parallel jobs:").grid(row=3, column=0, sticky=tk.W)
+        ttk.Spinbox(options_frame, from_=1, to=os.cpu_count() or 4, textvariable=self.export_concurrency, width=4,
+                    command=self.on_export_concurrency_change).grid(row=3, column=1, sticky=tk.W, padx=(5, 0))
+        
+        # Export queue with per-job status and progress
+        self.export_tree = ttk.Treeview(export_frame, columns=("priority", "status", "progress"), height=5)
+        self.export_tree.heading("#0", text="Job")
+        self.export_tree.heading("priority", text="Pri")
+        self.export_tree.heading("status", text="Status")
+        self.export_tree.heading("progress", text="Progress")
+        self.export_tree.column("#0", width=140)
+        self.export_tree.column("priority", width=30, anchor=tk.CENTER)
+        self.export_tree.column("status", width=80)
+        self.export_tree.column("progress", width=150)
+        self.export_tree.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+        
+        queue_buttons = ttk.Frame(export_frame)
+        queue_buttons.grid(row=4, column=0, sticky=(tk.W, tk.E), pady=(2, 0))
+        ttk.Button(queue_buttons, text="Cancel", command=self.cancel_export_job).pack(side=tk.LEFT)
+        ttk.Button(queue_buttons, text="Retry", command=self.retry_export_job).pack(side=tk.LEFT, padx=2)
+        ttk.Button(queue_buttons, text="Remove", command=self.remove_export_job).pack(side=tk.LEFT)
+        ttk.Button(queue_buttons, text="▲", width=2,
+                   command=lambda: self.change_export_priority(1)).pack(side=tk.LEFT, padx=(6, 0))
+        ttk.Button(queue_buttons, text="▼", width=2,
+                   command=lambda: self.change_export_priority(-1)).pack(side=tk.LEFT)
         
         parent.columnconfigure(0, weight=2)
         parent.columnconfigure(1, weight=1)
@@ -379,8 +518,10 @@ class VideoEditorGUI:
             for i, video in enumerate(self.timeline_videos):
                 self.video_listbox.insert(tk.END, f"{i+1}. {video.name}")
             
-            # Update timeline visual
+            # Update timeline visual; real durations and filmstrips stream in
             self.update_timeline_display()
+            self.timeline_analyzer.submit(new_videos)
+            self.proxies.submit(new_videos)
             
             # Load first video for preview
             if self.timeline_videos:
@@ -399,19 +540,29 @@ class VideoEditorGUI:
     def load_video(self, video_path):
         """Load a single video for preview"""
         try:
+            self.stop_decoder()
             if self.video_cap:
                 self.video_cap.release()
             
             self.current_video = video_path
-            self.video_cap = cv2.VideoCapture(str(video_path))
+            self.preview_source = self.preview_source_for(video_path)
+            import cv2
+            self.video_cap = cv2.VideoCapture(str(self.preview_source))
+            self.frame_cache.clear()
             
             if not self.video_cap.isOpened():
                 messagebox.showerror("Error", f"Could not open video: {video_path.name}")
                 return
             
+            self.seeker = KeyframeSeeker(self.video_cap)
+            
             self.total_frames = int(self.video_cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.video_size = (int(self.video_cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                               int(self.video_cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
             self.fps = self.video_cap.get(cv2.CAP_PROP_FPS) or 30
+            self.playback_clock = PlaybackClock(self.fps)
             duration = self.total_frames / self.fps
+            self.load_keyframe_index(self.preview_source)
             
             # Update UI
             self.video_info_label.config(text=f"Video: {video_path.name}")
@@ -419,61 +570,176 @@ class VideoEditorGUI:
             self.position_scale.config(to=self.total_frames-1)
             self.video_position.set(0)
             
-            # Set trim end to video duration
-            self.trim_end = duration
-            self.trim_end_var.set(self.format_time(duration))
+            # Restore this clip's trim range, or the whole clip
+            self.trim_start, self.trim_end = self.clip_trims.get(video_path, (0, duration))
+            self.trim_start_var.set(self.format_time(self.trim_start))
+            self.trim_end_var.set(self.format_time(self.trim_end))
             
             # Show first frame
             self.show_frame(0)
+            if self.is_playing:
+                self.start_decoder(1)
+            self.load_waveforms([video_path])
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load video: {str(e)}")
     
+    def load_keyframe_index(self, source):
+        """Build (or fetch from the catalog) the keyframe index in the background"""
+        def worker():
+            try:
+                keyframe_times = probe_keyframes(source, self.catalog)
+            except Exception as e:
+                print(f"Error indexing keyframes for {source}: {e}")
+                return
+            self.root.after(0, lambda: self.apply_keyframe_index(source, keyframe_times))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def apply_keyframe_index(self, source, keyframe_times):
+        """Hand keyframe positions to the seeker if the file is still being previewed"""
+        if self.seeker and source == self.preview_source and keyframe_times:
+            # Packet timestamps may not start at zero (e.g. MPEG-TS)
+            origin = keyframe_times[0]
+            self.seeker.set_keyframes(int(round((t - origin) * self.fps)) for t in keyframe_times)
+    
+    def preview_source_for(self, video_path):
+        """Proxy of a clip when one is ready and proxies are enabled, else the original"""
+        if self.use_proxies.get():
+            return self.proxies.proxy_for(video_path) or video_path
+        return video_path
+    
+    def switch_preview_source(self):
+        """Swap the preview between proxy and original at the current frame"""
+        if not self.current_video or not self.video_cap:
+            return
+        source = self.preview_source_for(self.current_video)
+        if source == self.preview_source:
+            return
+        import cv2
+        capture = cv2.VideoCapture(str(source))
+        if not capture.isOpened():
+            return
+        
+        was_decoding = self.decoder is not None
+        self.stop_decoder()
+        self.video_cap.release()
+        self.video_cap = capture
+        self.preview_source = source
+        self.seeker = KeyframeSeeker(capture)
+        self.video_size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.frame_cache.clear()
+        self.load_keyframe_index(source)
+        
+        self.show_frame(self.current_frame)
+        if was_decoding and self.is_playing:
+            self.start_decoder(self.current_frame + 1)
+    
+    def on_video_canvas_resize(self, event):
+        """Remember the canvas size for frame scaling on the decoder thread"""
+        if (event.width, event.height) != self.preview_size:
+            self.frame_cache.clear()
+            # The FFmpeg pipe decodes at a fixed size, restart it once resizing settles
+            if self.decoder and not self.resize_restart_pending:
+                self.resize_restart_pending = True
+                self.root.after(200, self.restart_decoder_after_resize)
+        self.preview_size = (event.width, event.height)
+    
+    def restart_decoder_after_resize(self):
+        """Restart playback decoding at the new canvas size"""
+        self.resize_restart_pending = False
+        if self.decoder and self.is_playing:
+            self.start_decoder(self.current_frame + 1)
+    
+    def prepare_frame(self, frame):
+        """Convert a BGR frame to RGB scaled to fit the preview canvas"""
+        canvas_width, canvas_height = self.preview_size
+        if canvas_width <= 1 or canvas_height <= 1:
+            return None
+        
+        import cv2
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        
+        # Calculate scaling
+        h, w = frame_rgb.shape[:2]
+        scale = min(canvas_width/w, canvas_height/h)
+        new_w, new_h = int(w*scale), int(h*scale)
+        
+        # Resize frame
+        return cv2.resize(frame_rgb, (new_w, new_h))
+    
     def show_frame(self, frame_number):
-        """Display a specific frame"""
+        """Seek to and display a specific frame"""
         if not self.video_cap:
             return
         
-        self.video_cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-        ret, frame = self.video_cap.read()
-        
-        if ret:
-            # Resize frame to fit canvas
-            canvas_width = self.video_canvas.winfo_width()
-            canvas_height = self.video_canvas.winfo_height()
+        frame_resized = self.frame_cache.get(frame_number)
+        if frame_resized is None:
+            # Decode from the nearest keyframe, caching frames passed on the way
+            def cache_frame(index, frame):
+                self.frame_cache.put(index, self.prepare_frame(frame))
             
-            if canvas_width > 1 and canvas_height > 1:
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                # Calculate scaling
-                h, w = frame_rgb.shape[:2]
-                scale = min(canvas_width/w, canvas_height/h)
-                new_w, new_h = int(w*scale), int(h*scale)
-                
-                # Resize frame
-                frame_resized = cv2.resize(frame_rgb, (new_w, new_h))
-                
-                # Add subtitle if enabled
-                if self.preview_subtitle.get() and self.subtitle_entry.get(1.0, tk.END).strip():
-                    frame_resized = self.add_subtitle_to_frame(frame_resized)
-                
-                # Convert to PhotoImage
-                image = Image.fromarray(frame_resized)
-                self.photo = ImageTk.PhotoImage(image)
-                
-                # Center on canvas
-                x = (canvas_width - new_w) // 2
-                y = (canvas_height - new_h) // 2
-                
-                self.video_canvas.delete("all")
-                self.video_canvas.create_image(x, y, anchor=tk.NW, image=self.photo)
+            ret, frame = self.seeker.read(frame_number, on_frame=cache_frame)
+            frame_resized = self.prepare_frame(frame) if ret else None
+            if frame_resized is not None:
+                self.frame_cache.put(frame_number, frame_resized)
+        
+        self.display_frame(frame_number, frame_resized)
         
-        # Update current frame and time
+        # An explicit seek restarts sequential decoding from the new position
+        if self.decoder:
+            self.decoder.seek(frame_number + 1)
+            self.playback_clock.start(frame_number)
+    
+    def display_frame(self, frame_number, frame_resized):
+        """Draw an already scaled RGB frame and update position info"""
+        # Update current frame first so subtitles are looked up for this frame
         self.current_frame = frame_number
+        
+        if frame_resized is not None:
+            canvas_width, canvas_height = self.preview_size
+            new_h, new_w = frame_resized.shape[:2]
+            
+            # Add subtitle if enabled
+            if self.preview_subtitle.get() and self.subtitle_entry.get(1.0, tk.END).strip():
+                frame_resized = self.add_subtitle_to_frame(frame_resized)
+            
+            # Convert to PhotoImage
+            from PIL import Image, ImageTk
+            image = Image.fromarray(frame_resized)
+            self.photo = ImageTk.PhotoImage(image)
+            
+            # Center on canvas
+            x = (canvas_width - new_w) // 2
+            y = (canvas_height - new_h) // 2
+            
+            self.video_canvas.delete("all")
+            self.video_canvas.create_image(x, y, anchor=tk.NW, image=self.photo)
+            
+            if self.show_av_debug.get() and self.decoder:
+                self.draw_av_debug(frame_number)
+        
+        # Update time
         current_time = frame_number / self.fps
         total_time = self.total_frames / self.fps
         self.time_label.config(text=f"{self.format_time(current_time)} / {self.format_time(total_time)}")
         self.video_position.set(frame_number)
+        self.schedule_waveform_redraw()
+    
+    def draw_av_debug(self, frame_number):
+        """Overlay A/V sync, clock drift, output latency and dropped frames"""
+        clock = self.playback_clock
+        sync_ms = (frame_number / self.fps - clock.position()) * 1000
+        lines = [f"A/V sync: {sync_ms:+.0f} ms"]
+        if isinstance(clock, AudioClock):
+            lines.append(f"Clock drift: {clock.drift() * 1000:+.0f} ms")
+            lines.append(f"Audio latency: {clock.latency * 1000:.0f} ms")
+        else:
+            lines.append("Clock: wall (no audio)")
+        lines.append(f"Dropped frames: {self.decoder.buffer.dropped}")
+        self.video_canvas.create_text(10, 10, anchor=tk.NW, text="\n".join(lines),
+                                      fill="yellow", font=("Courier", 9))
     
     def add_subtitle_to_frame(self, frame):
         """Add subtitle text to frame"""
@@ -489,41 +755,25 @@ class VideoEditorGUI:
             if not subtitle_text:
                 return frame
             
-            # Convert to PIL Image
-            pil_image = Image.fromarray(frame)
-            draw = ImageDraw.Draw(pil_image)
-            
-            # Load font
-            try:
-                if self.font_file and Path(self.font_file).exists():
-                    font = ImageFont.truetype(self.font_file, self.font_size_var.get())
-                else:
-                    font = ImageFont.load_default()
-            except:
-                font = ImageFont.load_default()
-            
-            # Calculate position
-            text_bbox = draw.textbbox((0, 0), subtitle_text, font=font)
-            text_width = text_bbox[2] - text_bbox[0]
-            text_height = text_bbox[3] - text_bbox[1]
-            
-            x = (pil_image.width - text_width) // 2
-            y = int(pil_image.height * self.subtitle_position_y.get()) - text_height // 2
-            
-            # Draw text with outline
+            from src.video_cli.overlay import SpriteCache, SubtitleStyle, blend_sprite
+            if self.subtitle_sprites is None:
+                self.subtitle_sprites = SpriteCache()
             color = self.font_color_var.get()
-            outline_color = "#000000" if color != "#000000" else "#FFFFFF"
-            
-            # Draw outline
-            for dx in [-1, 0, 1]:
-                for dy in [-1, 0, 1]:
-                    if dx != 0 or dy != 0:
-                        draw.text((x+dx, y+dy), subtitle_text, font=font, fill=outline_color)
+            style = SubtitleStyle(
+                font_file=self.font_file,
+                font_size=self.font_size_var.get(),
+                color=color,
+                outline_color="#000000" if color != "#000000" else "#FFFFFF",
+            )
+            sprite = self.subtitle_sprites.get(subtitle_text, style)
             
-            # Draw main text
-            draw.text((x, y), subtitle_text, font=font, fill=color)
+            # Calculate position
+            h, w = frame.shape[:2]
+            x = (w - sprite.width) // 2
+            y = int(h * self.subtitle_position_y.get()) - sprite.height // 2
             
-            return np.array(pil_image)
+            # Blend onto a copy; the source frame may be shared with the frame cache
+            return blend_sprite(frame.copy(), sprite, x, y)
             
         except Exception as e:
             print(f"Error adding subtitle: {e}")
@@ -549,22 +799,113 @@ class VideoEditorGUI:
         self.play_button.config(text="⏸" if self.is_playing else "▶")
         
         if self.is_playing:
+            self.start_decoder(self.current_frame + 1)
             self.play_video()
+        else:
+            self.stop_decoder()
+    
+    def start_decoder(self, frame_number):
+        """Start sequential background decoding from frame_number"""
+        self.stop_decoder()
+        video_path = str(self.preview_source or self.current_video)
+        capacity = max(4, int(self.fps // 2))
+        if shutil.which("ffmpeg") and all(self.video_size) and min(self.preview_size) > 1:
+            # Let FFmpeg scale to canvas size and convert to RGB before frames reach Python
+            size = fit_size(*self.video_size, *self.preview_size)
+            fps = self.fps
+            self.decoder = SequentialDecoder(
+                lambda: FFmpegFrameReader(video_path, size, fps, buffers=capacity + 4),
+                start_frame=frame_number,
+                capacity=capacity,
+            ).start()
+        else:
+            import cv2
+            self.decoder = SequentialDecoder(
+                lambda: cv2.VideoCapture(video_path),
+                start_frame=frame_number,
+                transform=self.prepare_frame,
+                capacity=capacity,
+            ).start()
+        self.playback_clock = self.create_playback_clock()
+        self.playback_clock.start(frame_number)
+    
+    def create_playback_clock(self):
+        """Use the audio output as master clock, or wall time without audio"""
+        try:
+            self.init_audio_output()
+            return AudioClock(self.fps, self.open_preview_audio, PygameSink(buffer_samples=1024))
+        except Exception as e:
+            print(f"Audio preview unavailable, using wall clock: {e}")
+            return PlaybackClock(self.fps)
+    
+    def init_audio_output(self):
+        """Open pygame's mixer on first playback; the preview streams 16-bit stereo PCM"""
+        if not self.audio_output_ready:
+            import pygame
+            pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=1024)
+            self.audio_output_ready = True
+    
+    def open_preview_audio(self, seconds):
+        """Start mixing clip audio and loaded tracks at a clip position (feeder thread)"""
+        if not shutil.which("ffmpeg"):
+            return None
+        from src.video_cli.mixer import MixerStream, MixTrack
+        # Mixer time is timeline time; the clip starts after the clips before it
+        timeline_offset = self.clip_timeline_offset()
+        tracks = []
+        video = self.current_video
+        if video:
+            try:
+                streams = probe_media(video, self.catalog).get("streams", [])
+            except Exception:
+                streams = []
+            if any(st.get("codec_type") == "audio" for st in streams):
+                tracks.append(MixTrack(str(video), offset=timeline_offset))
+        # Shared MixTrack objects, so control changes are heard while playing
+        tracks.extend(track["mix"] for track in self.audio_tracks)
+        return MixerStream(tracks, timeline_offset + seconds) if tracks else None
+    
+    def clip_timeline_offset(self):
+        """Timeline seconds at position 0 of the current clip, as exported: clips are cut to their trims"""
+        before = sum(self.exported_length(v) for v in self.timeline_videos[:self.current_video_index])
+        trim = self.clip_trims.get(self.current_video)
+        return before - (trim[0] if trim else 0)
+    
+    def exported_length(self, video):
+        """Seconds a clip takes up in the export: its trimmed length, else its whole duration"""
+        duration = self.media_durations.get(video, 0)
+        trim = self.clip_trims.get(video)
+        if not trim:
+            return duration
+        return (min(trim[1], duration) if duration else trim[1]) - trim[0]
+    
+    def stop_decoder(self):
+        """Stop the background decoder, if running"""
+        if self.decoder:
+            self.decoder.stop()
+            self.decoder = None
+        self.playback_clock.stop()
     
     def play_video(self):
-        """Play video continuously"""
-        if not self.is_playing or not self.video_cap:
+        """Show whichever decoded frame the playback clock says is due"""
+        if not self.is_playing or not self.decoder:
             return
         
-        if self.current_frame < self.total_frames - 1:
-            self.show_frame(self.current_frame + 1)
-            # Schedule next frame
-            delay = int(1000 / self.fps)
-            self.root.after(delay, self.play_video)
-        else:
+        target = min(self.playback_clock.frame(), self.total_frames - 1)
+        item = self.decoder.buffer.take(target)
+        if item:
+            self.display_frame(*item)
+        
+        if target >= self.total_frames - 1 or (self.decoder.finished and not len(self.decoder.buffer)):
             # End of video
             self.is_playing = False
             self.play_button.config(text="▶")
+            self.stop_decoder()
+            return
+        
+        # Wake up when the next frame is due
+        delay = self.playback_clock.seconds_until(target + 1)
+        self.root.after(max(1, int(delay * 1000)), self.play_video)
     
     def seek_start(self):
         """Seek to start"""
@@ -590,11 +931,30 @@ class VideoEditorGUI:
     def on_seek_start(self, event):
         """Start seeking"""
         self.was_playing = self.is_playing
+        self.scrubbing = True
         if self.is_playing:
             self.toggle_playback()
     
+    def on_scrub(self, value):
+        """Show frames live while the position slider is dragged"""
+        if not self.scrubbing or not self.video_cap:
+            return
+        # Coalesce slider events so only the latest position gets decoded
+        pending = self.scrub_target is not None
+        self.scrub_target = int(float(value))
+        if not pending:
+            self.root.after_idle(self.show_scrub_target)
+    
+    def show_scrub_target(self):
+        """Display the most recent scrub position"""
+        frame, self.scrub_target = self.scrub_target, None
+        if frame is not None and self.video_cap:
+            self.show_frame(frame)
+    
     def on_seek_end(self, event):
         """End seeking"""
+        self.scrubbing = False
+        self.scrub_target = None
         if self.video_cap:
             frame = int(self.video_position.get())
             self.show_frame(frame)
@@ -607,12 +967,22 @@ class VideoEditorGUI:
         if self.video_cap:
             self.trim_start = self.current_frame / self.fps
             self.trim_start_var.set(self.format_time(self.trim_start))
+            self.store_trim()
     
     def set_trim_end(self):
         """Set trim end to current position"""
         if self.video_cap:
             self.trim_end = self.current_frame / self.fps
             self.trim_end_var.set(self.format_time(self.trim_end))
+            self.store_trim()
+    
+    def store_trim(self):
+        """Record the current clip's trim range in the timeline model"""
+        duration = self.total_frames / self.fps
+        if self.trim_start <= 0 and self.trim_end >= duration or self.trim_end <= self.trim_start:
+            self.clip_trims.pop(self.current_video, None)
+        else:
+            self.clip_trims[self.current_video] = (self.trim_start, self.trim_end)
     
     def preview_trim(self):
         """Preview the trimmed section"""
@@ -634,8 +1004,10 @@ class VideoEditorGUI:
         file = filedialog.askopenfilename(filetypes=filetypes)
         
         if file:
-            self.audio_tracks.append({"path": file, "type": "audio", "name": Path(file).name})
+            self.add_audio_track(file, "audio")
             self.audio_listbox.insert(tk.END, f"Audio: {Path(file).name}")
+            self.index_media([Path(file)])
+            self.load_waveforms([Path(file)])
     
     def load_bgm(self):
         """Load background music"""
@@ -646,8 +1018,59 @@ class VideoEditorGUI:
         file = filedialog.askopenfilename(filetypes=filetypes)
         
         if file:
-            self.audio_tracks.append({"path": file, "type": "bgm", "name": Path(file).name})
+            self.add_audio_track(file, "bgm")
             self.audio_listbox.insert(tk.END, f"BGM: {Path(file).name}")
+            self.index_media([Path(file)], loudness=True)
+            self.load_waveforms([Path(file)])
+    
+    def add_audio_track(self, file, kind):
+        """Append a track with default mix settings"""
+        from src.video_cli.mixer import MixTrack
+        self.audio_tracks.append({"path": file, "type": kind, "name": Path(file).name, "mix": MixTrack(file)})
+        self.sync_mix_tracks()
+    
+    def on_audio_track_select(self, event=None):
+        """Show the selected track's mix settings"""
+        selection = self.audio_listbox.curselection()
+        if not selection:
+            return
+        track = self.audio_tracks[selection[0]]
+        self.loading_track_controls = True
+        try:
+            self.track_gain.set(track.get("gain", 1.0))
+            self.track_mute.set(track.get("mute", False))
+            self.track_offset.set(track.get("offset", 0.0))
+            self.track_fade_in.set(track.get("fade_in", 0.0))
+            self.track_fade_out.set(track.get("fade_out", 0.0))
+        finally:
+            self.loading_track_controls = False
+    
+    def on_track_control_change(self, *args):
+        """Store edited mix settings on the selected track"""
+        selection = self.audio_listbox.curselection() if hasattr(self, "audio_listbox") else ()
+        if self.loading_track_controls or not selection:
+            return
+        track = self.audio_tracks[selection[0]]
+        try:
+            values = (self.track_gain.get(), self.track_mute.get(), self.track_offset.get(),
+                      max(0.0, self.track_fade_in.get()), max(0.0, self.track_fade_out.get()))
+            track.update(zip(TRACK_MIX_KEYS, values))
+        except tk.TclError:
+            return  # Spinbox is mid-edit
+        self.sync_mix_tracks()
+    
+    def sync_mix_tracks(self):
+        """Apply track settings and the Audio/BGM volume sliders to each track's MixTrack"""
+        for track in self.audio_tracks:
+            mix = track["mix"]
+            group = self.bgm_volume.get() if track["type"] == "bgm" else self.audio_volume.get()
+            mix.gain = track.get("gain", 1.0) * group
+            mix.mute = track.get("mute", False)
+            mix.offset = track.get("offset", 0.0)
+            mix.fade_in = track.get("fade_in", 0.0)
+            mix.fade_out = track.get("fade_out", 0.0)
+            mix.duration = self.media_durations.get(Path(track["path"]))
+        self.schedule_waveform_redraw()
     
     def load_font(self):
         """Load font file"""
@@ -680,17 +1103,13 @@ class VideoEditorGUI:
             sample_text = "Sample Text Preview"
             
             # Create preview image
+            from PIL import Image, ImageDraw, ImageTk
+            from src.video_cli.overlay import load_font
             img = Image.new('RGB', (300, 60), color='black')
             draw = ImageDraw.Draw(img)
             
             # Load font
-            try:
-                if self.font_file and Path(self.font_file).exists():
-                    font = ImageFont.truetype(self.font_file, self.font_size_var.get())
-                else:
-                    font = ImageFont.load_default()
-            except:
-                font = ImageFont.load_default()
+            font = load_font(self.font_file, self.font_size_var.get())
             
             # Calculate position
             text_bbox = draw.textbbox((0, 0), sample_text, font=font)
@@ -812,71 +1231,348 @@ class VideoEditorGUI:
                 # Update timeline display
                 self.update_timeline_display()
     
+    def project_state(self):
+        """The editor state as a Project, with media references from the catalog (nothing is probed)"""
+        project = Project(
+            timeline=[str(video) for video in self.timeline_videos],
+            current=self.current_video_index,
+            trims={str(path): trim for path, trim in self.clip_trims.items()},
+            audio_tracks=[{"path": track["path"], "type": track["type"],
+                           **{key: track[key] for key in TRACK_MIX_KEYS if key in track}}
+                          for track in self.audio_tracks],
+            subtitles={
+                "file": str(self.current_subtitle_file) if self.current_subtitle_file else None,
+                "text": self.subtitle_entry.get(1.0, tk.END).rstrip("\n"),
+                "font_file": self.font_file,
+                "font_size": self.font_size_var.get(),
+                "font_color": self.font_color_var.get(),
+                "position_y": self.subtitle_position_y.get(),
+                "preview": self.preview_subtitle.get(),
+            },
+            settings={
+                "audio_volume": self.audio_volume.get(),
+                "bgm_volume": self.bgm_volume.get(),
+                "use_proxies": self.use_proxies.get(),
+                "waveform_zoom": self.waveform_zoom.get(),
+            },
+        )
+        project.media = collect_media(project.sources(), self.catalog)
+        return project
+    
+    def save_project(self):
+        """Save the editor state and references to its cached analysis"""
+        path = self.project_path
+        if path is None:
+            file = filedialog.asksaveasfilename(defaultextension=PROJECT_SUFFIX,
+                                                filetypes=[("Video projects", f"*{PROJECT_SUFFIX}")])
+            if not file:
+                return
+            path = Path(file)
+        try:
+            self.project_state().save(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save project: {str(e)}")
+            return
+        self.project_path = path
+        self.root.title(f"{WINDOW_TITLE} - {path.name}")
+    
+    def open_project(self):
+        """Open a project; unchanged sources reuse their saved analysis and caches"""
+        file = filedialog.askopenfilename(filetypes=[("Video projects", f"*{PROJECT_SUFFIX}"), ("All files", "*.*")])
+        if not file:
+            return
+        try:
+            project = Project.load(Path(file))
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to open project: {str(e)}")
+            return
+        stale = restore_media(project, self.catalog)
+        self.apply_project(project)
+        self.project_path = Path(file)
+        self.root.title(f"{WINDOW_TITLE} - {self.project_path.name}")
+        if stale:
+            names = "\n".join(Path(path).name for path in stale[:10])
+            messagebox.showwarning("Changed Sources",
+                                   f"{len(stale)} source file(s) changed or are missing since the project "
+                                   f"was saved; they are analysed again if present:\n{names}")
+    
+    def apply_project(self, project):
+        """Replace the editor state with a project's"""
+        if self.is_playing:
+            self.toggle_playback()
+        
+        # Timeline; stored durations draw it at once, filmstrips come from the catalog
+        videos = [Path(path) for path in project.timeline if Path(path).exists()]
+        self.video_files = list(videos)
+        self.timeline_videos = list(videos)
+        self.clip_trims = {Path(path): trim for path, trim in project.trims.items()}
+        self.media_durations.update({Path(path): d for path, d in stored_durations(project).items()})
+        self.video_listbox.delete(0, tk.END)
+        for i, video in enumerate(videos):
+            self.video_listbox.insert(tk.END, f"{i+1}. {video.name}")
+        
+        settings = project.settings
+        self.audio_volume.set(settings.get("audio_volume", 0.5))
+        self.bgm_volume.set(settings.get("bgm_volume", 0.3))
+        self.use_proxies.set(settings.get("use_proxies", True))
+        self.waveform_zoom.set(settings.get("waveform_zoom", 10.0))
+        
+        # Audio tracks with their mix settings
+        self.audio_tracks = []
+        self.audio_listbox.delete(0, tk.END)
+        track_paths = []
+        for saved in project.audio_tracks:
+            if not Path(saved["path"]).exists():
+                continue
+            self.add_audio_track(saved["path"], saved["type"])
+            self.audio_tracks[-1].update({key: saved[key] for key in TRACK_MIX_KEYS if key in saved})
+            label = "BGM" if saved["type"] == "bgm" else "Audio"
+            self.audio_listbox.insert(tk.END, f"{label}: {Path(saved['path']).name}")
+            track_paths.append(Path(saved["path"]))
+        self.sync_mix_tracks()
+        
+        # Subtitles and styling
+        subtitles = project.subtitles
+        self.font_file = subtitles.get("font_file")
+        self.font_size_var.set(subtitles.get("font_size", 24))
+        self.font_color_var.set(subtitles.get("font_color", "#FFFFFF"))
+        self.subtitle_position_y.set(subtitles.get("position_y", 0.85))
+        self.preview_subtitle.set(subtitles.get("preview", True))
+        self.subtitle_entry.delete(1.0, tk.END)
+        self.subtitle_entry.insert(1.0, subtitles.get("text", ""))
+        self.current_subtitle_file = None
+        self.subtitle_tracks = []
+        self.subtitle_file_label.config(text="No subtitle file loaded", foreground="gray")
+        if subtitles.get("file") and Path(subtitles["file"]).exists():
+            self.current_subtitle_file = Path(subtitles["file"])
+            self.parse_subtitle_file(subtitles["file"])
+            self.subtitle_file_label.config(text=f"Subtitle: {self.current_subtitle_file.name}", foreground="green")
+        self.update_font_preview()
+        
+        # Everything below is served from the catalog and the waveform/proxy caches for unchanged files
+        self.update_timeline_display()
+        self.timeline_analyzer.submit(videos)
+        self.proxies.submit(videos)
+        self.load_waveforms(track_paths)
+        if videos:
+            self.current_video_index = min(max(0, project.current), len(videos) - 1)
+            self.load_video(videos[self.current_video_index])
+    
+    def index_media(self, paths, loudness=False):
+        """Probe files into the media catalog without blocking the UI"""
+        def worker():
+            for path in paths:
+                try:
+                    probe_media(path, self.catalog)
+                    self.media_durations[path] = probe_duration(path, self.catalog)
+                    if loudness:
+                        probe_loudness(path, self.catalog)
+                except Exception as e:
+                    print(f"Error indexing {path}: {e}")
+            self.root.after(0, self.update_timeline_display)
+            self.root.after(0, self.sync_mix_tracks)  # Track durations for fade-outs
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def load_waveforms(self, paths):
+        """Build (or load from the cache) waveform peak pyramids in the background"""
+        paths = [p for p in map(Path, paths) if p not in self.waveforms]
+        for path in paths:
+            self.waveforms[path] = None  # Placeholder so the file is decoded only once
+        
+        def worker():
+            from src.video_cli.waveform import load_peak_pyramid
+            for path in paths:
+                try:
+                    streams = probe_media(path, self.catalog).get("streams", [])
+                    if not any(st.get("codec_type") == "audio" for st in streams):
+                        continue
+                    pyramid = load_peak_pyramid(path, self.catalog)
+                except Exception as e:
+                    print(f"Error building waveform for {path}: {e}")
+                    continue
+                self.root.after(0, lambda p=path, w=pyramid: self.apply_waveform(p, w))
+        
+        if paths:
+            threading.Thread(target=worker, daemon=True).start()
+    
+    def apply_waveform(self, path, pyramid):
+        self.waveforms[path] = pyramid
+        self.schedule_waveform_redraw()
+    
+    def schedule_waveform_redraw(self):
+        """Coalesce waveform redraws requested by playback, zoom and resizes"""
+        if not self.waveform_redraw_pending:
+            self.waveform_redraw_pending = True
+            self.root.after(50, self.draw_waveforms)
+    
+    def draw_waveforms(self):
+        """Draw one waveform row per source, each a single polygon from the peak pyramid"""
+        self.waveform_redraw_pending = False
+        canvas = self.waveform_canvas
+        canvas.delete("all")
+        width = canvas.winfo_width()
+        if width <= 1:
+            return
+        
+        # Clip audio at the clip position, tracks at the timeline position
+        position = self.current_frame / self.fps if self.fps else 0
+        rows = []
+        if self.current_video and self.waveforms.get(self.current_video):
+            rows.append(("Clip", self.waveforms[self.current_video], position))
+        offset = self.clip_timeline_offset()
+        for track in self.audio_tracks:
+            pyramid = self.waveforms.get(Path(track["path"]))
+            if pyramid:
+                rows.append((track["name"], pyramid, offset + position - track["mix"].offset))
+        
+        canvas.config(height=WAVEFORM_ROW_HEIGHT * max(3, len(rows)))
+        span = max(1.0, self.waveform_zoom.get())
+        lead = span / 4  # Keep the playhead a quarter into the view
+        half = WAVEFORM_ROW_HEIGHT / 2 - 2
+        for row, (name, pyramid, t) in enumerate(rows):
+            import numpy as np  # Already loaded with the pyramid
+            mins, maxs = pyramid.peaks(t - lead, t - lead + span, width)
+            mid = row * WAVEFORM_ROW_HEIGHT + WAVEFORM_ROW_HEIGHT / 2
+            xs = np.arange(width)
+            top = np.column_stack((xs, mid - maxs * half)).ravel()
+            bottom = np.column_stack((xs[::-1], mid - mins[::-1] * half)).ravel()
+            canvas.create_polygon(*np.concatenate((top, bottom)).tolist(), fill="#3c9", outline="#3c9")
+            canvas.create_text(4, row * WAVEFORM_ROW_HEIGHT + 2, text=name[:24], anchor=tk.NW,
+                               fill="white", font=("Arial", 7))
+        
+        x = int(width * lead / span)
+        canvas.create_line(x, 0, x, canvas.winfo_height(), fill="red")
+    
+    def timeline_block_width(self, duration):
+        """Pixel width of a timeline block for a clip of the given duration"""
+        return max(TIMELINE_MIN_BLOCK, int(duration * TIMELINE_PX_PER_SECOND))
+    
+    def timeline_thumb_count(self, duration):
+        """Number of filmstrip thumbnails that fit a clip's timeline block"""
+        return max(1, min(TIMELINE_MAX_THUMBS, self.timeline_block_width(duration) // TIMELINE_THUMB_SLOT))
+    
+    def poll_timeline_events(self):
+        """Apply finished background analysis to the timeline"""
+        redraw = False
+        for event in self.timeline_analyzer.drain():
+            kind, path = event[0], event[1]
+            if kind == "duration":
+                self.media_durations[path] = event[2]
+                redraw = True
+            elif kind == "thumbnail":
+                slot, count, data = event[2], event[3], event[4]
+                from PIL import Image
+                image = Image.open(io.BytesIO(data))
+                image.load()
+                self.timeline_thumbs[(path, slot)] = (count, image)
+                if not redraw and path in self.timeline_videos:
+                    self.draw_timeline_thumbnail(self.timeline_videos.index(path), slot)
+            elif kind == "error":
+                print(f"Error analyzing {path}: {event[2]}")
+        
+        for kind, path, detail in self.proxies.drain():
+            if kind == "proxy" and path == self.current_video:
+                self.switch_preview_source()
+            elif kind == "error":
+                print(f"Error generating proxy for {path}: {detail}")
+        
+        if redraw:
+            self.update_timeline_display()
+        self.root.after(100, self.poll_timeline_events)
+    
+    def draw_timeline_thumbnail(self, index, slot):
+        """Draw one filmstrip thumbnail inside its timeline block"""
+        video = self.timeline_videos[index]
+        entry = self.timeline_thumbs.get((video, slot))
+        if not entry or index >= len(self.timeline_blocks):
+            return
+        count, image = entry
+        x_start, x_end, _ = self.timeline_blocks[index]
+        slot_width = (x_end - x_start - 4) / count
+        
+        from PIL import ImageTk
+        image = image.copy()
+        image.thumbnail((max(1, int(slot_width) - 2), TIMELINE_THUMB_HEIGHT))
+        photo = ImageTk.PhotoImage(image)
+        self.timeline_photos.append(photo)
+        self.timeline_canvas.create_image(
+            x_start + 2 + slot * slot_width + slot_width / 2, 22 + TIMELINE_THUMB_HEIGHT / 2,
+            image=photo
+        )
+    
     def update_timeline_display(self):
         """Update the visual timeline representation"""
         self.timeline_canvas.delete("all")
+        self.timeline_photos = []
+        self.timeline_blocks = []
         
         if not self.timeline_videos:
             self.timeline_info_label.config(text="Timeline: No videos loaded")
             return
         
-        # Calculate total duration and positions
-        canvas_width = max(800, len(self.timeline_videos) * 120)
-        self.timeline_canvas.config(scrollregion=(0, 0, canvas_width, 120))
-        
         total_duration = 0
         x_pos = 10
-        video_positions = []
+        pending = 0
         
         for i, video in enumerate(self.timeline_videos):
-            # Get video duration (simplified - you'd normally read actual duration)
-            duration = 60  # Placeholder duration
-            
-            # Draw video block
-            block_width = max(100, duration * 2)  # Scale duration to pixels
+            # Real duration once probed; lay out at the minimum width until then
+            duration = self.media_durations.get(video)
+            if duration is None:
+                pending += 1
+            block_width = self.timeline_block_width(duration or 0)
             color = "lightblue" if i == self.current_video_index else "lightgray"
             
-            rect = self.timeline_canvas.create_rectangle(
+            self.timeline_canvas.create_rectangle(
                 x_pos, 20, x_pos + block_width, 80,
                 fill=color, outline="black", width=2
             )
             
-            # Add video name
+            # Add video name below the filmstrip
             self.timeline_canvas.create_text(
-                x_pos + block_width // 2, 50,
+                x_pos + block_width // 2, 71,
                 text=video.stem[:10], font=("Arial", 8), width=block_width-10
             )
             
-            video_positions.append((x_pos, x_pos + block_width, duration))
+            self.timeline_blocks.append((x_pos, x_pos + block_width, duration or 0))
             x_pos += block_width + 5
-            total_duration += duration
+            total_duration += duration or 0
+        
+        self.timeline_canvas.config(scrollregion=(0, 0, max(800, x_pos + 5), 120))
+        
+        # Thumbnails that have already arrived
+        for i, video in enumerate(self.timeline_videos):
+            for slot in range(TIMELINE_MAX_THUMBS):
+                if (video, slot) in self.timeline_thumbs:
+                    self.draw_timeline_thumbnail(i, slot)
         
         # Update timeline info
-        self.timeline_info_label.config(
-            text=f"Timeline: {len(self.timeline_videos)} videos, {self.format_time(total_duration)} total"
-        )
+        info = f"Timeline: {len(self.timeline_videos)} videos, {self.format_time(total_duration)} total"
+        if pending:
+            info += f" (probing {pending}...)"
+        self.timeline_info_label.config(text=info)
     
     def on_timeline_click(self, event):
-        """Handle click on timeline to jump to video segment"""
+        """Handle click on timeline to jump to the clicked position"""
         if not self.timeline_videos:
             return
         
-        # Simple implementation - jump to video based on click position
         canvas_x = self.timeline_canvas.canvasx(event.x)
         
-        # Find which video segment was clicked
-        x_pos = 10
-        for i, video in enumerate(self.timeline_videos):
-            block_width = 100  # Simplified
-            if x_pos <= canvas_x <= x_pos + block_width:
-                self.load_video(video)
-                self.current_video_index = i
-                self.update_timeline_display()
+        # Find which video segment was clicked and where inside it
+        for i, (x_start, x_end, duration) in enumerate(self.timeline_blocks):
+            if x_start <= canvas_x <= x_end:
+                if i != self.current_video_index or not self.video_cap:
+                    self.load_video(self.timeline_videos[i])
+                    self.current_video_index = i
+                    self.update_timeline_display()
+                if self.video_cap and self.total_frames > 0:
+                    fraction = (canvas_x - x_start) / max(1, x_end - x_start)
+                    self.show_frame(min(self.total_frames - 1, int(fraction * self.total_frames)))
                 break
-            x_pos += block_width + 5
     
     def export_final_video(self):
-        """Export final video based on timeline with all effects"""
+        """Queue an export of the timeline with all effects"""
         if not self.timeline_videos:
             messagebox.showwarning("Warning", "No videos in timeline")
             return
@@ -887,82 +1583,28 @@ class VideoEditorGUI:
         )
         
         if output_file:
-            self.progress.start()
-            thread = threading.Thread(target=self._export_final_video_thread, args=(output_file,), daemon=True)
-            thread.start()
+            self.sync_mix_tracks()
+            self.export_queue.add("video", output_file, self.video_export_spec(), self.export_priority.get())
     
-    def _export_final_video_thread(self, output_file):
-        """Export final video in background thread"""
-        try:
-            # Create input list file for timeline videos
-            input_list = self.temp_dir / "timeline_input.txt"
-            with open(input_list, 'w') as f:
-                for video in self.timeline_videos:
-                    f.write(f"file '{video.absolute()}'\n")
-            
-            # Build FFmpeg command based on options
-            cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(input_list)]
-            
-            # Add audio mixing if selected
-            audio_inputs = []
-            if self.include_audio_mix.get() and self.audio_tracks:
-                for i, track in enumerate(self.audio_tracks):
-                    cmd.extend(["-i", track["path"]])
-                    audio_inputs.append(i + 1)  # Input 0 is video
-            
-            # Add subtitle filter if selected and available
-            filter_complex = []
-            if self.include_subtitles.get():
-                if self.current_subtitle_file and self.current_subtitle_file.exists():
-                    # Add subtitle file input
-                    cmd.extend(["-i", str(self.current_subtitle_file)])
-                    subtitle_path = str(self.current_subtitle_file).replace('\\', '/')
-                    filter_complex.append(f"[0:v]subtitles='{subtitle_path}'[v]")
-                elif self.subtitle_entry.get(1.0, tk.END).strip():
-                    # Burn in custom text (simplified)
-                    text = self.subtitle_entry.get(1.0, tk.END).strip().replace("'", "\\'")
-                    filter_complex.append(f"[0:v]drawtext=text='{text}':fontsize={self.font_size_var.get()}:fontcolor={self.font_color_var.get()}:x=(w-text_w)/2:y=h*{self.subtitle_position_y.get()}[v]")
-            
-            # Add audio mixing filter if needed
-            if audio_inputs:
-                audio_filter = "[0:a]"
-                for i in audio_inputs:
-                    audio_filter += f"[{i}:a]"
-                audio_filter += f"amix=inputs={len(audio_inputs)+1}:duration=first[a]"
-                filter_complex.append(audio_filter)
-            
-            # Apply filters
-            if filter_complex:
-                cmd.extend(["-filter_complex", ";".join(filter_complex)])
-                if self.include_subtitles.get() and any("[v]" in f for f in filter_complex):
-                    cmd.extend(["-map", "[v]"])
-                else:
-                    cmd.extend(["-map", "0:v"])
-                    
-                if audio_inputs:
-                    cmd.extend(["-map", "[a]"])
-                else:
-                    cmd.extend(["-map", "0:a"])
-            else:
-                cmd.extend(["-c", "copy"])
-            
-            # Add output
-            cmd.append(str(output_file))
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                self.root.after(0, lambda: messagebox.showinfo("Success", "Final video exported successfully!"))
-            else:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to export video: {result.stderr}"))
-                
-        except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("Error", f"Error exporting final video: {str(e)}"))
-        finally:
-            self.root.after(0, lambda: self.progress.stop())
+    def video_export_spec(self):
+        """Snapshot of the timeline and export options, so later edits don't affect a queued job"""
+        spec = {
+            "videos": [str(v) for v in self.timeline_videos],
+            "trims": {str(v): list(t) for v, t in self.clip_trims.items() if v in self.timeline_videos},
+            "audio_tracks": [t["path"] for t in self.audio_tracks] if self.include_audio_mix.get() else [],
+            "mix": [asdict(t["mix"]) for t in self.audio_tracks] if self.include_audio_mix.get() else [],
+        }
+        if self.include_subtitles.get():
+            text = self.subtitle_entry.get(1.0, tk.END).strip()
+            if self.current_subtitle_file and self.current_subtitle_file.exists():
+                spec["subtitle_file"] = str(self.current_subtitle_file)
+            elif text:
+                spec.update(subtitle_text=text, font_size=self.font_size_var.get(),
+                            font_color=self.font_color_var.get(), position_y=self.subtitle_position_y.get())
+        return spec
     
     def export_audio(self):
-        """Export audio mix only"""
+        """Queue an export of the audio mix only"""
         if not self.audio_tracks:
             messagebox.showwarning("Warning", "No audio tracks loaded")
             return
@@ -973,41 +1615,94 @@ class VideoEditorGUI:
         )
         
         if output_file:
-            self.progress.start()
-            thread = threading.Thread(target=self._export_audio_thread, args=(output_file,), daemon=True)
-            thread.start()
+            self.sync_mix_tracks()
+            spec = {"audio_tracks": [t["path"] for t in self.audio_tracks],
+                    "mix": [asdict(t["mix"]) for t in self.audio_tracks]}
+            self.export_queue.add("audio", output_file, spec, self.export_priority.get())
+    
+    def selected_export_job(self):
+        selection = self.export_tree.selection()
+        return selection[0] if selection else None
+    
+    def cancel_export_job(self):
+        """Cancel the selected job; a running export is killed and its partial file removed"""
+        job_id = self.selected_export_job()
+        if job_id:
+            self.export_queue.cancel(job_id)
     
-    def _export_audio_thread(self, output_file):
-        """Export audio mix in background thread"""
+    def retry_export_job(self):
+        job_id = self.selected_export_job()
+        if job_id:
+            self.export_queue.retry(job_id)
+    
+    def remove_export_job(self):
+        job_id = self.selected_export_job()
+        if not job_id:
+            return
         try:
-            if len(self.audio_tracks) == 1:
-                # Single audio file - just copy
-                cmd = ["ffmpeg", "-y", "-i", self.audio_tracks[0]["path"], 
-                      "-acodec", "libmp3lame", str(output_file)]
-            else:
-                # Mix multiple audio files
-                cmd = ["ffmpeg", "-y"]
-                for track in self.audio_tracks:
-                    cmd.extend(["-i", track["path"]])
-                
-                # Create mix filter
-                mix_filter = "".join([f"[{i}:a]" for i in range(len(self.audio_tracks))])
-                mix_filter += f"amix=inputs={len(self.audio_tracks)}:duration=first[a]"
-                
-                cmd.extend(["-filter_complex", mix_filter, "-map", "[a]", 
-                           "-acodec", "libmp3lame", str(output_file)])
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                self.root.after(0, lambda: messagebox.showinfo("Success", "Audio exported successfully!"))
-            else:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to export audio: {result.stderr}"))
-                
-        except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("Error", f"Error exporting audio: {str(e)}"))
-        finally:
-            self.root.after(0, lambda: self.progress.stop())
+            self.export_queue.remove(job_id)
+        except ValueError as e:
+            messagebox.showwarning("Export Queue", str(e))
+    
+    def change_export_priority(self, delta):
+        job_id = self.selected_export_job()
+        job = self.export_queue.get(job_id) if job_id else None
+        if job:
+            self.export_queue.set_priority(job_id, job.priority + delta)
+            self.refresh_export_queue()
+    
+    def on_export_concurrency_change(self):
+        try:
+            self.export_queue.set_max_concurrent(int(self.export_concurrency.get()))
+        except (tk.TclError, ValueError):
+            pass
+    
+    def format_export_progress(self, job):
+        """Percent, speed and ETA of a running job"""
+        progress = job.progress
+        if job.status != RUNNING:
+            return "100%" if job.status == DONE else ""
+        if progress is None:
+            return "Preparing..."
+        text = self.format_time(progress.out_time)
+        if progress.fraction is not None:
+            text = f"{progress.fraction * 100:.0f}% ({text})"
+        if progress.speed:
+            text += f" {progress.speed:.1f}x"
+        if progress.eta is not None:
+            text += f" ETA {self.format_time(progress.eta)}"
+        return text
+    
+    def refresh_export_queue(self):
+        """Rebuild the queue view in run order"""
+        selected = self.selected_export_job()
+        self.export_tree.delete(*self.export_tree.get_children())
+        for job in self.export_queue.jobs():
+            self.export_tree.insert("", tk.END, iid=job.id, text=f"{job.kind}: {Path(job.output).name}")
+            self.update_export_row(job)
+        if selected and self.export_tree.exists(selected):
+            self.export_tree.selection_set(selected)
+    
+    def update_export_row(self, job):
+        status = job.status
+        if job.message and status in (FAILED, QUEUED):
+            status = f"{status}: {job.message.splitlines()[0]}"
+        self.export_tree.item(job.id, values=(job.priority, status, self.format_export_progress(job)))
+    
+    def poll_export_events(self):
+        """Apply job status and progress changes from the export workers"""
+        changed = set()
+        while True:
+            try:
+                changed.add(self.export_queue.events.get_nowait())
+            except queue.Empty:
+                break
+        if any(not self.export_tree.exists(job_id) or self.export_queue.get(job_id) is None for job_id in changed):
+            self.refresh_export_queue()
+        else:
+            for job_id in changed:
+                self.update_export_row(self.export_queue.get(job_id))
+        self.root.after(200, self.poll_export_events)
     
     def format_time(self, seconds):
         """Format seconds as HH:MM:SS"""
@@ -1019,9 +1714,16 @@ class VideoEditorGUI:
     def on_closing(self):
         """Cleanup on window close"""
         try:
+            self.export_queue.shutdown()
+            self.stop_decoder()
+            self.timeline_analyzer.shutdown()
+            self.proxies.shutdown()
             if self.video_cap:
                 self.video_cap.release()
-            pygame.mixer.quit()
+            if self.audio_output_ready:
+                import pygame
+                pygame.mixer.quit()
+            self.catalog.close()
             if self.temp_dir.exists():
                 shutil.rmtree(self.temp_dir)
         except:
@@ -1032,19 +1734,20 @@ class VideoEditorGUI:
 
 def main():
     """Main application entry point"""
-    # Check dependencies
-    try:
-        import cv2
-        import pygame
-        from PIL import Image, ImageTk, ImageFont, ImageDraw
-    except ImportError as e:
+    timer = StartupTimer()
+    # Check dependencies without importing them; they load on first use
+    missing = [name for name in ("cv2", "pygame", "PIL", "numpy") if importlib.util.find_spec(name) is None]
+    if missing:
         messagebox.showerror("Missing Dependencies", 
-                           f"Required package not found: {e}\n\n"
-                           "Please install: pip install opencv-python pygame pillow")
+                           f"Required package not found: {', '.join(missing)}\n\n"
+                           "Please install: pip install opencv-python pygame pillow numpy")
         return
     
     root = tk.Tk()
+    timer.mark("Tk")
+    timer.watch_window(root)
     app = VideoEditorGUI(root)
+    timer.mark("widgets")
     
     # Center window
     root.update_idletasks()
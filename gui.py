@@ -7,10 +7,17 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import subprocess
 import threading
+import queue
 from pathlib import Path
 import os
 import sys
 
+from src.video_cli.catalog import MediaCatalog, default_catalog_path
+from src.video_cli.ffmpeg_progress import CancelToken, ProcessCancelled
+from src.video_cli.logsink import LOG_SCROLLBACK, LogSink, default_log_path
+from src.video_cli.pipeline import run_pipeline
+from src.video_cli.startup import StartupTimer
+
 
 class VideoCLIGUI:
     def __init__(self, root):
@@ -30,12 +37,18 @@ class VideoCLIGUI:
         self.project_root = self.find_project_root()
         self.venv_path = self.project_root / ".venv"
         
+        # Log lines from any thread; shown in batches, kept in full in a session log file
+        self.log_sink = LogSink(default_log_path("gui"))
+        
         # Create UI
         self.create_widgets()
         
         # Set default directories
         self.set_default_directories()
         
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.root.after(100, self.flush_log)
+        
     def setup_variables(self):
         """Initialize all tkinter variables"""
         # Directory paths
@@ -56,6 +69,11 @@ class VideoCLIGUI:
         
         # Video extensions
         self.extensions = tk.StringVar(value=".mp4 .mov .mkv .avi")
+        
+        # Running pipeline: its cancel token, and events from the worker for the UI thread
+        self.cancel_token = None
+        self.pipeline_events = queue.Queue()
+        self.progress_status = tk.StringVar(value="Idle")
     
     def find_project_root(self):
         """Find the project root directory"""
@@ -110,6 +128,8 @@ class VideoCLIGUI:
                   style='Accent.TButton').pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Preview Command", command=self.preview_command).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Reset Defaults", command=self.reset_defaults).pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_processing, state='disabled')
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
         
         # Output log
         log_frame = ttk.LabelFrame(main_frame, text="Processing Log", padding="5")
@@ -122,8 +142,9 @@ class VideoCLIGUI:
         self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
         # Progress bar
-        self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
+        self.progress = ttk.Progressbar(main_frame, mode='determinate', maximum=100)
         self.progress.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(5, 0))
+        ttk.Label(main_frame, textvariable=self.progress_status).grid(row=5, column=0, columnspan=3, sticky=tk.W)
     
     def create_directory_tab(self, parent):
         """Create directory selection tab"""
@@ -250,19 +271,35 @@ class VideoCLIGUI:
         sys_frame = ttk.LabelFrame(parent, text="System Information", padding="10")
         sys_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
         
-        # Check for required components
-        ffmpeg_status = "✓ Available" if self.check_ffmpeg() else "✗ Not found"
-        venv_status = "✓ Found" if self.venv_path.exists() else "✗ Not found"
+        self.system_info = ttk.Label(sys_frame, text=self.system_info_text("checking...", "checking..."),
+                                     justify=tk.LEFT)
+        self.system_info.grid(row=0, column=0, sticky=tk.W)
         
+        parent.columnconfigure(0, weight=1)
+        parent.columnconfigure(1, weight=1)
+        
+        # Running ffmpeg and opening the catalog would delay the window; check in the background
+        threading.Thread(target=self.check_system, daemon=True).start()
+    
+    def system_info_text(self, ffmpeg_status, catalog_status):
+        """Format the System Information panel"""
+        venv_status = "✓ Found" if self.venv_path.exists() else "✗ Not found"
         info_text = f"Project Root: {self.project_root}\n"
         info_text += f"Virtual Environment: {venv_status}\n"
         info_text += f"FFmpeg: {ffmpeg_status}\n"
+        info_text += f"Media Catalog: {catalog_status}\n"
+        info_text += f"Log File: {self.log_sink.path}\n"
         info_text += f"Python: {sys.version.split()[0]}"
-        
-        ttk.Label(sys_frame, text=info_text, justify=tk.LEFT).grid(row=0, column=0, sticky=tk.W)
-        
-        parent.columnconfigure(0, weight=1)
-        parent.columnconfigure(1, weight=1)
+        return info_text
+    
+    def check_system(self):
+        """Check for required components (worker thread) and show the result"""
+        ffmpeg_status = "✓ Available" if self.check_ffmpeg() else "✗ Not found"
+        text = self.system_info_text(ffmpeg_status, self.catalog_status())
+        try:
+            self.root.after(0, lambda: self.system_info.config(text=text))
+        except RuntimeError:
+            pass  # Window already closed
     
     def set_default_directories(self):
         """Set default directory paths"""
@@ -300,6 +337,14 @@ class VideoCLIGUI:
         except (subprocess.CalledProcessError, FileNotFoundError):
             return False
     
+    def catalog_status(self):
+        """Describe the shared media catalog used by the CLI"""
+        try:
+            with MediaCatalog() as catalog:
+                return f"{len(catalog)} files indexed ({default_catalog_path()})"
+        except Exception as e:
+            return f"unavailable ({e})"
+    
     def build_command(self):
         """Build the CLI command"""
         if not self.venv_path.exists():
@@ -387,18 +432,27 @@ class VideoCLIGUI:
         messagebox.showinfo("Copied", "Command copied to clipboard!")
     
     def log_message(self, message):
-        """Add message to log"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
-        self.root.update_idletasks()
+        """Add message to log (any thread; shown on the next flush_log)"""
+        self.log_sink.write(message)
+    
+    def flush_log(self):
+        """Show pending log lines in one widget update, keeping the last LOG_SCROLLBACK lines"""
+        lines = self.log_sink.drain()
+        if lines:
+            self.log_text.config(state=tk.NORMAL)
+            self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+            excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - LOG_SCROLLBACK
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_text.see(tk.END)
+            self.log_text.config(state=tk.DISABLED)
+        self.root.after(100, self.flush_log)
     
     def process_videos(self):
-        """Start video processing in a separate thread"""
+        """Start video processing on a worker thread"""
         try:
             # Validate inputs
-            if not Path(self.video_dir.get()).exists():
+            if not self.resolve_path(self.video_dir.get()).exists():
                 messagebox.showerror("Error", "Video directory does not exist!")
                 return
             
@@ -406,18 +460,51 @@ class VideoCLIGUI:
                 messagebox.showerror("Error", "Please specify an output filename!")
                 return
             
-            # Disable process button and start progress
+            # Disable everything but Cancel while the pipeline runs
             for widget in self.root.winfo_children():
                 self.disable_widget_tree(widget)
-            self.progress.start()
+            self.cancel_button.config(state='normal')
+            self.progress['value'] = 0
             
-            # Start processing in thread
-            thread = threading.Thread(target=self.run_processing, daemon=True)
+            self.cancel_token = CancelToken()
+            thread = threading.Thread(target=self.run_processing, args=(self.pipeline_options(), self.cancel_token),
+                                      daemon=True)
             thread.start()
+            self.root.after(100, self.poll_pipeline_events)
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start processing: {str(e)}")
     
+    def cancel_processing(self):
+        """Stop the running pipeline; its FFmpeg step is killed"""
+        if self.cancel_token:
+            self.cancel_token.cancel()
+            self.progress_status.set("Cancelling...")
+    
+    def resolve_path(self, value):
+        """Relative paths are relative to the project root, as for the CLI run from there"""
+        path = Path(value)
+        return path if path.is_absolute() else self.project_root / path
+    
+    def pipeline_options(self):
+        """Keyword arguments for run_pipeline from the current settings (the CLI's defaults where empty)"""
+        output_dir = self.resolve_path(self.output_dir.get() or "Output")
+        return dict(
+            video_dir=self.resolve_path(self.video_dir.get() or "Video"),
+            caption_dir=self.resolve_path(self.caption_dir.get() or "Caption"),
+            bgm_dir=self.resolve_path(self.bgm_dir.get() or "BGM"),
+            output_dir=output_dir,
+            output_file=output_dir / self.output_file.get(),
+            exts=self.extensions.get().split() or [".mp4", ".mov", ".mkv", ".avi"],
+            bgm_file=self.resolve_path(self.bgm_file.get()) if self.bgm_file.get() else None,
+            bgm_volume=self.bgm_volume.get(),
+            burn_in=self.burn_in.get(),
+            generate_captions=self.generate_captions.get(),
+            language=self.language.get(),
+            sample_rate=self.sample_rate.get(),
+            keep_temp=self.keep_temp.get(),
+        )
+    
     def disable_widget_tree(self, widget):
         """Recursively disable all widgets"""
         try:
@@ -436,63 +523,84 @@ class VideoCLIGUI:
         for child in widget.winfo_children():
             self.enable_widget_tree(child)
     
-    def run_processing(self):
-        """Run the video processing"""
-        try:
-            cmd = self.build_command()
-            
-            self.log_message("=" * 50)
-            self.log_message("Starting video processing...")
-            self.log_message(f"Command: {' '.join(cmd)}")
-            self.log_message("=" * 50)
-            
-            # Change to project directory
-            original_cwd = os.getcwd()
-            os.chdir(self.project_root)
-            
-            # Run the command
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                universal_newlines=True
-            )
-            
-            # Stream output
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.log_message(output.strip())
-            
-            # Wait for completion
-            return_code = process.poll()
-            
-            # Restore directory
-            os.chdir(original_cwd)
-            
-            if return_code == 0:
-                self.log_message("=" * 50)
-                self.log_message("✓ Processing completed successfully!")
-                self.log_message("=" * 50)
-                messagebox.showinfo("Success", "Video processing completed successfully!")
+    def run_processing(self, options, cancel_token):
+        """Run the pipeline in-process (worker thread); everything for the UI goes through pipeline_events"""
+        events = self.pipeline_events
+        
+        def on_event(event):
+            # FFmpeg's log lines go straight to the log sink; only stage and progress events need the UI
+            if event.kind == "output":
+                self.log_message(event.message)
             else:
-                self.log_message("=" * 50)
-                self.log_message(f"✗ Processing failed with return code: {return_code}")
-                self.log_message("=" * 50)
-                messagebox.showerror("Error", f"Processing failed with return code: {return_code}")
-                
-        except Exception as e:
-            self.log_message(f"✗ Error: {str(e)}")
-            messagebox.showerror("Error", f"Processing failed: {str(e)}")
+                events.put(("event", event))
         
-        finally:
-            # Re-enable interface
-            self.progress.stop()
-            for widget in self.root.winfo_children():
-                self.enable_widget_tree(widget)
+        self.log_message("=" * 50)
+        self.log_message("Starting video processing...")
+        self.log_message("=" * 50)
+        try:
+            with MediaCatalog() as catalog:
+                output = run_pipeline(**options, catalog=catalog, on_event=on_event, cancel=cancel_token)
+            events.put(("finished", "success", f"Video processing completed successfully!\n{output}"))
+        except ProcessCancelled:
+            events.put(("finished", "cancelled", "Processing cancelled"))
+        except Exception as e:
+            events.put(("finished", "error", f"Processing failed: {str(e)}"))
+    
+    def poll_pipeline_events(self):
+        """Apply worker events to the progress bar and log (UI thread)"""
+        latest = None  # Only the newest progress event of a batch is drawn
+        while True:
+            try:
+                item = self.pipeline_events.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == "finished":
+                self.finish_processing(item[1], item[2])
+                return
+            event = item[1]
+            if event.kind == "progress":
+                latest = event
+            else:
+                self.show_pipeline_event(event)
+                latest = None
+        if latest is not None:
+            self.show_pipeline_event(latest)
+        self.root.after(100, self.poll_pipeline_events)
+    
+    def show_pipeline_event(self, event):
+        """Progress bar and status line for one PipelineEvent"""
+        self.progress['value'] = event.fraction * 100
+        if event.message:
+            self.log_message(event.message)
+        status = f"{event.stage}: {event.fraction:.0%}"
+        if event.eta is not None:
+            status += f" (step ETA {event.eta:.0f}s)"
+        self.progress_status.set(event.message if event.kind == "done" else status)
+    
+    def finish_processing(self, outcome, message):
+        """Re-enable the interface and report how the run ended"""
+        self.cancel_token = None
+        for widget in self.root.winfo_children():
+            self.enable_widget_tree(widget)
+        self.cancel_button.config(state='disabled')
+        self.log_message("=" * 50)
+        self.log_message(("✓ " if outcome == "success" else "✗ ") + message)
+        self.log_message("=" * 50)
+        if outcome == "success":
+            messagebox.showinfo("Success", message)
+        elif outcome == "cancelled":
+            self.progress['value'] = 0
+            self.progress_status.set("Cancelled")
+        else:
+            self.progress_status.set("Failed")
+            messagebox.showerror("Error", message)
+    
+    def on_closing(self):
+        """Stop a running pipeline and close the log file"""
+        if self.cancel_token:
+            self.cancel_token.cancel()
+        self.log_sink.close()
+        self.root.destroy()
     
     def reset_defaults(self):
         """Reset all settings to defaults"""
@@ -510,8 +618,12 @@ class VideoCLIGUI:
 
 def main():
     """Main application entry point"""
+    timer = StartupTimer()
     root = tk.Tk()
+    timer.mark("Tk")
+    timer.watch_window(root)
     app = VideoCLIGUI(root)
+    timer.mark("widgets")
     
     # Center window on screen
     root.update_idletasks()
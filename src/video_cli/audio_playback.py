@@ -0,0 +1,200 @@
+"""Audio output as the master clock for preview playback.
+
+PCM is decoded by FFmpeg, cut into small chunks and handed to an audio sink
+(pygame in the editor). The clock position is derived from which chunk the
+sink is currently playing and how long ago it started, so video frames are
+shown or dropped against what the listener actually hears rather than
+against timer callbacks that drift.
+"""
+from __future__ import annotations
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from .playback import FFMPEG
+
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_BYTES = 2  # signed 16-bit
+
+
+class PCMStream:
+    """Interleaved s16le PCM decoded by FFmpeg from one or more inputs.
+
+    ``inputs`` are ``(path, offset_seconds)`` pairs. Several inputs are mixed
+    with the same ``amix`` settings the editor uses at export, so the preview
+    sounds like the exported file.
+    """
+
+    def __init__(self, inputs: Sequence[Tuple[Path, float]], sample_rate: int = SAMPLE_RATE,
+                 channels: int = CHANNELS):
+        cmd = [FFMPEG, "-v", "error", "-nostdin"]
+        for path, offset in inputs:
+            cmd += ["-ss", f"{max(0.0, offset):.3f}", "-i", str(path)]
+        if len(inputs) > 1:
+            mix = "".join(f"[{i}:a]" for i in range(len(inputs)))
+            cmd += ["-filter_complex", f"{mix}amix=inputs={len(inputs)}:duration=first[a]", "-map", "[a]"]
+        else:
+            cmd += ["-map", "0:a:0"]
+        cmd += ["-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-ac", str(channels), "-"]
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def read(self, size: int) -> bytes:
+        if self._proc.stdout is None:
+            return b""
+        return self._proc.stdout.read(size)
+
+    def close(self) -> None:
+        self._proc.kill()
+        self._proc.wait()
+        if self._proc.stdout is not None:
+            self._proc.stdout.close()
+
+
+class PygameSink:
+    """Audio sink on a dedicated pygame mixer channel.
+
+    ``submit`` starts a chunk immediately when the channel is idle and queues
+    it behind the current one otherwise; ``pending`` tells whether a queued
+    chunk has not started playing yet.
+    """
+
+    def __init__(self, buffer_samples: int = 1024):
+        import pygame
+
+        self._pygame = pygame
+        frequency, _, _ = pygame.mixer.get_init()
+        self.latency = buffer_samples / frequency
+        self.channel = pygame.mixer.find_channel(True)
+        self._sounds: List[Any] = []  # keep the playing and queued Sounds alive
+
+    def submit(self, pcm: bytes) -> None:
+        sound = self._pygame.mixer.Sound(buffer=pcm)
+        self._sounds = self._sounds[-1:] + [sound]
+        if self.channel.get_busy():
+            self.channel.queue(sound)
+        else:
+            self.channel.play(sound)
+
+    def pending(self) -> bool:
+        return self.channel.get_queue() is not None
+
+    def stop(self) -> None:
+        self.channel.stop()
+        self._sounds = []
+
+
+class AudioClock:
+    """Playback clock mastered by audio output, with the ``PlaybackClock`` interface.
+
+    ``open_stream(seconds)`` returns a ``PCMStream``-like object (``read``,
+    ``close``) positioned at ``seconds``, or ``None`` when there is nothing
+    to hear. It is called on the feeder thread. Without audio, or once the
+    audio ends, the clock free-runs on wall time from the last known position.
+    """
+
+    def __init__(
+        self,
+        fps: float,
+        open_stream: Callable[[float], Any],
+        sink: Any,
+        sample_rate: int = SAMPLE_RATE,
+        channels: int = CHANNELS,
+        chunk_samples: int = 2048,
+    ):
+        self.fps = fps if fps and fps > 0 else 30.0
+        self._open_stream = open_stream
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self._frame_bytes = channels * SAMPLE_BYTES
+        self._chunk_bytes = chunk_samples * self._frame_bytes
+        self._bytes_per_second = sample_rate * channels * SAMPLE_BYTES
+        self.latency = getattr(sink, "latency", 0.0)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._origin = 0.0
+        self._wall_origin = time.monotonic()
+        self._chunk: Optional[Tuple[float, float, float]] = None  # (media start, duration, wall start)
+        self._eof = False
+
+    def start(self, frame_index: int) -> None:
+        """(Re)start audio so that ``frame_index`` is heard now."""
+        self.stop()
+        self._stop = threading.Event()
+        with self._lock:
+            self._origin = frame_index / self.fps
+            self._wall_origin = time.monotonic()
+            self._chunk = None
+            self._eof = False
+        self._thread = threading.Thread(target=self._feed, args=(self._origin, self._stop),
+                                        name="preview-audio", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(1.0)
+        self._thread = None
+        self.sink.stop()
+
+    def position(self) -> float:
+        """Seconds of media currently reaching the listener."""
+        now = time.monotonic()
+        with self._lock:
+            if self._chunk is None:
+                if self._eof:
+                    return self._origin + (now - self._wall_origin)
+                return self._origin
+            start, duration, wall_start = self._chunk
+            elapsed = now - wall_start
+            if not self._eof:
+                # Starved feeder: hold at the end of the audio that was sent
+                elapsed = min(elapsed, duration)
+        return max(self._origin, start + elapsed - self.latency)
+
+    def frame(self) -> int:
+        return int(self.position() * self.fps + 1e-6)
+
+    def seconds_until(self, frame_index: int) -> float:
+        return frame_index / self.fps - self.position()
+
+    def drift(self) -> float:
+        """Audio clock minus wall clock since the last start (positive = audio ahead)."""
+        with self._lock:
+            wall = self._origin + (time.monotonic() - self._wall_origin)
+        return self.position() - wall
+
+    def _started(self, start: float, size: int) -> None:
+        with self._lock:
+            self._chunk = (start, size / self._bytes_per_second, time.monotonic())
+
+    def _feed(self, origin: float, stop: threading.Event) -> None:
+        stream = None
+        try:
+            stream = self._open_stream(origin)
+            position = origin
+            poll = self._chunk_bytes / self._bytes_per_second / 8
+            while stream is not None and not stop.is_set():
+                chunk = stream.read(self._chunk_bytes)
+                chunk = chunk[:len(chunk) - len(chunk) % self._frame_bytes]
+                if not chunk:
+                    break
+                self.sink.submit(chunk)
+                while self.sink.pending() and not stop.is_set():
+                    time.sleep(poll)
+                if stop.is_set():
+                    return
+                self._started(position, len(chunk))
+                position += len(chunk) / self._bytes_per_second
+        except Exception as e:
+            print(f"Audio preview error: {e}")
+        finally:
+            if stream is not None:
+                stream.close()
+            if not stop.is_set():
+                with self._lock:
+                    self._eof = True
@@ -0,0 +1,276 @@
+"""Persistent SQLite catalog of media metadata keyed by file fingerprint.
+
+The catalog stores ffprobe output, loudness statistics, keyframe positions and
+thumbnail blobs so that the CLI pipeline and both GUIs can skip re-probing
+footage they have already seen. Entries are keyed by
+``(path, size, mtime, partial hash)``; a file that is modified in place gets a
+new fingerprint and is therefore re-indexed automatically.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from .utils import cache_dir
+
+
+# Bytes hashed from the head and the tail of each file.
+PARTIAL_HASH_BYTES = 1 << 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    partial_hash TEXT NOT NULL,
+    probe TEXT,
+    duration REAL,
+    has_audio INTEGER,
+    width INTEGER,
+    height INTEGER,
+    fps REAL,
+    loudness TEXT,
+    keyframes TEXT,
+    indexed_at REAL NOT NULL,
+    UNIQUE (path, size, mtime_ns, partial_hash)
+);
+CREATE INDEX IF NOT EXISTS media_path ON media (path);
+CREATE INDEX IF NOT EXISTS media_hash ON media (partial_hash);
+CREATE TABLE IF NOT EXISTS thumbnails (
+    media_id INTEGER NOT NULL REFERENCES media (id) ON DELETE CASCADE,
+    time REAL NOT NULL,
+    width INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (media_id, time, width)
+);
+"""
+
+# Columns that callers may read and write through ``get``/``update``.
+# JSON columns are (de)serialized transparently.
+_JSON_FIELDS = {"probe", "loudness", "keyframes"}
+_FIELDS = {"probe", "duration", "has_audio", "width", "height", "fps", "loudness", "keyframes"}
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """Identity of a file on disk at a point in time."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    partial_hash: str
+
+    @property
+    def key(self) -> str:
+        """Content key that is stable across renames, used to name disk caches."""
+        return hashlib.sha1(f"{self.size}:{self.partial_hash}".encode()).hexdigest()
+
+
+def partial_hash(path: Path, size: Optional[int] = None) -> str:
+    """Hash the first and last ``PARTIAL_HASH_BYTES`` of a file."""
+    if size is None:
+        size = path.stat().st_size
+    h = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        h.update(f.read(PARTIAL_HASH_BYTES))
+        if size > PARTIAL_HASH_BYTES:
+            f.seek(max(PARTIAL_HASH_BYTES, size - PARTIAL_HASH_BYTES))
+            h.update(f.read(PARTIAL_HASH_BYTES))
+    return h.hexdigest()
+
+
+def file_fingerprint(path: Path) -> Fingerprint:
+    """Compute the fingerprint of ``path`` by reading its head and tail."""
+    path = Path(path).resolve()
+    st = path.stat()
+    return Fingerprint(str(path), st.st_size, st.st_mtime_ns, partial_hash(path, st.st_size))
+
+
+def default_catalog_path() -> Path:
+    """Location of the shared catalog, overridable with ``VIDEO_CLI_CATALOG``."""
+    override = os.environ.get("VIDEO_CLI_CATALOG")
+    if override:
+        return Path(override)
+    return cache_dir() / "catalog.sqlite3"
+
+
+class MediaCatalog:
+    """Thread-safe handle on the SQLite media catalog.
+
+    The catalog only stores data; producing it (running ffprobe/ffmpeg) is the
+    job of the ``probe_*`` helpers in :mod:`video_cli.pipeline`, which accept
+    a catalog and consult it before touching the file.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path else default_catalog_path()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            # WAL lets the CLI and the GUIs read while another process writes.
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "MediaCatalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -- fingerprints ---------------------------------------------------
+
+    def fingerprint(self, path: Path) -> Fingerprint:
+        """Fingerprint ``path``, reusing the stored hash when size and mtime match.
+
+        Only a ``stat`` is needed for files that are already indexed and
+        unchanged; the head/tail hash is computed for new or modified files.
+        """
+        path = Path(path).resolve()
+        st = path.stat()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT partial_hash FROM media WHERE path = ? AND size = ? AND mtime_ns = ? "
+                "ORDER BY indexed_at DESC LIMIT 1",
+                (str(path), st.st_size, st.st_mtime_ns),
+            ).fetchone()
+        if row is not None:
+            return Fingerprint(str(path), st.st_size, st.st_mtime_ns, row["partial_hash"])
+        return Fingerprint(str(path), st.st_size, st.st_mtime_ns, partial_hash(path, st.st_size))
+
+    def _media_id(self, fp: Fingerprint, create: bool) -> Optional[int]:
+        row = self._conn.execute(
+            "SELECT id FROM media WHERE path = ? AND size = ? AND mtime_ns = ? AND partial_hash = ?",
+            (fp.path, fp.size, fp.mtime_ns, fp.partial_hash),
+        ).fetchone()
+        if row is not None:
+            return row["id"]
+        if not create:
+            return None
+        # Stale entries for the same path are superseded by the new fingerprint.
+        self._conn.execute("DELETE FROM media WHERE path = ?", (fp.path,))
+        cur = self._conn.execute(
+            "INSERT INTO media (path, size, mtime_ns, partial_hash, indexed_at) VALUES (?, ?, ?, ?, ?)",
+            (fp.path, fp.size, fp.mtime_ns, fp.partial_hash, time.time()),
+        )
+        return cur.lastrowid
+
+    # -- metadata -------------------------------------------------------
+
+    def get(self, path: Union[Path, Fingerprint], field: str) -> Any:
+        """Return a stored field for the current version of ``path`` or ``None``."""
+        if field not in _FIELDS:
+            raise ValueError(f"Unknown catalog field: {field}")
+        fp = path if isinstance(path, Fingerprint) else self.fingerprint(path)
+        with self._lock:
+            mid = self._media_id(fp, create=False)
+            if mid is None:
+                return None
+            row = self._conn.execute(f"SELECT {field} FROM media WHERE id = ?", (mid,)).fetchone()
+        value = row[field]
+        if value is not None and field in _JSON_FIELDS:
+            return json.loads(value)
+        return value
+
+    def update(self, path: Union[Path, Fingerprint], **fields: Any) -> None:
+        """Store one or more fields for the current version of ``path``."""
+        unknown = set(fields) - _FIELDS
+        if unknown:
+            raise ValueError(f"Unknown catalog fields: {', '.join(sorted(unknown))}")
+        fp = path if isinstance(path, Fingerprint) else self.fingerprint(path)
+        values = [json.dumps(v) if k in _JSON_FIELDS and v is not None else v for k, v in fields.items()]
+        with self._lock:
+            mid = self._media_id(fp, create=True)
+            if fields:
+                assignments = ", ".join(f"{k} = ?" for k in fields)
+                self._conn.execute(f"UPDATE media SET {assignments} WHERE id = ?", (*values, mid))
+            self._conn.commit()
+
+    # -- thumbnails -----------------------------------------------------
+
+    def get_thumbnail(self, path: Union[Path, Fingerprint], time_s: float, width: int) -> Optional[bytes]:
+        fp = path if isinstance(path, Fingerprint) else self.fingerprint(path)
+        with self._lock:
+            mid = self._media_id(fp, create=False)
+            if mid is None:
+                return None
+            row = self._conn.execute(
+                "SELECT data FROM thumbnails WHERE media_id = ? AND time = ? AND width = ?",
+                (mid, round(time_s, 3), width),
+            ).fetchone()
+        return bytes(row["data"]) if row else None
+
+    def put_thumbnail(self, path: Union[Path, Fingerprint], time_s: float, width: int, data: bytes) -> None:
+        fp = path if isinstance(path, Fingerprint) else self.fingerprint(path)
+        with self._lock:
+            mid = self._media_id(fp, create=True)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO thumbnails (media_id, time, width, data) VALUES (?, ?, ?, ?)",
+                (mid, round(time_s, 3), width, sqlite3.Binary(data)),
+            )
+            self._conn.commit()
+
+    # -- queries --------------------------------------------------------
+
+    def search(
+        self,
+        path_like: Optional[str] = None,
+        min_duration: Optional[float] = None,
+        max_duration: Optional[float] = None,
+        has_audio: Optional[bool] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Query indexed media without touching the files themselves."""
+        clauses: List[str] = []
+        params: List[Any] = []
+        if path_like is not None:
+            clauses.append("path LIKE ?")
+            params.append(path_like)
+        if min_duration is not None:
+            clauses.append("duration >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            clauses.append("duration <= ?")
+            params.append(max_duration)
+        if has_audio is not None:
+            clauses.append("has_audio = ?")
+            params.append(int(has_audio))
+        sql = "SELECT path, size, duration, has_audio, width, height, fps, loudness FROM media"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY path"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        result = []
+        for row in rows:
+            item = dict(row)
+            if item["loudness"] is not None:
+                item["loudness"] = json.loads(item["loudness"])
+            result.append(item)
+        return result
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            paths = [r["path"] for r in self._conn.execute("SELECT path FROM media ORDER BY path")]
+        return iter(paths)
@@ -1,6 +1,36 @@
 import argparse
+import sys
 from pathlib import Path
-from .pipeline import run_pipeline
+from typing import Callable, Optional
+from .catalog import MediaCatalog
+from .farm import Coordinator, LocalFarm
+from .ffmpeg_progress import CancelToken
+from .pipeline import INTERMEDIATE_POLICIES, OUTPUT_MODES, PipelineEvent, is_stream_output, plan_pipeline, run_pipeline
+from .previews import Previews, parse_grid
+from .renditions import parse_renditions
+from .stages import StageCache, format_plan
+from .targets import DEFAULT_CAPS, Caps, parse_size
+
+
+def _renditions_arg(spec: str):
+    try:
+        return parse_renditions(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def _grid_arg(spec: str):
+    try:
+        return parse_grid(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def _size_arg(spec: str):
+    try:
+        return parse_size(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -11,7 +41,18 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--caption-dir", type=Path, default=Path("Caption"), help="Folder with .srt captions")
     p.add_argument("--bgm-dir", type=Path, default=Path("BGM"), help="Folder with background music tracks")
     p.add_argument("--output-dir", type=Path, default=Path("Output"), help="Folder to write outputs")
-    p.add_argument("--output", type=Path, default=None, help="Output video filename (defaults to Output/merged.mp4)")
+    p.add_argument("--output", type=Path, default=None,
+                   help="Output video filename (defaults to Output/merged.mp4); '-' or a named pipe streams it")
+    p.add_argument("--output-mode", choices=OUTPUT_MODES, default=None,
+                   help="mp4 (default for files), faststart (index first, for web playback) or "
+                        "fragmented (readable while written; always used for pipes)")
+    p.add_argument("--max-resolution", type=_size_arg, default=(DEFAULT_CAPS.max_width, DEFAULT_CAPS.max_height),
+                   help="Largest frame clips are normalized to, e.g. 1920x1080; smaller common formats are kept")
+    p.add_argument("--max-fps", type=float, default=DEFAULT_CAPS.max_fps,
+                   help="Highest frame rate clips are normalized to; lower common rates are kept")
+    p.add_argument("--intermediates", choices=INTERMEDIATE_POLICIES, default="lossless",
+                   help="lossless (default): steps encoded again later are lossless and fast, so only the last "
+                        "encode loses quality; quality: every step uses the delivery settings (smaller temp files)")
     p.add_argument("--exts", nargs="*", default=[".mp4", ".mov", ".mkv", ".avi"], help="Video extensions to include")
     p.add_argument("--bgm-file", type=Path, default=None, help="Specific BGM file to use (overrides dir scan)")
     p.add_argument("--bgm-volume", type=float, default=0.15, help="BGM volume (0.0-1.0)")
@@ -22,12 +63,41 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--language", default="en-US", help="Language code for STT if generating captions")
     p.add_argument("--sample-rate", type=int, default=16000, help="Sample rate for STT audio")
     p.add_argument("--keep-temp", action="store_true", help="Keep temporary files for debugging")
+    p.add_argument("--catalog", type=Path, default=None, help="Media catalog database (defaults to the shared user cache)")
+    p.add_argument("--no-catalog", action="store_true", help="Do not read or write the media catalog")
+    p.add_argument("--renditions", type=_renditions_arg, default=None,
+                   help="Also encode these variants of the output in one pass, e.g. 1080p,720p,480p,9:16@1280p")
+    p.add_argument("--hls", action="store_true", help="Package --renditions as HLS (CMAF segments) with a master playlist")
+    p.add_argument("--previews", action="store_true",
+                   help="Also write a poster, seek-preview sprite sheets and a .vtt index, from the final encode")
+    p.add_argument("--preview-interval", type=float, default=10.0, help="Seconds between preview thumbnails")
+    p.add_argument("--preview-grid", type=_grid_arg, default=(5, 5), help="Thumbnails per sprite sheet, e.g. 5x5")
+    p.add_argument("--jobs", type=int, default=2, help="Stages run at the same time, e.g. clips being normalized")
+    p.add_argument("--no-stage-cache", action="store_true", help="Run every stage instead of reusing earlier results")
+    p.add_argument("--plan", action="store_true", help="Print the stage graph and what would be skipped, then exit")
+    farm = p.add_mutually_exclusive_group()
+    farm.add_argument("--farm", type=Path, default=None,
+                      help="Normalize clips on workers sharing this spool directory (see src.video_cli.farm)")
+    farm.add_argument("--local-workers", type=int, default=None,
+                      help="Normalize clips in this many local worker processes")
     return p
 
 
-def main(argv=None):
-    args = build_parser().parse_args(argv)
-    run_pipeline(
+def check_args(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Reject option combinations argparse cannot express."""
+    if args.hls and not args.renditions:
+        parser.error("--hls needs --renditions")
+    if args.max_fps <= 0:
+        parser.error("--max-fps must be positive")
+    if args.preview_interval <= 0:
+        parser.error("--preview-interval must be positive")
+    if args.output is not None and args.output_mode not in (None, "fragmented") and is_stream_output(args.output):
+        parser.error("pipes and stdout need --output-mode fragmented")
+
+
+def pipeline_options(args: argparse.Namespace) -> dict:
+    """``run_pipeline``/``plan_pipeline`` keyword arguments for parsed ``args``."""
+    return dict(
         video_dir=args.video_dir,
         caption_dir=args.caption_dir,
         bgm_dir=args.bgm_dir,
@@ -40,9 +110,49 @@ def main(argv=None):
         generate_captions=args.generate_captions,
         language=args.language,
         sample_rate=args.sample_rate,
-        keep_temp=args.keep_temp,
+        renditions=args.renditions,
+        hls=args.hls,
+        output_mode=args.output_mode,
+        previews=Previews(args.preview_interval, *args.preview_grid) if args.previews else None,
+        caps=Caps(*args.max_resolution, max_fps=args.max_fps),
+        intermediates=args.intermediates,
     )
 
 
+def run_args(args: argparse.Namespace, catalog: Optional[MediaCatalog], stage_cache: Optional[StageCache],
+             on_event: Optional[Callable[[PipelineEvent], None]] = None,
+             cancel: Optional[CancelToken] = None) -> Path:
+    """Run the pipeline for parsed ``args``, with the farm they ask for."""
+    local_farm = LocalFarm(args.local_workers) if args.local_workers else None
+    if local_farm is not None:
+        farm = local_farm.coordinator
+    else:
+        farm = Coordinator(args.farm) if args.farm else None
+    try:
+        return run_pipeline(**pipeline_options(args), keep_temp=args.keep_temp, catalog=catalog,
+                            stage_cache=stage_cache, jobs=args.jobs, farm=farm, on_event=on_event, cancel=cancel)
+    finally:
+        if local_farm is not None:
+            local_farm.close()
+        elif farm is not None:
+            farm.close()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ["serve"]:
+        from .server import main as serve
+        return serve(argv[1:])
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    check_args(parser, args)
+    catalog = None if args.no_catalog else MediaCatalog(args.catalog)
+    stage_cache = None if args.no_stage_cache else StageCache()
+    if args.plan:
+        print(format_plan(plan_pipeline(stage_cache, catalog, **pipeline_options(args))))
+        return
+    run_args(args, catalog, stage_cache)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,345 @@
+"""Persistent export queue running several FFmpeg exports at once.
+
+Each job carries a JSON snapshot of everything its export needs (clips,
+trims, tracks, subtitle settings), so editing can continue while jobs wait
+and the queue can be reloaded after a restart. Jobs start in priority order
+(then submission order) whenever fewer than ``max_concurrent`` are running.
+Jobs interrupted by shutting down go back to the queue and start again
+when it is reopened.
+"""
+from __future__ import annotations
+import json
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from .catalog import MediaCatalog
+from .ffmpeg_progress import CancelToken, FFmpegProcess, ProcessCancelled, Progress
+from .pipeline import FFMPEG, probe_duration
+from .smartcut import smart_cut
+from .utils import cache_dir
+
+if TYPE_CHECKING:  # mixer pulls in NumPy; it is imported where used so the editor starts without it
+    from .mixer import MixTrack
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+def default_queue_path() -> Path:
+    return cache_dir() / "export_queue.json"
+
+
+@dataclass
+class ExportJob:
+    """One export. ``kind`` is ``"video"`` or ``"audio"``; ``spec`` holds its settings."""
+
+    kind: str
+    output: str
+    spec: Dict[str, Any]
+    priority: int = 0
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    status: str = QUEUED
+    message: str = ""
+    created_at: float = field(default_factory=time.time)
+    # Live progress; not persisted
+    progress: Optional[Progress] = field(default=None, compare=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("progress")
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ExportJob":
+        data = {k: v for k, v in data.items() if k in cls.__dataclass_fields__ and k != "progress"}
+        return cls(**data)
+
+
+class JobContext(CancelToken):
+    """Handed to the job runner: progress reporting and cancellation for one job."""
+
+    def __init__(self, job: ExportJob, on_progress: Callable[[Progress], None]):
+        super().__init__()
+        self.job = job
+        self.on_progress = on_progress
+        self.interrupted = False  # Cancelled by shutdown; the job is requeued
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise ProcessCancelled(self.job.id)
+
+    def run_ffmpeg(self, cmd: List[str], duration: Optional[float], *outputs: Path) -> None:
+        """Run FFmpeg under this job's cancellation; ``outputs`` are removed if it fails or is cancelled."""
+        self.run(FFmpegProcess(cmd, duration, outputs=outputs, on_progress=self.on_progress))
+
+    def cancel(self, interrupt: bool = False) -> None:
+        self.interrupted = interrupt
+        super().cancel()
+
+
+def _mix_tracks(spec: Dict[str, Any]) -> List[Optional[MixTrack]]:
+    """Per-track mix settings from a spec; ``None`` where there are none (plain amix)."""
+    from .mixer import MixTrack
+    mix = spec.get("mix") or []
+    return [MixTrack(**mix[i]) if i < len(mix) else None for i in range(len(spec.get("audio_tracks", [])))]
+
+
+def build_video_export_cmd(spec: Dict[str, Any], sources: List[Path], workdir: Path, output: Path) -> List[str]:
+    """FFmpeg command concatenating ``sources`` with the spec's audio mix and subtitles."""
+    input_list = workdir / "timeline_input.txt"
+    with open(input_list, "w") as f:
+        for video in sources:
+            f.write(f"file '{video.absolute()}'\n")
+
+    cmd = [FFMPEG, "-y", "-f", "concat", "-safe", "0", "-i", str(input_list)]
+
+    # Add audio mixing if selected
+    audio_inputs = []
+    for i, track in enumerate(spec.get("audio_tracks", [])):
+        cmd.extend(["-i", track])
+        audio_inputs.append(i + 1)  # Input 0 is video
+
+    # Add subtitle filter if selected and available
+    filter_complex = []
+    subtitle_file = spec.get("subtitle_file")
+    if subtitle_file and Path(subtitle_file).exists():
+        cmd.extend(["-i", subtitle_file])
+        subtitle_path = subtitle_file.replace('\\', '/')
+        filter_complex.append(f"[0:v]subtitles='{subtitle_path}'[v]")
+    elif spec.get("subtitle_text"):
+        # Burn in custom text (simplified)
+        text = spec["subtitle_text"].replace("'", "\\'")
+        filter_complex.append(
+            f"[0:v]drawtext=text='{text}':fontsize={spec.get('font_size', 24)}:"
+            f"fontcolor={spec.get('font_color', '#FFFFFF')}:x=(w-text_w)/2:y=h*{spec.get('position_y', 0.85)}[v]"
+        )
+
+    if audio_inputs:
+        # Clip audio first (duration=first), then the tracks with their mix settings
+        from .mixer import amix_filter
+        labels = ["[0:a]"] + [f"[{i}:a]" for i in audio_inputs]
+        filter_complex.append(amix_filter(labels, [None] + _mix_tracks(spec)))
+
+    if filter_complex:
+        cmd.extend(["-filter_complex", ";".join(filter_complex)])
+        cmd.extend(["-map", "[v]" if any("[v]" in f for f in filter_complex) else "0:v"])
+        cmd.extend(["-map", "[a]" if audio_inputs else "0:a"])
+    else:
+        cmd.extend(["-c", "copy"])
+    cmd.append(str(output))
+    return cmd
+
+
+def build_audio_export_cmd(tracks: List[str], output: Path,
+                           mix: Optional[List[Optional[MixTrack]]] = None) -> List[str]:
+    mix = mix or [None] * len(tracks)
+    if len(tracks) == 1 and mix[0] is None:
+        return [FFMPEG, "-y", "-i", tracks[0], "-acodec", "libmp3lame", str(output)]
+    from .mixer import amix_filter
+    cmd = [FFMPEG, "-y"]
+    for track in tracks:
+        cmd.extend(["-i", track])
+    mix_filter = amix_filter([f"[{i}:a]" for i in range(len(tracks))], mix)
+    return cmd + ["-filter_complex", mix_filter, "-map", "[a]", "-acodec", "libmp3lame", str(output)]
+
+
+def run_export_job(job: ExportJob, ctx: JobContext, catalog: Optional[MediaCatalog] = None) -> None:
+    """Run one queued export; raises ``ProcessCancelled`` or ``RuntimeError``."""
+    output = Path(job.output)
+    spec = job.spec
+    for m in spec.get("mix") or []:
+        if m.get("fade_out") and not m.get("duration"):
+            m["duration"] = probe_duration(Path(m["path"]), catalog)
+    if job.kind == "audio":
+        tracks = spec["audio_tracks"]
+        # amix=duration=first: the mix is as long as the first track
+        duration = probe_duration(Path(tracks[0]), catalog)
+        ctx.run_ffmpeg(build_audio_export_cmd(tracks, output, _mix_tracks(spec)), duration, output)
+        return
+
+    workdir = Path(tempfile.mkdtemp(prefix=f"export_{job.id}_"))
+    try:
+        # Trimmed clips are smart-cut first; untrimmed ones are concatenated as they are
+        sources, duration = [], 0.0
+        trims = spec.get("trims", {})
+        for i, video in enumerate(map(Path, spec["videos"])):
+            ctx.check_cancelled()
+            trim = trims.get(str(video))
+            if trim:
+                trimmed = workdir / f"trim_{i}{video.suffix}"
+                smart_cut(video, trim[0], trim[1], trimmed, catalog, ctx.run_ffmpeg)
+                sources.append(trimmed)
+                duration += trim[1] - trim[0]
+            else:
+                sources.append(video)
+                duration += probe_duration(video, catalog)
+        ctx.check_cancelled()
+        ctx.run_ffmpeg(build_video_export_cmd(spec, sources, workdir, output), duration, output)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class ExportQueue:
+    """Priority queue of export jobs persisted to ``path``.
+
+    ``events`` receives the id of every job whose status or progress changed,
+    for a UI to drain. ``runner(job, ctx)`` performs one export and defaults to
+    ``run_export_job``.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_concurrent: int = 2,
+        catalog: Optional[MediaCatalog] = None,
+        runner: Optional[Callable[[ExportJob, JobContext], None]] = None,
+    ):
+        self.path = Path(path) if path else default_queue_path()
+        self.max_concurrent = max(1, max_concurrent)
+        self.runner = runner or (lambda job, ctx: run_export_job(job, ctx, catalog))
+        self.events: "queue.Queue[str]" = queue.Queue()
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, ExportJob] = {}
+        self._running: Dict[str, JobContext] = {}
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        self._load()
+
+    # Persistence
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        for item in data.get("jobs", []):
+            job = ExportJob.from_dict(item)
+            if job.status == RUNNING:
+                job.status, job.message = QUEUED, "Interrupted; will restart"
+            self._jobs[job.id] = job
+
+    def _save(self) -> None:
+        data = {"jobs": [job.to_dict() for job in self.jobs()]}
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+
+    # Queue management
+
+    def jobs(self) -> List[ExportJob]:
+        """All jobs in the order they will (or did) run."""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: (-j.priority, j.created_at))
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def add(self, kind: str, output: Path, spec: Dict[str, Any], priority: int = 0) -> ExportJob:
+        job = ExportJob(kind=kind, output=str(output), spec=spec, priority=priority)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._changed(job)
+            self._dispatch()
+        return job
+
+    def set_priority(self, job_id: str, priority: int) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job.priority = priority
+            self._changed(job)
+
+    def set_max_concurrent(self, count: int) -> None:
+        with self._lock:
+            self.max_concurrent = max(1, count)
+            self._dispatch()
+
+    def cancel(self, job_id: str) -> None:
+        """Cancel a queued or running job."""
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.status == QUEUED:
+                job.status, job.message = CANCELLED, ""
+                self._changed(job)
+            elif job_id in self._running:
+                self._running[job_id].cancel()
+
+    def retry(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.status in (FAILED, CANCELLED):
+                job.status, job.message = QUEUED, ""
+                self._changed(job)
+                self._dispatch()
+
+    def remove(self, job_id: str) -> None:
+        """Forget a job that is not running."""
+        with self._lock:
+            if job_id in self._running:
+                raise ValueError("Cannot remove a running job; cancel it first")
+            self._jobs.pop(job_id, None)
+            self._save()
+            self.events.put(job_id)
+
+    def start(self) -> None:
+        """Begin running queued jobs (including ones restored from disk)."""
+        with self._lock:
+            self._dispatch()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop running jobs and requeue them so they restart next time."""
+        with self._lock:
+            self._closed = True
+            for ctx in self._running.values():
+                ctx.cancel(interrupt=True)
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(timeout)
+
+    def _changed(self, job: ExportJob) -> None:
+        self._save()
+        self.events.put(job.id)
+
+    def _dispatch(self) -> None:
+        if self._closed:
+            return
+        waiting = [j for j in self.jobs() if j.status == QUEUED]
+        while waiting and len(self._running) < self.max_concurrent:
+            job = waiting.pop(0)
+            job.status, job.message, job.progress = RUNNING, "", None
+            ctx = JobContext(job, lambda p, job=job: self._progress(job, p))
+            self._running[job.id] = ctx
+            self._changed(job)
+            thread = threading.Thread(target=self._run, args=(job, ctx), name=f"export-{job.id}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _progress(self, job: ExportJob, progress: Progress) -> None:
+        job.progress = progress
+        self.events.put(job.id)
+
+    def _run(self, job: ExportJob, ctx: JobContext) -> None:
+        try:
+            self.runner(job, ctx)
+            status, message = DONE, ""
+        except ProcessCancelled:
+            status, message = (QUEUED, "Interrupted; will restart") if ctx.interrupted else (CANCELLED, "")
+        except Exception as e:
+            status, message = FAILED, str(e)
+        with self._lock:
+            job.status, job.message = status, message
+            self._running.pop(job.id, None)
+            self._threads = [t for t in self._threads if t is not threading.current_thread()]
+            self._changed(job)
+            self._dispatch()
@@ -0,0 +1,383 @@
+"""Clip normalization farmed out to worker processes over a shared directory.
+
+A ``Coordinator`` and any number of ``Worker`` processes, on this machine or
+others, share a spool directory (a network share mounted on every node):
+
+    tasks/<task>.<attempt>.json    queued; a worker claims one by renaming it
+    running/<task>.<attempt>.json  claimed; the worker rewrites it as a heartbeat
+    outputs/<task>.<attempt>.mp4   the encoded clip
+    done/<task>.<attempt>.json     the outcome, written last
+    cancel/<task>.<attempt>        the coordinator no longer wants this attempt
+    stop                           workers exit
+
+A rename succeeds for only one worker, so every attempt runs at most once.
+The coordinator queues a new attempt when a worker reports an error or stops
+heartbeating, up to ``max_attempts``. Once the queue is empty it also starts
+a second copy of any attempt running ``speculate_factor`` times longer than
+the median; whichever copy finishes first wins and the other is cancelled.
+Workers read sources by the path the coordinator sends, so sources must be
+mounted at the same path on every node. ``LocalFarm`` runs workers as local
+processes, standing in for real nodes.
+
+Run a worker with ``python -m src.video_cli.farm worker --spool DIR``.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .ffmpeg_progress import CancelToken, FFmpegProcess, ProcessCancelled
+from .pipeline import normalize_cmd, probe_duration
+from .targets import TRANSCODE, NormalizeTarget
+from .utils import ensure_dir
+
+
+HEARTBEAT_SECONDS = 1.0
+STALE_SECONDS = 15.0  # no heartbeat for this long and the attempt is given up
+MAX_ATTEMPTS = 3
+SPECULATE_FACTOR = 2.0
+POLL_SECONDS = 0.2
+
+
+def _normalize_profile(source: Path, output: Path, target: Optional[Dict[str, Any]] = None,
+                       action: str = TRANSCODE, encoder: str = "delivery") -> List[str]:
+    return normalize_cmd(source, output, NormalizeTarget(**target) if target else None, action, encoder)
+
+
+# Encode profiles a task may name; each builds the FFmpeg command for (source, output, **task options)
+PROFILES: Dict[str, Callable[..., List[str]]] = {"normalize": _normalize_profile}
+
+_SPOOL_DIRS = ("tasks", "running", "outputs", "done", "cancel")
+
+
+def _prepare_spool(spool: Path) -> None:
+    for name in _SPOOL_DIRS:
+        ensure_dir(spool / name)
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _attempt_of(path: Path) -> Tuple[str, int]:
+    task, _, attempt = path.stem.rpartition(".")
+    return task, int(attempt)
+
+
+@dataclass
+class _Job:
+    task: str
+    source: str
+    profile: str
+    output: Path
+    future: Future
+    on_progress: Optional[Callable[[float], None]] = None
+    options: Dict[str, Any] = field(default_factory=dict)
+    attempts: Dict[int, Optional[Tuple[Any, float]]] = field(default_factory=dict)  # live attempt -> last beat, seen at
+    claimed: Dict[int, float] = field(default_factory=dict)  # attempt -> when first seen running
+    next_attempt: int = 0
+    failures: List[str] = field(default_factory=list)
+    speculated: bool = False
+
+
+class Coordinator:
+    """Hands clips to workers through ``spool`` and collects the results."""
+
+    def __init__(
+        self,
+        spool: Path,
+        max_attempts: int = MAX_ATTEMPTS,
+        stale_seconds: float = STALE_SECONDS,
+        speculate_factor: float = SPECULATE_FACTOR,
+    ):
+        self.spool = Path(spool)
+        self.max_attempts = max_attempts
+        self.stale_seconds = stale_seconds
+        self.speculate_factor = speculate_factor
+        _prepare_spool(self.spool)
+        # Task names start with this, so several coordinators can share one spool and its workers
+        self.id = uuid.uuid4().hex[:8]
+        self._jobs: Dict[str, _Job] = {}
+        self._durations: List[float] = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+
+    def normalize(self, source: Path, output: Path, cancel: Optional[CancelToken] = None,
+                  on_progress: Optional[Callable[[float], None]] = None, profile: str = "normalize",
+                  options: Optional[Dict[str, Any]] = None) -> Path:
+        """Encode ``source`` to ``output`` on some worker; blocks until done, failed or cancelled.
+
+        ``options`` (JSON-serializable) are passed to the profile, e.g. the normalization target.
+        """
+        job = _Job(f"{self.id}-{uuid.uuid4().hex[:12]}", str(Path(source).resolve()), profile, Path(output),
+                   Future(), on_progress, dict(options or {}))
+        with self._lock:
+            self._jobs[job.task] = job
+            self._dispatch(job)
+        while not wait([job.future], timeout=POLL_SECONDS).done:
+            if cancel is not None and cancel.cancelled:
+                with self._lock:
+                    self._drop(job)
+                raise ProcessCancelled(str(source))
+        return job.future.result()
+
+    def close(self) -> None:
+        self._closed.set()
+        self._watcher.join()
+        with self._lock:
+            for job in list(self._jobs.values()):
+                self._drop(job)
+                job.future.set_exception(RuntimeError("Coordinator closed"))
+
+    def _dispatch(self, job: _Job) -> None:
+        attempt = job.next_attempt
+        job.next_attempt += 1
+        job.attempts[attempt] = None
+        _write_json(self.spool / "tasks" / f"{job.task}.{attempt}.json",
+                    {"task": job.task, "attempt": attempt, "source": job.source, "profile": job.profile,
+                     "options": job.options})
+
+    def _cancel_attempt(self, job: _Job, attempt: int) -> None:
+        job.attempts.pop(attempt, None)
+        try:
+            (self.spool / "tasks" / f"{job.task}.{attempt}.json").unlink()
+        except OSError:
+            # Already claimed: ask the worker to stop
+            (self.spool / "cancel" / f"{job.task}.{attempt}").touch()
+
+    def _drop(self, job: _Job) -> None:
+        for attempt in list(job.attempts):
+            self._cancel_attempt(job, attempt)
+        self._jobs.pop(job.task, None)
+
+    def _failed(self, job: _Job, reason: str) -> None:
+        job.failures.append(reason)
+        if len(job.failures) >= self.max_attempts:
+            self._drop(job)
+            job.future.set_exception(RuntimeError(
+                f"Normalizing {job.source} failed {len(job.failures)} times; last error: {reason}"))
+        elif not job.attempts:
+            self._dispatch(job)
+
+    def _watch(self) -> None:
+        while not self._closed.wait(POLL_SECONDS):
+            with self._lock:
+                self._collect_results()
+                self._check_running()
+                self._speculate()
+
+    def _collect_results(self) -> None:
+        for path in sorted((self.spool / "done").glob(f"{self.id}-*.json")):
+            result = _read_json(path)
+            if result is None:
+                continue
+            path.unlink()
+            task, attempt = _attempt_of(path)
+            output = self.spool / "outputs" / f"{task}.{attempt}.mp4"
+            job = self._jobs.get(task)
+            if job is None or attempt not in job.attempts:
+                # A copy that lost the race, or a job given up on
+                output.unlink(missing_ok=True)
+                continue
+            job.attempts.pop(attempt)
+            if result.get("status") != "ok":
+                self._failed(job, f"{result.get('worker')}: {result.get('error')}")
+                continue
+            try:
+                ensure_dir(job.output.parent)
+                shutil.move(str(output), str(job.output))
+            except OSError as e:
+                self._failed(job, f"collecting output: {e}")
+                continue
+            self._durations.append(float(result.get("seconds", 0.0)))
+            self._drop(job)
+            job.future.set_result(job.output)
+
+    def _check_running(self) -> None:
+        now = time.monotonic()
+        for path in (self.spool / "running").glob(f"{self.id}-*.json"):
+            task, attempt = _attempt_of(path)
+            job = self._jobs.get(task)
+            if job is None or attempt not in job.attempts:
+                continue
+            state = _read_json(path) or {}
+            job.claimed.setdefault(attempt, now)
+            last = job.attempts[attempt]
+            beat = state.get("beat")
+            if last is None or beat != last[0]:
+                job.attempts[attempt] = (beat, now)
+                if job.on_progress is not None and state.get("fraction"):
+                    job.on_progress(float(state["fraction"]))
+            elif now - last[1] > self.stale_seconds:
+                self._cancel_attempt(job, attempt)
+                path.unlink(missing_ok=True)
+                self._failed(job, f"{state.get('worker', 'worker')} stopped responding")
+
+    def _speculate(self) -> None:
+        if not self._durations or any((self.spool / "tasks").glob("*.json")):
+            return
+        limit = self.speculate_factor * statistics.median(self._durations)
+        now = time.monotonic()
+        for job in list(self._jobs.values()):
+            if job.speculated or len(job.attempts) != 1:
+                continue
+            started = job.claimed.get(next(iter(job.attempts)))
+            if started is not None and now - started > limit:
+                job.speculated = True
+                self._dispatch(job)
+
+
+class Worker:
+    """Takes tasks from ``spool`` one at a time until a ``stop`` file appears."""
+
+    def __init__(self, spool: Path, name: Optional[str] = None, heartbeat: float = HEARTBEAT_SECONDS):
+        self.spool = Path(spool)
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat = heartbeat
+        _prepare_spool(self.spool)
+
+    def run(self, stop: Optional[threading.Event] = None) -> int:
+        """Process tasks until told to stop; returns how many were taken."""
+        stop = stop or threading.Event()
+        taken = 0
+        while not stop.is_set() and not (self.spool / "stop").exists():
+            claimed = self._claim()
+            if claimed is None:
+                stop.wait(POLL_SECONDS)
+                continue
+            self._process(*claimed)
+            taken += 1
+        return taken
+
+    def _claim(self) -> Optional[Tuple[Path, Dict[str, Any]]]:
+        for path in sorted((self.spool / "tasks").glob("*.json")):
+            running = self.spool / "running" / path.name
+            try:
+                os.rename(path, running)
+            except OSError:
+                continue  # another worker got it
+            task = _read_json(running)
+            if task is not None:
+                return running, task
+            running.unlink(missing_ok=True)
+        return None
+
+    def _process(self, running: Path, task: Dict[str, Any]) -> None:
+        name = running.stem
+        cancel_flag = self.spool / "cancel" / name
+        part = self.spool / "outputs" / f"{name}.part.mp4"
+        token = CancelToken()
+        state = {"beat": 0, "fraction": 0.0}
+        finished = threading.Event()
+
+        def beat() -> None:
+            _write_json(running, {**task, "worker": self.name, **state})
+
+        def heartbeat() -> None:
+            while not finished.wait(self.heartbeat):
+                if cancel_flag.exists():
+                    token.cancel()
+                state["beat"] += 1
+                beat()
+
+        beat()
+        beating = threading.Thread(target=heartbeat, daemon=True)
+        beating.start()
+        started = time.monotonic()
+        result: Optional[Dict[str, Any]]
+        try:
+            source = Path(task["source"])
+            cmd = PROFILES[task["profile"]](source, part, **task.get("options", {}))
+            token.run(FFmpegProcess(cmd, probe_duration(source), outputs=[part],
+                                    on_progress=lambda p: state.update(fraction=p.fraction or 0.0)))
+            os.replace(part, self.spool / "outputs" / f"{name}.mp4")
+            result = {"status": "ok"}
+        except ProcessCancelled:
+            result = None
+        except Exception as e:
+            result = {"status": "error", "error": str(e)[-2000:]}
+        finally:
+            finished.set()
+            beating.join()
+        if result is not None:
+            _write_json(self.spool / "done" / f"{name}.json",
+                        {**result, "worker": self.name, "seconds": time.monotonic() - started})
+        running.unlink(missing_ok=True)
+        cancel_flag.unlink(missing_ok=True)
+
+
+class LocalFarm:
+    """A coordinator plus ``workers`` worker processes on this machine, sharing a temporary spool."""
+
+    def __init__(self, workers: int, spool: Optional[Path] = None, **coordinator_options: Any):
+        self._tmp = tempfile.TemporaryDirectory(prefix="video-cli-farm-") if spool is None else None
+        self.spool = Path(self._tmp.name) if self._tmp is not None else Path(spool)
+        _prepare_spool(self.spool)
+        (self.spool / "stop").unlink(missing_ok=True)
+        self.coordinator = Coordinator(self.spool, **coordinator_options)
+        # Make the package importable by module name however it was found
+        root = Path(__file__).resolve().parents[__package__.count(".") + 1]
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(root), os.environ.get("PYTHONPATH")]))}
+        self.processes = [
+            subprocess.Popen([sys.executable, "-m", __name__, "worker", "--spool", str(self.spool),
+                              "--name", f"local-{i}"], env=env, stdin=subprocess.DEVNULL)
+            for i in range(workers)
+        ]
+
+    def close(self) -> None:
+        (self.spool / "stop").touch()
+        self.coordinator.close()
+        for proc in self.processes:
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        if self._tmp is not None:
+            self._tmp.cleanup()
+
+    def __enter__(self) -> "LocalFarm":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description="Normalization worker for a shared spool directory.")
+    sub = p.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="Take normalize tasks from the spool until a stop file appears")
+    worker.add_argument("--spool", type=Path, required=True, help="Spool directory shared with the coordinator")
+    worker.add_argument("--name", default=None, help="Worker name in results (defaults to host-pid)")
+    args = p.parse_args(argv)
+    Worker(args.spool, args.name).run()
+
+
+if __name__ == "__main__":
+    main()
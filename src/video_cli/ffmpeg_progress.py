@@ -0,0 +1,221 @@
+"""Managed FFmpeg processes with live progress, ETA and cancellation.
+
+FFmpeg is started with ``-progress pipe:1`` and its key/value blocks are
+parsed as they arrive; every block becomes a ``Progress`` passed to a
+callback (typically one that puts it on a queue for a UI thread). Cancelling
+kills the whole process tree and deletes the partially written outputs.
+"""
+from __future__ import annotations
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, List, Optional, Set
+
+
+PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats"]
+# Progress on stderr, for commands whose stdout carries media
+STDERR_PROGRESS_ARGS = ["-progress", "pipe:2", "-nostats"]
+_PROGRESS_LINE = re.compile(r"^(frame|fps|stream_\d+_\d+_q|bitrate|total_size|out_time(_us|_ms)?|"
+                            r"dup_frames|drop_frames|speed|progress)=")
+
+
+class ProcessCancelled(Exception):
+    """Raised by ``FFmpegProcess.run`` when the process was cancelled."""
+
+
+@dataclass(frozen=True)
+class Progress:
+    out_time: float  # seconds of output written so far
+    fraction: Optional[float]  # 0..1 when the output duration is known
+    speed: Optional[float]  # media seconds per wall second
+    eta: Optional[float]  # seconds remaining
+    done: bool = False
+
+
+def parse_progress(fields: Dict[str, str], duration: Optional[float], elapsed: float) -> Progress:
+    """Build a ``Progress`` from one ``-progress`` block."""
+    out_time = 0.0
+    for key in ("out_time_us", "out_time_ms"):  # both are microseconds
+        try:
+            out_time = max(0.0, int(fields[key]) / 1_000_000)
+            break
+        except (KeyError, ValueError):
+            continue
+    try:
+        speed: Optional[float] = float(fields.get("speed", "").rstrip("x"))
+    except ValueError:
+        speed = None
+    done = fields.get("progress") == "end"
+    fraction = eta = None
+    if duration and duration > 0:
+        fraction = 1.0 if done else min(1.0, out_time / duration)
+        if done:
+            eta = 0.0
+        elif speed:
+            eta = max(0.0, duration - out_time) / speed
+        elif fraction > 0:
+            eta = elapsed * (1 - fraction) / fraction
+    return Progress(out_time, fraction, speed, eta, done)
+
+
+def _split_progress(lines: Iterable[str], log: Callable[[str], None]) -> Iterable[str]:
+    """Yield the ``-progress`` lines of a mixed stderr stream, passing the rest to ``log``."""
+    for line in lines:
+        if _PROGRESS_LINE.match(line):
+            yield line
+        else:
+            log(line)
+
+
+def kill_process_tree(proc: subprocess.Popen) -> None:
+    """Kill ``proc`` and everything it spawned."""
+    if proc.poll() is not None:
+        return
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    else:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+class FFmpegProcess:
+    """Run one FFmpeg command, reporting progress and honouring ``cancel``.
+
+    ``duration`` is the expected output duration in seconds (for percent and
+    ETA); ``outputs`` are removed if the command fails or is cancelled.
+    ``on_output`` receives FFmpeg's log lines, from a reader thread.
+    With ``stdout`` (a binary file such as ``sys.stdout.buffer``) FFmpeg's
+    own stdout goes there, for commands that write media to ``pipe:1``, and
+    progress is read from stderr instead.
+    """
+
+    def __init__(
+        self,
+        cmd: List[str],
+        duration: Optional[float] = None,
+        outputs: Iterable[Path] = (),
+        on_progress: Optional[Callable[[Progress], None]] = None,
+        cwd: Optional[Path] = None,
+        on_output: Optional[Callable[[str], None]] = None,
+        stdout: Optional[IO[bytes]] = None,
+    ):
+        self.cmd = [cmd[0], *(PROGRESS_ARGS if stdout is None else STDERR_PROGRESS_ARGS), *cmd[1:]]
+        self.duration = duration
+        self.outputs = [Path(p) for p in outputs]
+        self.on_progress = on_progress
+        self.cwd = cwd
+        self.on_output = on_output
+        self.stdout = stdout
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self.cancelled = False
+
+    def run(self) -> None:
+        """Run to completion; raises ``ProcessCancelled`` or ``RuntimeError``."""
+        if os.name == "nt":
+            group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            group = {"start_new_session": True}
+        with self._lock:
+            if self.cancelled:
+                raise ProcessCancelled(self.cmd[-1])
+            self._proc = subprocess.Popen(self.cmd, stdin=subprocess.DEVNULL,
+                                          stdout=subprocess.PIPE if self.stdout is None else self.stdout,
+                                          stderr=subprocess.PIPE, text=True, cwd=self.cwd, **group)
+        proc = self._proc
+        stderr_tail: deque = deque(maxlen=40)
+
+        def log(line: str) -> None:
+            stderr_tail.append(line)
+            if self.on_output is not None:
+                self.on_output(line.rstrip())
+
+        if self.stdout is None:
+            # Drain stderr on the side so a chatty FFmpeg never blocks on a full pipe
+            def read_stderr():
+                for line in proc.stderr:
+                    log(line)
+
+            reader = threading.Thread(target=read_stderr, daemon=True)
+            reader.start()
+            progress_lines = proc.stdout
+        else:
+            reader = None
+            progress_lines = _split_progress(proc.stderr, log)
+
+        started = time.monotonic()
+        fields: Dict[str, str] = {}
+        for line in progress_lines:
+            key, _, value = line.strip().partition("=")
+            fields[key] = value
+            if key == "progress":
+                if self.on_progress is not None:
+                    self.on_progress(parse_progress(fields, self.duration, time.monotonic() - started))
+                fields = {}
+        returncode = proc.wait()
+        if reader is not None:
+            reader.join(1.0)
+
+        if self.cancelled:
+            self._remove_outputs()
+            raise ProcessCancelled(self.cmd[-1])
+        if returncode != 0:
+            self._remove_outputs()
+            raise RuntimeError(f"Command failed ({returncode}): {' '.join(self.cmd)}\nOutput:\n{''.join(stderr_tail)}")
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            if self._proc is not None:
+                kill_process_tree(self._proc)
+
+    def _remove_outputs(self) -> None:
+        for path in self.outputs:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+class CancelToken:
+    """Cancellation shared between a worker and the threads that may cancel it.
+
+    Work checks ``check_cancelled`` between steps and runs FFmpeg through
+    ``run``, so ``cancel`` also kills the processes running at that moment;
+    several threads may run processes under one token.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._processes: Set[FFmpegProcess] = set()
+        self._lock = threading.Lock()
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise ProcessCancelled("cancelled")
+
+    def run(self, process: FFmpegProcess) -> None:
+        with self._lock:
+            self._processes.add(process)
+            if self.cancelled:
+                process.cancel()
+        try:
+            process.run()
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            for process in self._processes:
+                process.cancel()
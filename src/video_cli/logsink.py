@@ -0,0 +1,65 @@
+"""Thread-safe, batched log buffer for the Tk front ends.
+
+Any thread may ``write`` lines. They go to the full log file straight away
+and are queued for the UI, which takes them in batches with ``drain`` from an
+``after()`` timer, so the Tk thread does one widget update per tick however
+chatty FFmpeg is. The widget only keeps ``LOG_SCROLLBACK`` lines; the file
+has everything.
+"""
+from __future__ import annotations
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, List, Optional
+
+from .utils import cache_dir, ensure_dir
+
+
+LOG_SCROLLBACK = 5000  # lines kept in the log widget
+LOG_KEEP_FILES = 20  # session logs kept per prefix
+
+
+def default_log_path(prefix: str = "gui") -> Path:
+    """A new session log under ``cache_dir()/logs``; older sessions beyond ``LOG_KEEP_FILES`` are removed."""
+    directory = cache_dir() / "logs"
+    ensure_dir(directory)
+    old = sorted(directory.glob(f"{prefix}-*.log"))
+    for path in old[:max(0, len(old) - LOG_KEEP_FILES + 1)]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+    return directory / f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}.log"
+
+
+class LogSink:
+    """Lines from any thread to a log file and, in batches, to the UI."""
+
+    def __init__(self, path: Optional[Path] = None, scrollback: int = LOG_SCROLLBACK):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8") if path is not None else None
+        # Lines not shown yet; ones that would scroll straight out of the widget are dropped here
+        self._pending: Deque[str] = deque(maxlen=scrollback)
+        self._lock = threading.Lock()
+
+    def write(self, line: str) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+            self._pending.append(line)
+
+    def drain(self) -> List[str]:
+        """Lines written since the last call (at most ``scrollback``); flushes the file."""
+        with self._lock:
+            lines = list(self._pending)
+            self._pending.clear()
+            if self._file is not None:
+                self._file.flush()
+        return lines
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,200 @@
+"""In-process multi-track audio mixer for live preview.
+
+Each track is decoded by its own FFmpeg process and mixed block by block
+with NumPy: per-track gain, mute, timeline offset and linear fades are one
+vectorized envelope, and the tracks are summed with the same gain law as
+FFmpeg's ``amix`` (normalize=1, default 2 s dropout transition,
+duration=first). ``amix_filter`` builds the equivalent filtergraph for
+export, so what the editor hears is what gets rendered. Settings are read
+on every block, so gain and mute changes are heard within one block.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+
+from .audio_playback import CHANNELS, SAMPLE_BYTES, SAMPLE_RATE, PCMStream
+
+
+DROPOUT_TRANSITION = 2.0  # amix default, seconds
+
+
+@dataclass
+class MixTrack:
+    """One mixer input. ``offset`` is where the track starts on the timeline (seconds)."""
+
+    path: str
+    gain: float = 1.0
+    mute: bool = False
+    offset: float = 0.0
+    fade_in: float = 0.0
+    fade_out: float = 0.0
+    duration: Optional[float] = None  # needed for fade_out
+
+    @property
+    def volume(self) -> float:
+        return 0.0 if self.mute else self.gain
+
+
+class AmixGainLaw:
+    """Per-input scale factors as computed by FFmpeg's ``amix`` with equal weights.
+
+    Every input starts scaled by ``1/n``. When inputs end, the remaining ones
+    are brought up to ``1/active`` gradually: the normalization divisor falls
+    by one every ``dropout_transition`` seconds.
+    """
+
+    def __init__(self, inputs: int, sample_rate: int = SAMPLE_RATE, dropout_transition: float = DROPOUT_TRANSITION):
+        self.sample_rate = sample_rate
+        self.dropout_transition = dropout_transition
+        self.active = np.ones(inputs, dtype=bool)
+        self.scale_norm = np.full(inputs, float(inputs))
+
+    def end(self, index: int) -> None:
+        self.active[index] = False
+
+    def scales(self, nb_samples: int) -> np.ndarray:
+        weight_sum = float(self.active.sum())
+        step = nb_samples / (self.dropout_transition * self.sample_rate)
+        falling = self.active & (self.scale_norm > weight_sum)
+        self.scale_norm[falling] = np.maximum(self.scale_norm[falling] - step, weight_sum)
+        return np.where(self.active, 1.0 / self.scale_norm, 0.0)
+
+
+def track_envelope(track: MixTrack, local_start: float, nb_samples: int, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Gain for each sample of a block starting ``local_start`` seconds into the track."""
+    t = local_start + np.arange(nb_samples, dtype=np.float64) / sample_rate
+    envelope = np.full(nb_samples, track.volume, dtype=np.float64)
+    if track.fade_in > 0:
+        envelope *= np.clip(t / track.fade_in, 0.0, 1.0)
+    if track.fade_out > 0 and track.duration:
+        envelope *= np.clip((track.duration - t) / track.fade_out, 0.0, 1.0)
+    return envelope
+
+
+def mix_blocks(blocks: np.ndarray, envelopes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Mix ``(inputs, samples, channels)`` int16 blocks into one int16 block."""
+    coeff = (envelopes * scales[:, None]).astype(np.float32)
+    mixed = np.einsum("isc,is->sc", blocks.astype(np.float32), coeff)
+    return np.clip(np.rint(mixed), -32768, 32767).astype(np.int16)
+
+
+def amix_filter(labels: Sequence[str], tracks: Sequence[Optional[MixTrack]], output: str = "[a]") -> str:
+    """Export filtergraph applying each track's settings and mixing like ``MixerStream``.
+
+    ``labels`` are input pads such as ``"[1:a]"``; a ``None`` track passes
+    through unchanged (e.g. the clip audio).
+    """
+    chains, pads = [], []
+    for i, (label, track) in enumerate(zip(labels, tracks)):
+        if track is None:
+            pads.append(label)
+            continue
+        steps = [f"volume={track.volume:.4f}"]
+        if track.fade_in > 0:
+            steps.append(f"afade=t=in:st=0:d={track.fade_in:.3f}")
+        if track.fade_out > 0 and track.duration:
+            steps.append(f"afade=t=out:st={max(0.0, track.duration - track.fade_out):.3f}:d={track.fade_out:.3f}")
+        if track.offset > 0:
+            steps.append(f"adelay={int(round(track.offset * 1000))}:all=1")
+        elif track.offset < 0:
+            steps.append(f"atrim=start={-track.offset:.3f},asetpts=PTS-STARTPTS")
+        pad = f"[mix{i}]"
+        chains.append(f"{label}{','.join(steps)}{pad}")
+        pads.append(pad)
+    if len(pads) == 1:
+        return ";".join(chains + [f"{pads[0]}anull{output}"])
+    return ";".join(chains + [f"{''.join(pads)}amix=inputs={len(pads)}:duration=first{output}"])
+
+
+class _TrackReader:
+    """Decoded PCM of one track from a timeline position, with leading silence before its offset."""
+
+    def __init__(self, track: MixTrack, timeline_start: float, open_stream: Callable[[Path, float], Any],
+                 sample_rate: int, frame_bytes: int):
+        self.track = track
+        local = timeline_start - track.offset
+        self._silence = int(round(max(0.0, -local) * sample_rate)) * frame_bytes
+        self._stream = open_stream(Path(track.path), max(0.0, local))
+        self.local_start = local
+        self.finished = False
+
+    def read(self, size: int) -> bytes:
+        silence = min(self._silence, size)
+        self._silence -= silence
+        data = b"\0" * silence
+        while len(data) < size and not self.finished:
+            chunk = self._stream.read(size - len(data))
+            if not chunk:
+                self.finished = True
+                break
+            data += chunk
+        return data
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+class MixerStream:
+    """``PCMStream``-compatible source that mixes ``tracks`` from ``timeline_start`` on.
+
+    ``read`` returns interleaved s16le blocks; the stream ends when the first
+    track ends (``duration=first``), as at export.
+    """
+
+    def __init__(
+        self,
+        tracks: Sequence[MixTrack],
+        timeline_start: float,
+        sample_rate: int = SAMPLE_RATE,
+        channels: int = CHANNELS,
+        open_stream: Optional[Callable[[Path, float], Any]] = None,
+    ):
+        if not tracks:
+            raise ValueError("MixerStream needs at least one track")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._frame_bytes = channels * SAMPLE_BYTES
+        open_stream = open_stream or (lambda path, seconds: PCMStream([(path, seconds)], sample_rate, channels))
+        self._readers = [_TrackReader(t, timeline_start, open_stream, sample_rate, self._frame_bytes) for t in tracks]
+        self._law = AmixGainLaw(len(tracks), sample_rate)
+        self._position = 0  # samples mixed so far
+        self._ended = False
+
+    def read(self, size: int) -> bytes:
+        if self._ended:
+            return b""
+        nb_samples = size // self._frame_bytes
+        if nb_samples <= 0:
+            return b""
+        wanted = nb_samples * self._frame_bytes
+        raw = [reader.read(wanted) for reader in self._readers]
+        # duration=first: stop where the first track stops
+        if len(raw[0]) < wanted:
+            self._ended = True
+            nb_samples = len(raw[0]) // self._frame_bytes
+            if nb_samples == 0:
+                return b""
+            wanted = nb_samples * self._frame_bytes
+        blocks = np.zeros((len(raw), nb_samples, self.channels), dtype=np.int16)
+        for i, data in enumerate(raw):
+            data = data[:wanted]
+            usable = len(data) - len(data) % self._frame_bytes
+            if usable:
+                blocks[i, :usable // self._frame_bytes] = np.frombuffer(data[:usable], dtype="<i2").reshape(-1, self.channels)
+        seconds = self._position / self.sample_rate
+        envelopes = np.stack([
+            track_envelope(r.track, r.local_start + seconds, nb_samples, self.sample_rate) for r in self._readers
+        ])
+        out = mix_blocks(blocks, envelopes, self._law.scales(nb_samples))
+        for i, data in enumerate(raw):
+            if len(data) < wanted:
+                self._law.end(i)
+        self._position += nb_samples
+        return out.astype("<i2").tobytes()
+
+    def close(self) -> None:
+        for reader in self._readers:
+            reader.close()
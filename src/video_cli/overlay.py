@@ -0,0 +1,115 @@
+"""Cached subtitle sprites and vectorized alpha blending for the preview.
+
+Rendering text with PIL is far more expensive than blending a ready-made
+RGBA image, and subtitle text changes only a few times per minute. Sprites are
+therefore rendered once per (text, style), stored premultiplied, and blended
+onto each NumPy frame with a single vectorized operation.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+@dataclass(frozen=True)
+class SubtitleStyle:
+    font_file: Optional[str] = None
+    font_size: int = 24
+    color: str = "#FFFFFF"
+    outline_color: str = "#000000"
+    outline_width: int = 1
+
+
+@dataclass(frozen=True)
+class SubtitleSprite:
+    """RGBA text image prepared for blending: ``premult = rgb * alpha``, ``inv_alpha = 255 - alpha``."""
+
+    premult: np.ndarray
+    inv_alpha: np.ndarray
+
+    @property
+    def width(self) -> int:
+        return self.premult.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.premult.shape[0]
+
+    @classmethod
+    def from_image(cls, image: Image.Image) -> "SubtitleSprite":
+        rgba = np.asarray(image.convert("RGBA"), dtype=np.uint16)
+        alpha = rgba[:, :, 3:4]
+        return cls(premult=rgba[:, :, :3] * alpha, inv_alpha=255 - alpha)
+
+
+@lru_cache(maxsize=32)
+def load_font(font_file: Optional[str], size: int):
+    """Load a TrueType font once per (file, size), falling back to PIL's default."""
+    try:
+        if font_file and Path(font_file).exists():
+            return ImageFont.truetype(font_file, size)
+    except OSError:
+        pass
+    return ImageFont.load_default()
+
+
+def render_subtitle_sprite(text: str, style: SubtitleStyle) -> SubtitleSprite:
+    """Render centered, outlined text tightly cropped to its bounding box."""
+    font = load_font(style.font_file, style.font_size)
+    probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = probe.multiline_textbbox(
+        (0, 0), text, font=font, stroke_width=style.outline_width, align="center"
+    )
+    image = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+    ImageDraw.Draw(image).multiline_text(
+        (-left, -top), text, font=font, fill=style.color, align="center",
+        stroke_width=style.outline_width, stroke_fill=style.outline_color,
+    )
+    return SubtitleSprite.from_image(image)
+
+
+class SpriteCache:
+    """LRU of rendered sprites keyed by text and style."""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._sprites: "OrderedDict[Tuple[str, SubtitleStyle], SubtitleSprite]" = OrderedDict()
+
+    def get(self, text: str, style: SubtitleStyle) -> SubtitleSprite:
+        key = (text, style)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = render_subtitle_sprite(text, style)
+            self._sprites[key] = sprite
+            if len(self._sprites) > self.max_entries:
+                self._sprites.popitem(last=False)
+        else:
+            self._sprites.move_to_end(key)
+        return sprite
+
+    def __len__(self) -> int:
+        return len(self._sprites)
+
+
+def blend_sprite(frame: np.ndarray, sprite: SubtitleSprite, x: int, y: int) -> np.ndarray:
+    """Alpha-blend ``sprite`` onto an RGB ``uint8`` frame in place at ``(x, y)``.
+
+    The sprite is clipped to the frame; the blended frame is returned.
+    """
+    h, w = frame.shape[:2]
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(w, x + sprite.width), min(h, y + sprite.height)
+    if x0 >= x1 or y0 >= y1:
+        return frame
+    sx, sy = x0 - x, y0 - y
+    premult = sprite.premult[sy:sy + (y1 - y0), sx:sx + (x1 - x0)]
+    inv_alpha = sprite.inv_alpha[sy:sy + (y1 - y0), sx:sx + (x1 - x0)]
+    region = frame[y0:y1, x0:x1]
+    # (dst * (255 - a) + src * a) / 255 with rounding, all in uint16
+    region[:] = (region * inv_alpha + premult + 127) // 255
+    return frame
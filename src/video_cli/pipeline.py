@@ -1,85 +1,270 @@
 from __future__ import annotations
 import shutil
+import stat
 import subprocess
+import sys
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 import tempfile
+import json
 import os
 
+from .catalog import MediaCatalog
+from .ffmpeg_progress import CancelToken
 from .srt_utils import merge_srts_for_videos, write_srt
+from .stages import PipelineEvent, PlannedStage, Stage, StageCache, StageContext, StageGraph
 from .stt_google import transcribe_to_srt
+from .targets import (AUDIO, COPY, DEFAULT_CAPS, TRANSCODE, Caps, ClipFormat, NormalizeTarget, plan_actions,
+                      plan_target)
 from .utils import find_files_sorted, ensure_dir, pick_bgm_file
 
+if TYPE_CHECKING:
+    from .farm import Coordinator
+    from .previews import Previews
+    from .renditions import Rendition
+
 
 FFMPEG = shutil.which("ffmpeg") or "ffmpeg"
 FFPROBE = shutil.which("ffprobe") or "ffprobe"
 
-
-def run(cmd: List[str]) -> None:
-    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+# How the final file is written: as FFmpeg left it, remuxed with the index up
+# front, or as fragments a reader can consume while it is still being written
+OUTPUT_MODES = ("mp4", "faststart", "fragmented")
+_MOVFLAGS = {"faststart": "+faststart", "fragmented": "+frag_keyframe+empty_moov+default_base_moof"}
+STDOUT = Path("-")
+
+# x264 settings for the delivered video, and for the one intermediate that is encoded again:
+# normalized clips, when subtitles are burned in afterwards
+VIDEO_ENCODERS = {
+    "delivery": ["-c:v", "libx264", "-preset", "medium", "-crf", "20"],
+    "lossless": ["-c:v", "libx264", "-preset", "ultrafast", "-qp", "0"],
+}
+# "lossless" normalizes clips losslessly when the burn-in encodes them again, so only the burn-in
+# loses quality; "quality" normalizes with the delivery settings regardless, as before the policy
+# existed. Renditions do not count as encoding again: the joined video is also delivered as the
+# main output, so it is always encoded with the delivery settings when nothing burns in.
+INTERMEDIATE_POLICIES = ("lossless", "quality")
+
+
+def run(cmd: List[str], cwd: Optional[Path] = None) -> None:
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, cwd=cwd)
     if proc.returncode != 0:
         raise RuntimeError(f"Command failed ({proc.returncode}): {' '.join(cmd)}\nOutput:\n{proc.stdout}")
 
 
-def probe_duration(path: Path) -> float:
-    cmd = [
-        FFPROBE, "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", str(path)
-    ]
-    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+def probe_media(path: Path, catalog: Optional[MediaCatalog] = None) -> dict:
+    """Return ffprobe format/stream metadata, served from ``catalog`` when indexed."""
+    if catalog is not None:
+        fp = catalog.fingerprint(path)
+        cached = catalog.get(fp, "probe")
+        if cached is not None and not _probed_before_extradata_hash(cached):
+            return cached
+    # The extradata hash tells whether H.264 clips were encoded alike (see targets.plan_actions)
+    cmd = [FFPROBE, "-v", "error", "-show_format", "-show_streams", "-show_data_hash", "md5", "-of", "json", str(path)]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     if proc.returncode != 0:
-        raise RuntimeError(f"ffprobe failed for {path}: {proc.stdout}")
+        raise RuntimeError(f"ffprobe failed for {path}: {proc.stderr}")
+    info = json.loads(proc.stdout or "{}")
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "video":
+            # Annex B H.264 has no extradata; record that so the cached probe is not taken as stale
+            stream.setdefault("extradata_hash", None)
+    if catalog is not None:
+        video = next((s for s in info.get("streams", []) if s.get("codec_type") == "video"), None)
+        catalog.update(
+            fp,
+            probe=info,
+            duration=_duration_from_probe(info),
+            has_audio=int(any(s.get("codec_type") == "audio" for s in info.get("streams", []))),
+            width=video.get("width") if video else None,
+            height=video.get("height") if video else None,
+            fps=_parse_rate(video.get("avg_frame_rate")) if video else None,
+        )
+    return info
+
+
+def _probed_before_extradata_hash(info: dict) -> bool:
+    # Probes cached before the hash was recorded have no key at all; a missing hash is stored as None
+    return any(s.get("codec_type") == "video" and "extradata_hash" not in s for s in info.get("streams", []))
+
+
+def _duration_from_probe(info: dict) -> float:
     try:
-        return float(proc.stdout.strip())
-    except ValueError:
+        return float(info.get("format", {}).get("duration", 0.0))
+    except (TypeError, ValueError):
         return 0.0
 
 
+def _parse_rate(rate: Optional[str]) -> Optional[float]:
+    # ffprobe reports frame rates as "num/den"
+    if not rate:
+        return None
+    num, _, den = rate.partition("/")
+    try:
+        value = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return value or None
+
+
+def probe_duration(path: Path, catalog: Optional[MediaCatalog] = None) -> float:
+    if catalog is not None:
+        cached = catalog.get(path, "duration")
+        if cached is not None:
+            return cached
+    return _duration_from_probe(probe_media(path, catalog))
+
+
+def probe_loudness(path: Path, catalog: Optional[MediaCatalog] = None) -> dict:
+    """Measure integrated loudness (EBU R128) with the loudnorm analysis pass."""
+    if catalog is not None:
+        cached = catalog.get(path, "loudness")
+        if cached is not None:
+            return cached
+    cmd = [FFMPEG, "-hide_banner", "-nostats", "-i", str(path), "-vn",
+           "-af", "loudnorm=print_format=json", "-f", "null", "-"]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Loudness analysis failed for {path}: {proc.stdout}")
+    # loudnorm prints its JSON summary as the last {...} block of the log
+    start, end = proc.stdout.rfind("{"), proc.stdout.rfind("}")
+    if start < 0 or end < start:
+        raise RuntimeError(f"No loudness summary in ffmpeg output for {path}")
+    stats = {k: float(v) for k, v in json.loads(proc.stdout[start:end + 1]).items()
+             if k.startswith("input_")}
+    if catalog is not None:
+        catalog.update(path, loudness=stats)
+    return stats
+
+
+def probe_keyframes(path: Path, catalog: Optional[MediaCatalog] = None) -> List[float]:
+    """Return keyframe timestamps (seconds) of the first video stream from packet flags."""
+    if catalog is not None:
+        cached = catalog.get(path, "keyframes")
+        if cached is not None:
+            return cached
+    cmd = [FFPROBE, "-v", "error", "-select_streams", "v:0",
+           "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", str(path)]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for {path}: {proc.stderr}")
+    keyframes = []
+    for line in proc.stdout.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            keyframes.append(float(pts))
+    keyframes.sort()
+    if catalog is not None:
+        catalog.update(path, keyframes=keyframes)
+    return keyframes
+
+
+def extract_thumbnail(path: Path, time_s: float, width: int = 160,
+                      catalog: Optional[MediaCatalog] = None, source: Optional[Path] = None) -> bytes:
+    """Return a JPEG thumbnail of ``path`` at ``time_s`` scaled to ``width`` pixels.
+
+    ``source`` is decoded instead of ``path`` when given (e.g. a proxy with the
+    same timing); the result is still cached under ``path``.
+    """
+    if catalog is not None:
+        cached = catalog.get_thumbnail(path, time_s, width)
+        if cached is not None:
+            return cached
+    cmd = [FFMPEG, "-v", "error", "-ss", f"{max(0.0, time_s):.3f}", "-i", str(source or path),
+           "-frames:v", "1", "-vf", f"scale={width}:-2", "-f", "image2pipe", "-c:v", "mjpeg", "-"]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0 or not proc.stdout:
+        raise RuntimeError(f"Thumbnail extraction failed for {path}: {proc.stderr.decode(errors='ignore')}")
+    if catalog is not None:
+        catalog.put_thumbnail(path, time_s, width, proc.stdout)
+    return proc.stdout
+
+
 def build_concat_file(videos: List[Path], concat_list_path: Path) -> None:
     with concat_list_path.open("w", encoding="utf-8") as f:
         for v in videos:
             f.write(f"file '{v.as_posix()}'\n")
 
 
-def normalize_video(input_path: Path, output_path: Path) -> None:
+def normalize_cmd(input_path: Path, output_path: Path, target: Optional[NormalizeTarget] = None,
+                  action: str = TRANSCODE, encoder: str = "delivery") -> List[str]:
+    """FFmpeg command bringing ``input_path`` to ``target`` by ``action`` (see ``targets.plan_actions``).
+
+    Without ``target`` each clip is capped at 1080p, 30fps and stereo on its own.
+    ``encoder`` names the ``VIDEO_ENCODERS`` settings used when the video is re-encoded.
+    """
+    if target is not None:
+        streams = ["-map", "0:v:0", "-map", "0:a:0?"]
+        audio = ["-c:a", "aac", "-b:a", "192k", "-ar", str(target.sample_rate), "-ac", str(target.channels)]
+        if action == COPY:
+            return [FFMPEG, "-y", "-i", str(input_path), *streams, "-c", "copy", str(output_path)]
+        if action == AUDIO:
+            return [FFMPEG, "-y", "-i", str(input_path), *streams, "-c:v", "copy", *audio, str(output_path)]
+        w, h = target.width, target.height
+        # Letterbox into the common frame rather than stretch
+        vf = (f"scale={w}:{h}:force_original_aspect_ratio=decrease:force_divisible_by=2,"
+              f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={target.fps},format={target.pix_fmt}")
+        return [FFMPEG, "-y", "-i", str(input_path), *streams, "-vf", vf,
+                *VIDEO_ENCODERS[encoder], *audio, str(output_path)]
     # Re-encode to a common format (H.264/AAC), 1080p max, 30fps, 2ch
-    cmd = [
+    return [
         FFMPEG, "-y",
         "-i", str(input_path),
         "-vf", "scale='min(1920,iw)':'min(1080,ih)':force_original_aspect_ratio=decrease,fps=30,format=yuv420p",
-        "-c:v", "libx264", "-preset", "medium", "-crf", "20",
+        *VIDEO_ENCODERS[encoder],
         "-c:a", "aac", "-b:a", "192k", "-ac", "2",
         str(output_path),
     ]
-    run(cmd)
 
 
-def concat_videos(videos: List[Path], tmpdir: Path, output_path: Path) -> Path:
+def normalize_video(input_path: Path, output_path: Path, runner: Callable[..., None] = run,
+                    target: Optional[NormalizeTarget] = None, action: str = TRANSCODE,
+                    encoder: str = "delivery") -> None:
+    runner(normalize_cmd(input_path, output_path, target, action, encoder))
+
+
+def concat_videos(videos: List[Path], tmpdir: Path, output_path: Path, runner: Callable[..., None] = run) -> Path:
     # Normalize first to avoid concat issues
     norm_paths: List[Path] = []
     for i, v in enumerate(videos):
         norm = tmpdir / f"norm_{i:03d}.mp4"
-        normalize_video(v, norm)
+        normalize_video(v, norm, runner)
         norm_paths.append(norm)
+    return concat_normalized(norm_paths, tmpdir, output_path, runner)
+
 
+def concat_normalized(norm_paths: List[Path], tmpdir: Path, output_path: Path,
+                      runner: Callable[..., None] = run, encoder: str = "delivery") -> Path:
+    """Join clips already in the common format from ``normalize_video``.
+
+    ``encoder`` is used only if the clips cannot be joined by stream copy.
+    """
     concat_list = tmpdir / "concat.txt"
     build_concat_file(norm_paths, concat_list)
 
     cmd = [FFMPEG, "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list), "-c", "copy", str(output_path)]
     # If copy fails due to slight mismatches, re-encode on concat
     try:
-        run(cmd)
+        runner(cmd)
     except RuntimeError:
         cmd = [
             FFMPEG, "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list),
-            "-c:v", "libx264", "-preset", "medium", "-crf", "20",
+            *VIDEO_ENCODERS[encoder],
             "-c:a", "aac", "-b:a", "192k", "-ac", "2",
             str(output_path),
         ]
-        run(cmd)
+        runner(cmd)
     return output_path
 
 
-def mix_bgm(video_path: Path, bgm_path: Path, out_path: Path, bgm_volume: float = 0.15) -> Path:
+def mix_bgm(video_path: Path, bgm_path: Path, out_path: Path, bgm_volume: float = 0.15,
+            runner: Callable[..., None] = run, mode: Optional[str] = None,
+            extra_args: Optional[List[str]] = None) -> Path:
+    """Mix ``bgm_path`` under the audio of ``video_path``.
+
+    With an output ``mode`` the result is written as MP4 in that mode, so
+    ``out_path`` may be ``-`` for stdout; ``extra_args`` add outputs after it.
+    """
     # duck original audio if too loud? For now, just mix with set volume and trim bgm via adelay/atrim
     # Use shortest to cut bgm when video ends
     vol = max(0.0, min(2.0, bgm_volume))
@@ -93,13 +278,14 @@ def mix_bgm(video_path: Path, bgm_path: Path, out_path: Path, bgm_volume: float
         "-map", "[aout]",
         "-c:v", "copy",
         "-c:a", "aac", "-b:a", "192k",
-        str(out_path),
+        *(output_args(out_path, mode) if mode else [str(out_path)]),
+        *(extra_args or []),
     ]
-    run(cmd)
+    runner(cmd)
     return out_path
 
 
-def add_subtitles_soft(input_video: Path, srt_file: Path, out_path: Path) -> Path:
+def add_subtitles_soft(input_video: Path, srt_file: Path, out_path: Path, runner: Callable[..., None] = run) -> Path:
     cmd = [
         FFMPEG, "-y",
         "-i", str(input_video),
@@ -111,7 +297,7 @@ def add_subtitles_soft(input_video: Path, srt_file: Path, out_path: Path) -> Pat
         "-map", "1:s:0?",
         str(out_path),
     ]
-    run(cmd)
+    runner(cmd)
     return out_path
 
 
@@ -123,44 +309,88 @@ def _escape_path_for_subtitles_filter(p: Path) -> str:
     return s
 
 
-def add_subtitles_burn(input_video: Path, srt_file: Path, out_path: Path) -> Path:
+def add_subtitles_burn(input_video: Path, srt_file: Path, out_path: Path, runner: Callable[..., None] = run,
+                       extra_args: Optional[List[str]] = None, mode: Optional[str] = None,
+                       scratch: Optional[Path] = None) -> Path:
+    """Re-encode ``input_video`` with ``srt_file`` drawn on it; ``extra_args`` add outputs after ``out_path``.
+
+    With an output ``mode`` the result is written as MP4 in that mode, so
+    ``out_path`` may be ``-`` for stdout or a pipe. ``scratch`` is where a
+    copy of the subtitles may be written, by default next to ``out_path``.
+    """
     # Use libass filter instead of subtitles for better Windows compatibility
     srt_path = str(srt_file.resolve()).replace("\\", "/")
     cmd = [
         FFMPEG, "-y",
         "-i", str(input_video),
         "-vf", f"ass='{srt_path}'",
-        "-c:v", "libx264", "-preset", "medium", "-crf", "20",
+        *VIDEO_ENCODERS["delivery"],
         "-c:a", "copy",
-        str(out_path),
+        *(output_args(out_path, mode) if mode else [str(out_path)]),
+        *(extra_args or []),
     ]
-    # If ass filter fails, try subtitles with file input
-    try:
-        run(cmd)
-    except RuntimeError:
+    # If ass filter fails, try subtitles with file input. A pipe cannot be written twice, so
+    # streams go straight to the fallback.
+    fallback = is_stream_output(out_path)
+    if not fallback:
+        try:
+            runner(cmd)
+        except RuntimeError:
+            fallback = True
+    if fallback:
         # Fallback: copy SRT to a simple filename and use that
-        simple_srt = out_path.parent / "subs.srt"
+        simple_srt = (scratch or out_path.parent) / "subs.srt"
         shutil.copy2(srt_file, simple_srt)
         cmd = [
             FFMPEG, "-y",
-            "-i", str(input_video),
+            "-i", str(input_video.resolve()),
             "-vf", f"subtitles={simple_srt.name}",
-            "-c:v", "libx264", "-preset", "medium", "-crf", "20",
+            *VIDEO_ENCODERS["delivery"],
             "-c:a", "copy",
-            str(out_path),
+            *(output_args(out_path if out_path == STDOUT else out_path.resolve(), mode) if mode
+              else [str(out_path.resolve())]),
+            *(extra_args or []),
         ]
-        # Change working directory to temp dir for relative path
-        import os
-        old_cwd = os.getcwd()
-        try:
-            os.chdir(simple_srt.parent)
-            run(cmd)
-        finally:
-            os.chdir(old_cwd)
+        # Run from the subtitle's directory for the relative path; never chdir, other threads share the cwd
+        runner(cmd, cwd=simple_srt.parent)
     return out_path
 
 
-def run_pipeline(
+def is_stream_output(path: Path) -> bool:
+    """True for stdout (``-``) and named pipes, which can only be written front to back."""
+    if Path(path) == STDOUT or str(path).startswith("\\\\.\\pipe\\"):
+        return True
+    try:
+        return stat.S_ISFIFO(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def output_args(out_path: Path, mode: str) -> List[str]:
+    """FFmpeg arguments writing MP4 in output ``mode`` to ``out_path`` (``-`` for stdout)."""
+    return [
+        *(["-movflags", _MOVFLAGS[mode]] if mode in _MOVFLAGS else []),
+        "-f", "mp4",
+        "pipe:1" if Path(out_path) == STDOUT else str(out_path),
+    ]
+
+
+def build_output_cmd(input_video: Path, out_path: Path, mode: str) -> List[str]:
+    """Stream-copy ``input_video`` to ``out_path`` (``-`` for stdout) in output ``mode``."""
+    return [FFMPEG, "-y", "-i", str(input_video), "-map", "0", "-c", "copy", *output_args(out_path, mode)]
+
+
+def _publish(path: Path, folder: Path) -> Path:
+    """Move a finished file or folder into ``folder``, replacing an earlier one."""
+    target = folder / path.name
+    if target.is_dir():
+        shutil.rmtree(target)
+    ensure_dir(folder)
+    shutil.move(str(path), str(target))
+    return target
+
+
+def _pipeline_graph(
     video_dir: Path,
     caption_dir: Path,
     bgm_dir: Path,
@@ -173,108 +403,404 @@ def run_pipeline(
     generate_captions: bool,
     language: str,
     sample_rate: int,
-    keep_temp: bool,
-) -> Path:
-    ensure_dir(output_dir)
-
+    catalog: Optional[MediaCatalog] = None,
+    renditions: Optional[List["Rendition"]] = None,
+    hls: bool = False,
+    output_mode: Optional[str] = None,
+    farm: Optional["Coordinator"] = None,
+    previews: Optional["Previews"] = None,
+    caps: Optional[Caps] = None,
+    intermediates: str = "lossless",
+) -> Tuple[StageGraph, Dict[str, Any], Path]:
+    """The stages of one run, its source artifacts and the output path."""
     videos = find_files_sorted(video_dir, exts)
     if not videos:
         raise FileNotFoundError(f"No input videos found in {video_dir}")
 
     out_video = output_file or (output_dir / "merged.mp4")
-
-    with tempfile.TemporaryDirectory() as td:
-        tmpdir = Path(td)
-        merged = tmpdir / "merged.mp4"
-        concat_videos(videos, tmpdir, merged)
-
-        # Captions handling
-        srt_path: Optional[Path] = None
-        # Merge SRTs per video using cumulative durations for accurate offsets
-        srt_merged = tmpdir / "merged.srt"
-        durations = [probe_duration(v) for v in videos]
-        all_srt = []
-        any_srt = False
-        cum = 0.0
-        for v, d in zip(videos, durations):
-            sp = caption_dir / f"{v.stem}.srt"
-            if sp.exists():
-                from .srt_utils import read_srt, shift_subtitles
-                subs = read_srt(sp)
-                shifted = shift_subtitles(subs, cum)
-                all_srt.extend(shifted)
-                any_srt = True
-            cum += max(0.0, d)
-        if any_srt:
-            write_srt(all_srt, srt_merged)
-            srt_path = srt_merged
-        elif (caption_dir / "combined.srt").exists():
-            shutil.copy2(caption_dir / "combined.srt", srt_merged)
-            srt_path = srt_merged
-        elif generate_captions:
-            # Extract audio and call Google STT
-            audio_wav = tmpdir / "audio.wav"
-            cmd = [
-                FFMPEG, "-y", "-i", str(merged),
+    streaming = is_stream_output(out_video)
+    mode = output_mode or ("fragmented" if streaming else "mp4")
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {mode!r}; expected one of {', '.join(OUTPUT_MODES)}")
+    if streaming and mode != "fragmented":
+        raise ValueError(f"{out_video} is a pipe; only fragmented output can be streamed")
+    if intermediates not in INTERMEDIATE_POLICIES:
+        raise ValueError(f"Unknown intermediate policy {intermediates!r}; "
+                         f"expected one of {', '.join(INTERMEDIATE_POLICIES)}")
+    # Side outputs are named after the output file, or "merged" in the output folder when streaming to stdout
+    base = output_dir / "merged.mp4" if out_video == STDOUT else out_video
+
+    # Durations weight the stages so progress can be reported against the whole run
+    durations = [probe_duration(v, catalog) for v in videos]
+    total = sum(max(0.0, d) for d in durations)
+    copy_weight = 0.05 * total
+    srt_files = [caption_dir / f"{v.stem}.srt" for v in videos]
+    combined_srt = caption_dir / "combined.srt"
+    if bgm_file and bgm_file.exists():
+        bgm = bgm_file
+    else:
+        bgm = pick_bgm_file(bgm_dir)
+
+    # The common format most clips already have, so a batch already in it is copied rather than re-encoded
+    formats = [ClipFormat.from_probe(probe_media(v, catalog)) for v in videos]
+    target = plan_target(formats, caps or DEFAULT_CAPS)
+    actions = plan_actions(formats, target)
+    # Burning in subtitles encodes the joined video again and is then the delivery encode;
+    # without it, normalizing (or a failed concat copy) encodes the delivered main output, even
+    # when renditions are encoded from it as well
+    has_captions = any(sp.exists() for sp in srt_files) or combined_srt.exists() or generate_captions
+    reencoded_later = burn_in and has_captions
+    encoder = "lossless" if reencoded_later and intermediates == "lossless" else "delivery"
+
+    graph = StageGraph()
+    sources: Dict[str, Any] = {}
+
+    def normalize(i: int) -> Callable[[StageContext], Dict[str, Any]]:
+        def run_stage(ctx: StageContext) -> Dict[str, Any]:
+            norm = ctx.workdir / f"norm_{i:03d}.mp4"
+            # Copies are cheaper here than a round trip through the spool
+            if farm is not None and actions[i] != COPY:
+                farm.normalize(ctx[f"clip_{i}"], norm, ctx.cancel, ctx.report,
+                               options={"target": target.to_dict(), "action": actions[i], "encoder": encoder})
+            else:
+                normalize_video(ctx[f"clip_{i}"], norm, ctx.run, target, actions[i], encoder)
+            return {f"norm_{i}": norm}
+        return run_stage
+
+    verbs = {COPY: "Copying", AUDIO: "Re-encoding audio of", TRANSCODE: "Normalizing"}
+    for i, (v, d) in enumerate(zip(videos, durations)):
+        sources[f"clip_{i}"] = v
+        graph.add(Stage(f"normalize[{i}]", normalize(i), inputs=(f"clip_{i}",), outputs={f"norm_{i}": Path},
+                        params={"target": target.to_dict(), "action": actions[i],
+                                **({"encoder": encoder} if actions[i] == TRANSCODE else {})},
+                        group="normalize",
+                        label=f"{verbs[actions[i]]} {v.name} ({i + 1}/{len(videos)})",
+                        weight=max(0.0, d) * (1.0 if actions[i] == TRANSCODE else 0.1), duration=d))
+
+    def concat(ctx: StageContext) -> Dict[str, Any]:
+        merged = ctx.workdir / "merged.mp4"
+        concat_normalized([ctx[f"norm_{i}"] for i in range(len(videos))], ctx.workdir, merged, ctx.run, encoder)
+        return {"merged": merged}
+
+    graph.add(Stage("concat", concat, inputs=tuple(f"norm_{i}" for i in range(len(videos))),
+                    outputs={"merged": Path}, params={"encoder": encoder}, label=f"Joining {len(videos)} clips",
+                    weight=copy_weight, duration=total))
+
+    # Captions: per-video SRTs, else a combined SRT, else speech-to-text
+    if any(sp.exists() for sp in srt_files):
+        def merge_captions(ctx: StageContext) -> Dict[str, Any]:
+            from .srt_utils import read_srt, shift_subtitles
+            # Merge SRTs per video using cumulative durations for accurate offsets
+            all_srt = []
+            cum = 0.0
+            for sp, d in zip(ctx["captions"], durations):
+                if sp.exists():
+                    all_srt.extend(shift_subtitles(read_srt(sp), cum))
+                cum += max(0.0, d)
+            srt = ctx.workdir / "merged.srt"
+            write_srt(all_srt, srt)
+            return {"srt": srt}
+
+        sources["captions"] = srt_files
+        graph.add(Stage("captions", merge_captions, inputs=("captions",), outputs={"srt": Path},
+                        params={"durations": durations}))
+    elif combined_srt.exists():
+        def copy_captions(ctx: StageContext) -> Dict[str, Any]:
+            srt = ctx.workdir / "merged.srt"
+            shutil.copy2(ctx["combined_srt"], srt)
+            return {"srt": srt}
+
+        sources["combined_srt"] = combined_srt
+        graph.add(Stage("captions", copy_captions, inputs=("combined_srt",), outputs={"srt": Path}))
+    elif generate_captions:
+        def transcribe(ctx: StageContext) -> Dict[str, Any]:
+            audio_wav = ctx.workdir / "audio.wav"
+            ctx.run([
+                FFMPEG, "-y", "-i", str(ctx["merged"]),
                 "-ac", "1", "-ar", str(sample_rate), "-vn",
                 str(audio_wav),
-            ]
-            run(cmd)
-            srt_text = transcribe_to_srt(audio_wav, language=language, sample_rate=sample_rate)
-            write_srt(srt_text, srt_merged)
-            srt_path = srt_merged
-
-        # BGM selection
-        if bgm_file and bgm_file.exists():
-            bgm = bgm_file
+            ])
+            srt = ctx.workdir / "merged.srt"
+            write_srt(transcribe_to_srt(audio_wav, language=language, sample_rate=sample_rate), srt)
+            audio_wav.unlink()
+            return {"srt": srt}
+
+        graph.add(Stage("captions", transcribe, inputs=("merged",), outputs={"srt": Path},
+                        params={"language": language, "sample_rate": sample_rate},
+                        label=f"Transcribing audio ({language})", weight=copy_weight, duration=total))
+
+    def add_previews(ctx: StageContext, video: str, cmd: List[str]) -> Optional[Path]:
+        """Extend ``cmd`` to also write the previews of its first input; returns their folder."""
+        from .previews import build_preview_args
+        preview_dir = ctx.workdir.resolve() / f"{base.stem}_preview"
+        ensure_dir(preview_dir)
+        cmd += build_preview_args(previews, probe_duration(ctx[video]), preview_dir)
+        return preview_dir
+
+    def publish_previews(ctx: StageContext, video: str, preview_dir: Path) -> Path:
+        from .previews import write_vtt
+        write_vtt(previews, probe_duration(ctx[video]), preview_dir)
+        return _publish(preview_dir, base.parent)
+
+    # Previews ride on the last FFmpeg process that decodes the video: the rendition encode, else the
+    # subtitle burn-in. Failing both, the output stage decodes the video for the previews alone.
+    burns = burn_in and graph.produces("srt")
+    previews_on = None if previews is None else "renditions" if renditions else "subtitles" if burns else "output"
+    preview_params = {"previews": [previews.interval, previews.columns, previews.rows, previews.width]} if previews else {}
+
+    # When streaming, the last stage that encodes writes fragmented MP4 straight to the pipe, so
+    # bytes flow while it runs instead of after a copy stage behind it. Renditions read the
+    # finished file, so with them the output stage still copies it to the pipe.
+    final_encode = None
+    if streaming and not renditions:
+        final_encode = "bgm" if bgm else "subtitles" if burns else None
+
+    def finished_output(ctx: StageContext, video: str, preview_dir: Optional[Path]) -> Dict[str, Any]:
+        """Outputs of the stage writing the output, publishing the previews it or the burn-in wrote."""
+        if "preview_frames" in ctx.inputs:
+            # The burn-in stage's outputs may be a cache entry, so publish a copy
+            preview_dir = ctx.workdir / f"{base.stem}_preview"
+            shutil.copytree(ctx["preview_frames"], preview_dir)
+        if preview_dir is None:
+            return {"output": out_video}
+        return {"output": out_video, "previews": publish_previews(ctx, video, preview_dir)}
+
+    def stream_runner(ctx: StageContext) -> Callable[..., None]:
+        # Nothing to clean up in a pipe
+        return lambda cmd, **kw: ctx.run(cmd, outputs=[], stdout=sys.stdout.buffer if out_video == STDOUT else None,
+                                         **kw)
+
+    final_outputs = {"output": Path, **({"previews": Path} if previews is not None and not renditions else {})}
+    final_params = {"path": str(out_video), "mode": mode}
+
+    current = "merged"
+    if graph.produces("srt"):
+        def subtitles(ctx: StageContext, video: str = current) -> Dict[str, Any]:
+            if not burn_in:
+                return {"subbed": add_subtitles_soft(ctx[video], ctx["srt"], ctx.workdir / "subbed.mp4", ctx.run)}
+            streamed = final_encode == "subtitles"
+            burned = out_video if streamed else ctx.workdir / "burned.mp4"
+            extra_args: List[str] = []
+            preview_dir = add_previews(ctx, video, extra_args) if previews_on == "subtitles" else None
+            runner = stream_runner(ctx) if streamed else lambda cmd, **kw: ctx.run(cmd, outputs=[burned], **kw)
+            add_subtitles_burn(ctx[video], ctx["srt"], burned, runner, extra_args, mode if streamed else None,
+                               scratch=ctx.workdir)
+            if streamed:
+                return finished_output(ctx, video, preview_dir)
+            if preview_dir is None:
+                return {"subbed": burned}
+            # Published by the output stage; this stage's outputs may be a cache entry
+            return {"subbed": burned, "preview_frames": preview_dir}
+
+        if final_encode == "subtitles":
+            outputs, params = final_outputs, {"burn_in": burn_in, **final_params, **preview_params}
         else:
-            bgm = pick_bgm_file(bgm_dir)
-
-        current_video = merged
-        if srt_path:
-            subbed = tmpdir / ("subbed.mp4" if not burn_in else "burned.mp4")
-            if burn_in:
-                add_subtitles_burn(current_video, srt_path, subbed)
-            else:
-                add_subtitles_soft(current_video, srt_path, subbed)
-            current_video = subbed
-
-        if bgm:
-            mixed = tmpdir / "mixed.mp4"
+            outputs = {"subbed": Path, **({"preview_frames": Path} if previews_on == "subtitles" else {})}
+            params = {"burn_in": burn_in, **(preview_params if previews_on == "subtitles" else {})}
+        graph.add(Stage("subtitles", subtitles, inputs=(current, "srt"), outputs=outputs, params=params,
+                        label="Burning in subtitles" if burn_in else "Adding subtitle track",
+                        weight=total if burn_in else copy_weight, duration=total,
+                        memoize=final_encode != "subtitles"))
+        current = "subbed"
+
+    if bgm:
+        def mix(ctx: StageContext, video: str = current) -> Dict[str, Any]:
+            streamed = final_encode == "bgm"
+            mixed = out_video if streamed else ctx.workdir / "mixed.mp4"
+            extra_args: List[str] = []
+            # Copying the video decodes nothing, so previews cost a decode here as in the output stage
+            preview_dir = add_previews(ctx, video, extra_args) if streamed and previews_on == "output" else None
+            runner = stream_runner(ctx) if streamed else ctx.run
             # Choose mix strategy based on whether original video has audio
-            if _has_audio(current_video):
-                mix_bgm(current_video, bgm, mixed, bgm_volume=bgm_volume)
+            if _has_audio(ctx[video]):
+                mix_bgm(ctx[video], ctx["bgm"], mixed, bgm_volume=bgm_volume, runner=runner,
+                        mode=mode if streamed else None, extra_args=extra_args)
             else:
                 # No original audio: map BGM as the only audio, cut off to video length using -shortest
-                cmd = [
+                runner([
                     FFMPEG, "-y",
-                    "-i", str(current_video),
-                    "-i", str(bgm),
+                    "-i", str(ctx[video]),
+                    "-i", str(ctx["bgm"]),
                     "-filter:a:1", f"volume={max(0.0, min(2.0, bgm_volume))}",
                     "-shortest",
                     "-map", "0:v",
                     "-map", "1:a",
                     "-c:v", "copy",
                     "-c:a", "aac", "-b:a", "192k",
-                    str(mixed),
-                ]
-                run(cmd)
-            current_video = mixed
+                    *(output_args(mixed, mode) if streamed else [str(mixed)]),
+                    *extra_args,
+                ])
+            if streamed:
+                return finished_output(ctx, video, preview_dir)
+            return {"mixed": mixed}
+
+        sources["bgm"] = bgm
+        if final_encode == "bgm":
+            inputs = (current, "bgm", *(("preview_frames",) if previews_on == "subtitles" else ()))
+            outputs, params = final_outputs, {"volume": bgm_volume, **final_params, **preview_params}
+        else:
+            inputs, outputs, params = (current, "bgm"), {"mixed": Path}, {"volume": bgm_volume}
+        graph.add(Stage("bgm", mix, inputs=inputs, outputs=outputs, params=params,
+                        label=f"Mixing background music ({bgm.name})",
+                        weight=total / 4 if previews_on == "output" and final_encode == "bgm" else 2 * copy_weight,
+                        duration=total, memoize=final_encode != "bgm"))
+        current = "mixed"
+
+    def write_output(ctx: StageContext, video: str = current) -> Dict[str, Any]:
+        preview_dir = None
+        if mode == "mp4" and previews_on != "output":
+            ensure_dir(out_video.parent)
+            shutil.copy2(ctx[video], out_video)
+        else:
+            if not streaming:
+                ensure_dir(out_video.parent)
+            cmd = build_output_cmd(ctx[video], out_video, mode)
+            preview_dir = add_previews(ctx, video, cmd) if previews_on == "output" else None
+            # Nothing to clean up in a pipe; a partial regular file is removed on failure
+            ctx.run(cmd, outputs=[] if streaming else [out_video],
+                    stdout=sys.stdout.buffer if out_video == STDOUT else None)
+        return finished_output(ctx, video, preview_dir)
+
+    if final_encode is None:
+        graph.add(Stage("output", write_output,
+                        inputs=(current, *(("preview_frames",) if previews_on == "subtitles" else ())),
+                        outputs=final_outputs,
+                        params={**final_params, **(preview_params if previews_on == "output" else {})},
+                        label=f"Writing {out_video}", weight=total / 4 if previews_on == "output" else copy_weight,
+                        duration=total, memoize=False))
+
+    if renditions:
+        def encode_renditions(ctx: StageContext, video: str = current) -> Dict[str, Any]:
+            from .renditions import build_renditions_cmd
+            cmd, outputs = build_renditions_cmd(ctx[video], renditions, ctx.workdir, base.stem,
+                                                has_audio=_has_audio(ctx[video]), hls=hls)
+            preview_dir = add_previews(ctx, video, cmd) if previews_on == "renditions" else None
+            ctx.run(cmd, outputs=outputs)
+            # Only complete sets reach the output folder
+            published = {"renditions": [_publish(path, base.parent) for path in outputs]}
+            if preview_dir is not None:
+                published["previews"] = publish_previews(ctx, video, preview_dir)
+            return published
+
+        graph.add(Stage("renditions", encode_renditions, inputs=(current,),
+                        outputs={"renditions": list, **({"previews": Path} if previews else {})},
+                        params={"renditions": [r.name for r in renditions], "hls": hls, **preview_params},
+                        label=f"Encoding {len(renditions)} renditions", weight=total * len(renditions) / 2,
+                        duration=total, memoize=False))
+
+    return graph, sources, out_video
+
+
+def plan_pipeline(stage_cache: Optional[StageCache] = None, catalog: Optional[MediaCatalog] = None,
+                  **options: Any) -> List[PlannedStage]:
+    """The stages ``run_pipeline`` would run with ``options``, marking those ``stage_cache`` already holds.
+
+    Nothing is written; sources are only probed and fingerprinted.
+    """
+    graph, sources, _ = _pipeline_graph(catalog=catalog, **options)
+    return graph.plan(sources, stage_cache, catalog)
+
 
-        # Move to final output
-        ensure_dir(out_video.parent)
-        shutil.copy2(current_video, out_video)
+def run_pipeline(
+    video_dir: Path,
+    caption_dir: Path,
+    bgm_dir: Path,
+    output_dir: Path,
+    output_file: Optional[Path],
+    exts: List[str],
+    bgm_file: Optional[Path],
+    bgm_volume: float,
+    burn_in: bool,
+    generate_captions: bool,
+    language: str,
+    sample_rate: int,
+    keep_temp: bool,
+    catalog: Optional[MediaCatalog] = None,
+    on_event: Optional[Callable[[PipelineEvent], None]] = None,
+    cancel: Optional[CancelToken] = None,
+    renditions: Optional[List["Rendition"]] = None,
+    hls: bool = False,
+    output_mode: Optional[str] = None,
+    stage_cache: Optional[StageCache] = None,
+    jobs: int = 2,
+    farm: Optional["Coordinator"] = None,
+    previews: Optional["Previews"] = None,
+    caps: Optional[Caps] = None,
+    intermediates: str = "lossless",
+) -> Path:
+    """Join, caption and score the videos in ``video_dir``; returns the output path.
+
+    The work is a ``StageGraph``: clips are normalized ``jobs`` at a time
+    while captions are merged, and with ``stage_cache`` every stage whose
+    inputs and settings are unchanged since an earlier run is skipped.
+    Clips are normalized to the format most of them already have, within
+    ``caps`` (see ``targets.plan_target``); clips already in it are copied.
+    With ``intermediates`` "lossless" (one of ``INTERMEDIATE_POLICIES``) a
+    video that is encoded again later (normalized before burn-in) is
+    encoded losslessly and fast, so only the last encode uses the delivery
+    settings. Renditions do not make normalizing an intermediate step: the
+    joined video is still delivered as the main output.
+    With ``farm`` the clips are normalized by its workers instead, all
+    queued at once.
+
+    ``on_event`` receives a ``PipelineEvent`` as each stage starts, as its
+    FFmpeg steps progress and for each FFmpeg log line; events come from
+    worker and reader threads, so the callback must be thread-safe. Cancelling ``cancel`` from
+    another thread kills the running FFmpeg steps and raises ``ProcessCancelled``;
+    nothing is written to the output then.
+
+    ``renditions`` adds a last stage that decodes the output once and encodes
+    every rendition from it in the same FFmpeg process, next to the output
+    as ``<stem>_<name>.mp4`` files or, with ``hls``, as an HLS/CMAF ladder
+    in ``<stem>_hls/``.
+
+    ``previews`` writes a poster, seek-preview sprite sheets and their
+    ``thumbnails.vtt`` index to ``<stem>_preview/`` next to the output. They
+    are cut from the video the rendition encode (or else the final write)
+    already reads, in the same FFmpeg process.
+
+    ``output_mode`` is one of ``OUTPUT_MODES``. ``output_file`` may be
+    ``STDOUT`` or a named pipe; those are always written as fragmented MP4,
+    so a reader can start on the first fragment.
+    """
+    graph, sources, out_video = _pipeline_graph(
+        video_dir, caption_dir, bgm_dir, output_dir, output_file, exts, bgm_file, bgm_volume, burn_in,
+        generate_captions, language, sample_rate, catalog, renditions, hls, output_mode, farm, previews, caps,
+        intermediates,
+    )
+    ensure_dir(output_dir)
+    if farm is not None:
+        # Stages waiting on the farm only block a thread each
+        jobs = max(jobs, sum(stage.group == "normalize" for stage in graph.stages))
 
+    with tempfile.TemporaryDirectory() as td:
+        artifacts = graph.run(sources, Path(td), cache=stage_cache, catalog=catalog, on_event=on_event,
+                              cancel=cancel, jobs=jobs)
         if keep_temp:
             # copy artifacts for inspection
-            shutil.copy2(merged, output_dir / merged.name)
-            if srt_path:
-                shutil.copy2(srt_path, output_dir / srt_path.name)
+            shutil.copy2(artifacts["merged"], output_dir / "merged.mp4")
+            if "srt" in artifacts:
+                shutil.copy2(artifacts["srt"], output_dir / "merged.srt")
 
+    if stage_cache is not None:
+        # Entries pinned during the run may have left the cache over its cap
+        stage_cache.evict()
+
+    if on_event is not None:
+        on_event(PipelineEvent("done", "output", f"Wrote {out_video}", 1.0))
     return out_video
 
 
-def _has_audio(path: Path) -> bool:
+def _has_audio(path: Path, catalog: Optional[MediaCatalog] = None) -> bool:
+    if catalog is not None:
+        cached = catalog.get(path, "has_audio")
+        if cached is not None:
+            return bool(cached)
+        try:
+            info = probe_media(path, catalog)
+        except RuntimeError:
+            return False
+        return any(s.get("codec_type") == "audio" for s in info.get("streams", []))
     cmd = [FFPROBE, "-v", "error", "-select_streams", "a", "-show_entries", "stream=index", "-of", "csv=p=0", str(path)]
     proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
     if proc.returncode != 0:
@@ -0,0 +1,356 @@
+"""Background decoding and clock-driven frame scheduling for preview playback.
+
+The Tk preview used to seek the capture before every displayed frame, which
+forces a keyframe seek and a GOP decode per frame on long-GOP codecs. Here a
+decoder thread reads sequentially into a bounded ring buffer and the UI pulls
+whichever frame the playback clock says is due, dropping frames that arrived
+too late instead of slowing down. For scrubbing, ``KeyframeSeeker`` decodes
+only from the nearest keyframe and ``FrameCache`` keeps recently shown frames.
+``FFmpegFrameReader`` lets FFmpeg scale to preview size before frames ever
+reach Python.
+"""
+from __future__ import annotations
+import bisect
+import shutil
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Hashable, Iterable, List, Optional, Tuple
+
+
+# Property id of cv2.CAP_PROP_POS_FRAMES, kept here so this module does not
+# need OpenCV at import time.
+CAP_PROP_POS_FRAMES = 1
+
+FFMPEG = shutil.which("ffmpeg") or "ffmpeg"
+
+Frame = Tuple[int, Any]
+
+
+class FrameRingBuffer:
+    """Bounded FIFO of ``(frame_index, frame)`` pairs shared by one producer and one consumer."""
+
+    def __init__(self, capacity: int = 8):
+        self.capacity = max(1, capacity)
+        self._frames: Deque[Frame] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.generation = 0
+        self.dropped = 0
+
+    def put(self, item: Frame, generation: int) -> bool:
+        """Append a decoded frame, blocking while the buffer is full.
+
+        Returns ``False`` if the buffer was cleared (seek) or closed while
+        waiting, in which case the frame is stale and has been discarded.
+        """
+        with self._cond:
+            while (len(self._frames) >= self.capacity and not self._closed
+                   and generation == self.generation):
+                self._cond.wait()
+            if self._closed or generation != self.generation:
+                return False
+            self._frames.append(item)
+            self._cond.notify_all()
+            return True
+
+    def take(self, target_index: int) -> Optional[Frame]:
+        """Return the newest frame at or before ``target_index``.
+
+        Older frames are discarded and counted in ``dropped``. ``None`` means
+        nothing is due yet (or the decoder is behind and the buffer is empty).
+        """
+        with self._cond:
+            chosen: Optional[Frame] = None
+            while self._frames and self._frames[0][0] <= target_index:
+                if chosen is not None:
+                    self.dropped += 1
+                chosen = self._frames.popleft()
+            if chosen is not None:
+                self._cond.notify_all()
+            return chosen
+
+    def clear(self) -> int:
+        """Drop all buffered frames and return the new generation number."""
+        with self._cond:
+            self._frames.clear()
+            self.generation += 1
+            self._cond.notify_all()
+            return self.generation
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._frames.clear()
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._frames)
+
+
+class SequentialDecoder:
+    """Decode frames sequentially on a background thread into a ``FrameRingBuffer``.
+
+    ``open_capture`` must return an object with the ``cv2.VideoCapture``
+    interface (``read``, ``set``, ``release``); it is opened on the decoder
+    thread so the UI's own capture is never shared. ``transform`` runs on the
+    decoder thread too, so color conversion and scaling stay off the UI thread.
+    """
+
+    def __init__(
+        self,
+        open_capture: Callable[[], Any],
+        start_frame: int = 0,
+        transform: Optional[Callable[[Any], Any]] = None,
+        capacity: int = 8,
+    ):
+        self._open_capture = open_capture
+        self._transform = transform
+        self.buffer = FrameRingBuffer(capacity)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending_seek: Optional[int] = start_frame
+        self._stopped = False
+        self.finished = False
+        self._thread = threading.Thread(target=self._run, name="preview-decoder", daemon=True)
+
+    def start(self) -> "SequentialDecoder":
+        self._thread.start()
+        return self
+
+    def seek(self, frame_index: int) -> None:
+        """Discard buffered frames and continue decoding from ``frame_index``."""
+        with self._lock:
+            self._pending_seek = max(0, frame_index)
+            self.finished = False
+            self.buffer.clear()
+        self._wake.set()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        self._stopped = True
+        self.buffer.close()
+        self._wake.set()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        cap = self._open_capture()
+        try:
+            index = 0
+            generation = self.buffer.generation
+            while not self._stopped:
+                with self._lock:
+                    if self._pending_seek is not None:
+                        index = self._pending_seek
+                        self._pending_seek = None
+                        generation = self.buffer.generation
+                        cap.set(CAP_PROP_POS_FRAMES, index)
+                ok, frame = cap.read()
+                if not ok:
+                    # End of stream: idle until a seek or stop arrives. A seek that
+                    # landed since the read means we are not finished at all.
+                    with self._lock:
+                        at_end = self._pending_seek is None
+                        if at_end:
+                            self.finished = True
+                            self._wake.clear()
+                    if at_end:
+                        self._wake.wait()
+                    continue
+                if self._transform is not None:
+                    frame = self._transform(frame)
+                self.buffer.put((index, frame), generation)
+                index += 1
+        finally:
+            cap.release()
+
+
+class PlaybackClock:
+    """Wall-clock master for preview playback, expressed in frames."""
+
+    def __init__(self, fps: float):
+        self.fps = fps if fps and fps > 0 else 30.0
+        self._origin_frame = 0
+        self._origin_time = time.monotonic()
+
+    def start(self, frame_index: int) -> None:
+        """Restart the clock so that ``frame_index`` is due now."""
+        self._origin_frame = frame_index
+        self._origin_time = time.monotonic()
+
+    def position(self) -> float:
+        """Current playback position in seconds."""
+        return self._origin_frame / self.fps + (time.monotonic() - self._origin_time)
+
+    def frame(self) -> int:
+        """Index of the frame that should be on screen now."""
+        return int(self.position() * self.fps + 1e-6)
+
+    def seconds_until(self, frame_index: int) -> float:
+        return frame_index / self.fps - self.position()
+
+    def stop(self) -> None:
+        """Nothing to release; present for parity with ``AudioClock``."""
+
+
+class KeyframeSeeker:
+    """Random access on a capture that decodes forward from the nearest keyframe.
+
+    With a keyframe index (frame numbers, see ``pipeline.probe_keyframes``)
+    targets later in the GOP that is already being decoded are reached by
+    reading forward instead of seeking again; other targets seek straight to
+    the preceding keyframe. Without an index only single-frame steps avoid a
+    seek.
+    """
+
+    def __init__(self, capture: Any, keyframes: Optional[Iterable[int]] = None):
+        self.capture = capture
+        self.keyframes: List[int] = sorted(set(keyframes or []))
+        self._next: Optional[int] = None  # frame that the next capture.read() returns
+
+    def set_keyframes(self, keyframes: Iterable[int]) -> None:
+        self.keyframes = sorted(set(keyframes))
+
+    def keyframe_before(self, index: int) -> int:
+        if not self.keyframes:
+            return index
+        i = bisect.bisect_right(self.keyframes, index) - 1
+        return self.keyframes[i] if i >= 0 else 0
+
+    def read(self, index: int, on_frame: Optional[Callable[[int, Any], None]] = None) -> Tuple[bool, Any]:
+        """Decode frame ``index``; ``on_frame`` sees the frames decoded on the way."""
+        keyframe = self.keyframe_before(index)
+        if self._next is None or not keyframe <= self._next <= index:
+            self.capture.set(CAP_PROP_POS_FRAMES, keyframe)
+            self._next = keyframe
+        frame = None
+        while self._next <= index:
+            ok, frame = self.capture.read()
+            if not ok:
+                self._next = None
+                return False, None
+            if on_frame is not None and self._next < index:
+                on_frame(self._next, frame)
+            self._next += 1
+        return True, frame
+
+
+class FrameCache:
+    """LRU cache of prepared frames bounded by total ``nbytes``."""
+
+    def __init__(self, max_bytes: int = 256 << 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._frames: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+            return frame
+
+    def put(self, key: Hashable, frame: Any) -> None:
+        size = getattr(frame, "nbytes", 0)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._frames.pop(key, None)
+            if old is not None:
+                self.nbytes -= getattr(old, "nbytes", 0)
+            self._frames[key] = frame
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._frames.popitem(last=False)
+                self.nbytes -= getattr(evicted, "nbytes", 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self.nbytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._frames
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._frames)
+
+
+def fit_size(width: int, height: int, box_width: int, box_height: int) -> Tuple[int, int]:
+    """Largest size with the aspect ratio of ``width x height`` that fits the box."""
+    scale = min(box_width / width, box_height / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+class FFmpegFrameReader:
+    """``cv2.VideoCapture``-compatible reader that decodes at preview size.
+
+    FFmpeg scales and converts to RGB24 before writing raw frames to a pipe,
+    so a 4K source costs a preview-sized copy per frame instead of several
+    full-resolution buffers. Frames are read into a rotating pool of
+    preallocated arrays; ``buffers`` must exceed the number of frames the
+    consumer holds at once (ring buffer capacity plus the one on screen).
+    FFmpeg is started lazily on the first ``read``; seeking via
+    ``set(CAP_PROP_POS_FRAMES, n)`` restarts it at ``n / fps``.
+    """
+
+    def __init__(self, path: str, size: Tuple[int, int], fps: float, buffers: int = 16):
+        import numpy as np
+
+        self.path = str(path)
+        self.width, self.height = size
+        self.fps = fps if fps and fps > 0 else 30.0
+        self._frame_bytes = self.width * self.height * 3
+        self._pool = [np.empty((self.height, self.width, 3), dtype=np.uint8) for _ in range(max(2, buffers))]
+        self._next_buffer = 0
+        self._position = 0
+        self._proc: Optional[subprocess.Popen] = None
+
+    def _start(self) -> None:
+        cmd = [
+            FFMPEG, "-v", "error", "-nostdin",
+            "-ss", f"{self._position / self.fps:.6f}", "-i", self.path,
+            "-an", "-sn",
+            "-vf", f"fps={self.fps},scale={self.width}:{self.height}:flags=fast_bilinear",
+            "-pix_fmt", "rgb24", "-f", "rawvideo", "-",
+        ]
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                      bufsize=self._frame_bytes)
+
+    def isOpened(self) -> bool:
+        return True
+
+    def set(self, prop: int, value: float) -> bool:
+        if prop != CAP_PROP_POS_FRAMES:
+            return False
+        self.release()
+        self._position = max(0, int(value))
+        return True
+
+    def read(self) -> Tuple[bool, Any]:
+        if self._proc is None:
+            self._start()
+        frame = self._pool[self._next_buffer]
+        view = memoryview(frame).cast("B")
+        filled = 0
+        while filled < self._frame_bytes:
+            n = self._proc.stdout.readinto(view[filled:])
+            if not n:
+                return False, None
+            filled += n
+        self._position += 1
+        self._next_buffer = (self._next_buffer + 1) % len(self._pool)
+        return True, frame
+
+    def release(self) -> None:
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            if self._proc.stdout is not None:
+                self._proc.stdout.close()
+            self._proc = None
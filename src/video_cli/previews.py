@@ -0,0 +1,98 @@
+"""Poster frame, seek-preview sprite sheets and their WebVTT index.
+
+The previews come from a second filter graph added to an FFmpeg command
+that already decodes the video (the rendition encode or the subtitle
+burn-in), so they cost a scale and tile branch rather than another decode.
+Without either the final write has to decode the video for them. One
+thumbnail is taken every ``interval`` seconds and tiled ``columns`` x
+``rows`` to a sheet; ``thumbnails.vtt`` maps each interval to its tile with
+``sprite_NNN.jpg#xywh=x,y,w,h`` cues, as web players expect.
+"""
+from __future__ import annotations
+import math
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple
+
+from .pipeline import probe_media
+
+
+POSTER_NAME = "poster.jpg"
+VTT_NAME = "thumbnails.vtt"
+# The poster is taken this far into the video, past fades and title cards
+POSTER_AT = 0.1
+
+_GRID = re.compile(r"^(\d+)x(\d+)$")
+
+
+@dataclass(frozen=True)
+class Previews:
+    """Thumbnail every ``interval`` seconds, ``width`` pixels wide, tiled ``columns`` x ``rows`` per sheet."""
+
+    interval: float = 10.0
+    columns: int = 5
+    rows: int = 5
+    width: int = 160
+
+    def __post_init__(self):
+        if self.interval <= 0 or self.columns < 1 or self.rows < 1 or self.width < 2:
+            raise ValueError(f"Bad preview settings {self}")
+
+
+def parse_grid(spec: str) -> Tuple[int, int]:
+    """Parse ``COLUMNSxROWS``, e.g. ``5x5``."""
+    match = _GRID.match(spec.strip())
+    if not match or 0 in (int(match.group(1)), int(match.group(2))):
+        raise ValueError(f"Bad sprite grid {spec!r}; expected e.g. 5x5")
+    return int(match.group(1)), int(match.group(2))
+
+
+def build_preview_args(previews: Previews, duration: float, out_dir: Path, video: str = "0:v") -> List[str]:
+    """FFmpeg arguments adding the previews of ``video`` (an input stream) to a command, written to ``out_dir``.
+
+    Append them after the command's own outputs; FFmpeg feeds the one
+    decoded stream to both filter graphs.
+    """
+    poster_t = max(0.0, duration * POSTER_AT)
+    graph = (
+        f"[{video}]split=2[pv_poster][pv_thumbs];"
+        f"[pv_poster]select=gte(t\\,{poster_t:.3f})[poster];"
+        f"[pv_thumbs]fps=1/{previews.interval:g},scale={previews.width}:-2,"
+        f"tile={previews.columns}x{previews.rows}[sprites]"
+    )
+    return [
+        "-filter_complex", graph,
+        "-map", "[poster]", "-frames:v", "1", "-q:v", "2", str(out_dir / POSTER_NAME),
+        "-map", "[sprites]", "-q:v", "4", "-f", "image2", str(out_dir / "sprite_%03d.jpg"),
+    ]
+
+
+def _timestamp(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def write_vtt(previews: Previews, duration: float, out_dir: Path) -> Path:
+    """Write ``thumbnails.vtt`` for the sheets FFmpeg left in ``out_dir``.
+
+    The tile size is read back from the first sheet, so it matches whatever
+    height the scale filter chose.
+    """
+    streams = probe_media(out_dir / "sprite_001.jpg").get("streams") or [{}]
+    tile_w = int(streams[0].get("width", 0)) // previews.columns
+    tile_h = int(streams[0].get("height", 0)) // previews.rows
+    per_sheet = previews.columns * previews.rows
+    lines = ["WEBVTT", ""]
+    for i in range(max(1, math.ceil(duration / previews.interval))):
+        sheet, cell = divmod(i, per_sheet)
+        x, y = (cell % previews.columns) * tile_w, (cell // previews.columns) * tile_h
+        start, end = i * previews.interval, min((i + 1) * previews.interval, duration)
+        lines += [f"{_timestamp(start)} --> {_timestamp(end)}",
+                  f"sprite_{sheet + 1:03d}.jpg#xywh={x},{y},{tile_w},{tile_h}", ""]
+    vtt = out_dir / VTT_NAME
+    vtt.write_text("\n".join(lines), encoding="utf-8")
+    return vtt
@@ -0,0 +1,171 @@
+"""Editor project files.
+
+A project is a JSON document with the editor state (timeline order, trims,
+audio tracks and their mix settings, subtitle styling) plus one ``MediaRef``
+per source file. A ``MediaRef`` records the file's fingerprint and the
+catalog fields derived from it, so reopening a project needs no probing: for
+every source whose size and mtime still match, ``restore_media`` puts the
+stored analysis back into the catalog if it is missing there. Thumbnails stay
+in the catalog, and waveforms and proxies in their disk caches, all keyed by
+the same fingerprint, so they are found again without decoding anything.
+"""
+from __future__ import annotations
+import json
+import os
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .catalog import Fingerprint, MediaCatalog
+
+
+PROJECT_FORMAT = "video-cli-project"
+PROJECT_VERSION = 1
+PROJECT_SUFFIX = ".vcproj"
+
+# Catalog fields copied into the project; see ``MediaCatalog.update``
+_ANALYSIS_FIELDS = ("probe", "duration", "has_audio", "width", "height", "fps", "loudness", "keyframes")
+
+
+@dataclass
+class MediaRef:
+    """A source file as it was when the project was saved, with its cached analysis."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    partial_hash: str
+    analysis: Dict[str, Any] = field(default_factory=dict)  # Catalog fields that were known
+
+    @classmethod
+    def from_catalog(cls, path: Path, catalog: MediaCatalog) -> "MediaRef":
+        fp = catalog.fingerprint(path)
+        analysis = {}
+        for name in _ANALYSIS_FIELDS:
+            value = catalog.get(fp, name)
+            if value is not None:
+                analysis[name] = value
+        return cls(fp.path, fp.size, fp.mtime_ns, fp.partial_hash, analysis)
+
+    @property
+    def fingerprint(self) -> Fingerprint:
+        return Fingerprint(self.path, self.size, self.mtime_ns, self.partial_hash)
+
+    @property
+    def key(self) -> str:
+        """Name of the file's waveform and proxy cache entries."""
+        return self.fingerprint.key
+
+    def is_current(self) -> bool:
+        """True when the file still has the saved size and mtime (a ``stat``, no hashing)."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "key": self.key}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MediaRef":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+@dataclass
+class Project:
+    """Everything the editor needs to come back to where it was."""
+
+    timeline: List[str] = field(default_factory=list)  # Source paths in timeline order
+    current: int = 0  # Timeline index shown in the preview
+    trims: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    audio_tracks: List[Dict[str, Any]] = field(default_factory=list)  # path, type and mix settings
+    subtitles: Dict[str, Any] = field(default_factory=dict)  # file, custom text and style
+    settings: Dict[str, Any] = field(default_factory=dict)  # group volumes and other editor options
+    media: Dict[str, MediaRef] = field(default_factory=dict)  # Source path -> reference
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format": PROJECT_FORMAT,
+            "version": PROJECT_VERSION,
+            "timeline": self.timeline,
+            "current": self.current,
+            "trims": {path: list(trim) for path, trim in self.trims.items()},
+            "audio_tracks": self.audio_tracks,
+            "subtitles": self.subtitles,
+            "settings": self.settings,
+            "media": {path: ref.to_dict() for path, ref in self.media.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Project":
+        if data.get("format") != PROJECT_FORMAT:
+            raise ValueError("Not a video-cli project file")
+        if data.get("version", 0) > PROJECT_VERSION:
+            raise ValueError(f"Project version {data['version']} is newer than this editor supports")
+        return cls(
+            timeline=list(data.get("timeline", [])),
+            current=int(data.get("current", 0)),
+            trims={path: (float(t[0]), float(t[1])) for path, t in data.get("trims", {}).items()},
+            audio_tracks=list(data.get("audio_tracks", [])),
+            subtitles=dict(data.get("subtitles", {})),
+            settings=dict(data.get("settings", {})),
+            media={path: MediaRef.from_dict(ref) for path, ref in data.get("media", {}).items()},
+        )
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Project":
+        with open(path, encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Corrupt project file: {e}") from None
+        return cls.from_dict(data)
+
+    def sources(self) -> List[str]:
+        """Every referenced file: timeline clips, audio tracks and the subtitle file."""
+        paths = list(self.timeline) + [track["path"] for track in self.audio_tracks]
+        if self.subtitles.get("file"):
+            paths.append(self.subtitles["file"])
+        return list(dict.fromkeys(paths))
+
+
+def collect_media(paths: Iterable[Path], catalog: MediaCatalog) -> Dict[str, MediaRef]:
+    """References for ``paths`` from what the catalog knows; nothing is probed. Missing files are skipped."""
+    media = {}
+    for path in paths:
+        try:
+            media[str(path)] = MediaRef.from_catalog(Path(path), catalog)
+        except OSError:
+            continue
+    return media
+
+
+def restore_media(project: Project, catalog: MediaCatalog) -> List[str]:
+    """Seed ``catalog`` with the project's analysis of unchanged sources.
+
+    Returns the paths that changed or disappeared since the project was
+    saved; their stored analysis is ignored and they are analysed afresh.
+    """
+    stale = []
+    for path, ref in project.media.items():
+        if not ref.is_current():
+            stale.append(path)
+            continue
+        if ref.analysis and catalog.get(ref.fingerprint, "probe") is None:
+            catalog.update(ref.fingerprint, **ref.analysis)
+    return stale
+
+
+def stored_durations(project: Project) -> Dict[str, float]:
+    """Saved durations of unchanged sources, for drawing the timeline before any analysis."""
+    return {path: ref.analysis["duration"] for path, ref in project.media.items()
+            if ref.analysis.get("duration") is not None and ref.is_current()}
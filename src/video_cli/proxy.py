@@ -0,0 +1,192 @@
+"""Low-resolution, short-GOP proxy media for responsive editing.
+
+Decoding 4K or HEVC originals for preview and scrubbing is slow, so the
+editor transcodes each heavy clip once into a small H.264 file with a
+keyframe every few frames. Proxies keep the frame count and timestamps of
+the original, so frame numbers, trim points and keyframe indexes carry over;
+they have no audio. Proxies live in a size-capped cache shared by every
+project and keyed by the original's fingerprint; least recently used
+proxies are evicted first. Exports always read the originals.
+"""
+from __future__ import annotations
+import os
+import queue
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .catalog import MediaCatalog, file_fingerprint
+from .pipeline import FFMPEG, probe_media
+from .utils import cache_dir, ensure_dir
+
+
+PROXY_HEIGHT = 540
+PROXY_GOP = 12
+# Codecs that are expensive to decode regardless of resolution
+HEAVY_CODECS = {"hevc", "av1", "vp9", "prores", "dnxhd"}
+
+
+def default_proxy_cache_bytes() -> int:
+    """Cache cap from ``VIDEO_CLI_PROXY_CACHE_MB``, 20 GiB by default."""
+    return int(os.environ.get("VIDEO_CLI_PROXY_CACHE_MB", 20 * 1024)) << 20
+
+
+def needs_proxy(probe: Dict[str, Any], max_height: int = PROXY_HEIGHT) -> bool:
+    """Whether a clip (ffprobe output) is worth proxying for preview."""
+    for stream in probe.get("streams", []):
+        if stream.get("codec_type") != "video":
+            continue
+        if stream.get("disposition", {}).get("attached_pic"):
+            continue
+        height = int(stream.get("height") or 0)
+        return height > max_height * 4 // 3 or stream.get("codec_name") in HEAVY_CODECS
+    return False
+
+
+def make_proxy(src: Path, dst: Path, height: int = PROXY_HEIGHT, gop: int = PROXY_GOP) -> None:
+    """Transcode ``src`` into a short-GOP H.264 proxy at ``dst`` (written atomically)."""
+    tmp = dst.with_name(dst.stem + ".part" + dst.suffix)
+    cmd = [
+        FFMPEG, "-y", "-v", "error", "-nostdin",
+        "-i", str(src),
+        "-map", "0:v:0", "-an", "-sn",
+        "-vf", f"scale=-2:'min({height},ih)':flags=fast_bilinear,format=yuv420p",
+        "-fps_mode", "passthrough",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "26", "-tune", "fastdecode",
+        "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+        "-movflags", "+faststart",
+        str(tmp),
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        tmp.unlink(missing_ok=True)
+        raise RuntimeError(f"Proxy generation failed for {src}: {proc.stderr.decode(errors='ignore')}")
+    tmp.replace(dst)
+
+
+class ProxyCache:
+    """Directory of proxies keyed by fingerprint, capped at ``max_bytes``."""
+
+    def __init__(self, root: Optional[Path] = None, max_bytes: Optional[int] = None):
+        self.root = Path(root) if root else cache_dir() / "proxies"
+        self.max_bytes = default_proxy_cache_bytes() if max_bytes is None else max_bytes
+        ensure_dir(self.root)
+        self._lock = threading.Lock()
+
+    def path_for(self, key: str) -> Path:
+        return self.root / f"{key}.mp4"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the proxy for ``key`` if it exists, marking it as recently used."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def evict(self, keep: Iterable[Path] = ()) -> List[Path]:
+        """Delete least recently used proxies until the cache fits its cap."""
+        keep = set(map(Path, keep))
+        with self._lock:
+            entries = []
+            for p in self.root.glob("*.mp4"):
+                if ".part" in p.name:
+                    continue
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+            total = sum(size for _, size, _ in entries)
+            removed = []
+            for _, size, p in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if p in keep:
+                    continue
+                p.unlink(missing_ok=True)
+                total -= size
+                removed.append(p)
+            return removed
+
+    def total_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.root.glob("*.mp4"))
+
+
+class ProxyManager:
+    """Generate proxies in the background with at most ``max_workers`` FFmpeg processes.
+
+    Events put on ``events`` are ``("proxy", original, proxy_path)`` and
+    ``("error", original, message)``; clips that do not need a proxy produce
+    no event.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[ProxyCache] = None,
+        catalog: Optional[MediaCatalog] = None,
+        max_workers: int = 2,
+        height: int = PROXY_HEIGHT,
+    ):
+        self.cache = cache or ProxyCache()
+        self.catalog = catalog
+        self.height = height
+        self.events: "queue.Queue[Tuple]" = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="proxy")
+        self._lock = threading.Lock()
+        self._submitted: Set[Path] = set()
+        self._ready: Dict[Path, Path] = {}
+
+    def submit(self, paths: Iterable[Path]) -> None:
+        """Queue proxy generation for clips not seen before."""
+        new: List[Path] = []
+        with self._lock:
+            for p in map(Path, paths):
+                if p not in self._submitted:
+                    self._submitted.add(p)
+                    new.append(p)
+        for path in new:
+            self._pool.submit(self._build, path)
+
+    def proxy_for(self, path: Path) -> Optional[Path]:
+        """Ready proxy for ``path``, or ``None`` to use the original."""
+        with self._lock:
+            proxy = self._ready.get(Path(path))
+        if proxy is not None and not proxy.exists():
+            # Evicted by another editor sharing the cache
+            with self._lock:
+                self._ready.pop(Path(path), None)
+                self._submitted.discard(Path(path))
+            return None
+        return proxy
+
+    def drain(self, limit: int = 64) -> List[Tuple]:
+        events = []
+        while len(events) < limit:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _build(self, path: Path) -> None:
+        try:
+            if not needs_proxy(probe_media(path, self.catalog), self.height):
+                return
+            fp = self.catalog.fingerprint(path) if self.catalog is not None else file_fingerprint(path)
+            proxy = self.cache.get(fp.key)
+            if proxy is None:
+                proxy = self.cache.path_for(fp.key)
+                make_proxy(path, proxy, self.height)
+                self.cache.evict(keep=[proxy, *self._ready.values()])
+            with self._lock:
+                self._ready[path] = proxy
+            self.events.put(("proxy", path, proxy))
+        except Exception as e:
+            self.events.put(("error", path, str(e)))
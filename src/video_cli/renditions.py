@@ -0,0 +1,141 @@
+"""Several renditions of one video from a single decode.
+
+A rendition spec such as ``1080p,720p,480p,9:16@1280p`` becomes one FFmpeg
+process whose filter graph splits the decoded video, scales (and for aspect
+variants center-crops) each branch, and encodes every branch in the same run.
+The outputs are either one MP4 per rendition or an HLS ladder with CMAF
+(fragmented MP4) segments and a master playlist. Keyframes are forced at
+the same times in every rendition so players can switch between them at
+segment boundaries.
+"""
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .pipeline import FFMPEG
+
+
+HLS_SEGMENT_SECONDS = 4
+# Bitrate caps for common heights (kbit/s); other heights scale with pixel count
+LADDER_KBPS = {2160: 16000, 1440: 9000, 1080: 6000, 720: 3500, 540: 2000, 480: 1500, 360: 800, 240: 400}
+
+_SPEC = re.compile(r"^(?:(\d+):(\d+)@)?(\d+)p(?:/(\d+)k)?$")
+
+
+@dataclass(frozen=True)
+class Rendition:
+    """One output: ``height`` lines, optionally center-cropped to ``aspect`` (w, h) first."""
+
+    height: int
+    aspect: Optional[Tuple[int, int]] = None
+    kbps: Optional[int] = None  # Bitrate cap; defaults from LADDER_KBPS
+
+    @property
+    def name(self) -> str:
+        if self.aspect:
+            return f"{self.aspect[0]}x{self.aspect[1]}_{self.height}p"
+        return f"{self.height}p"
+
+    @property
+    def max_kbps(self) -> int:
+        if self.kbps:
+            return self.kbps
+        if self.height in LADDER_KBPS:
+            return LADDER_KBPS[self.height]
+        return max(200, int(round(LADDER_KBPS[1080] * (self.height / 1080) ** 2 / 100)) * 100)
+
+    def video_filter(self) -> str:
+        steps = []
+        if self.aspect:
+            w, h = self.aspect
+            # Largest centered w:h window, even-sized for yuv420p
+            steps.append(f"crop=trunc(min(iw\\,ih*{w}/{h})/2)*2:trunc(min(ih\\,iw*{h}/{w})/2)*2")
+        steps.append(f"scale=-2:{self.height}")
+        return ",".join(steps)
+
+
+def parse_renditions(spec: str) -> List[Rendition]:
+    """Parse ``HEIGHTp``, ``W:H@HEIGHTp`` and an optional ``/KBPSk`` cap, comma separated."""
+    renditions = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        match = _SPEC.match(item)
+        if not match:
+            raise ValueError(f"Bad rendition {item!r}; expected e.g. 720p, 9:16@1280p or 480p/1200k")
+        aw, ah, height, kbps = match.groups()
+        if int(height) < 2 or (aw and (int(aw) == 0 or int(ah) == 0)):
+            raise ValueError(f"Bad rendition {item!r}")
+        renditions.append(Rendition(int(height), (int(aw), int(ah)) if aw else None, int(kbps) if kbps else None))
+    if not renditions:
+        raise ValueError("No renditions given")
+    if len({r.name for r in renditions}) != len(renditions):
+        raise ValueError("Renditions must be distinct")
+    return renditions
+
+
+def _filter_graph(renditions: List[Rendition]) -> str:
+    split = "".join(f"[s{i}]" for i in range(len(renditions)))
+    branches = [f"[s{i}]{r.video_filter()}[v{i}]" for i, r in enumerate(renditions)]
+    return ";".join([f"[0:v]split={len(renditions)}{split}"] + branches)
+
+
+def _encoder_args(index: int, rendition: Rendition) -> List[str]:
+    kbps = rendition.max_kbps
+    return [f"-maxrate:v:{index}", f"{kbps}k", f"-bufsize:v:{index}", f"{2 * kbps}k"]
+
+
+def build_renditions_cmd(
+    src: Path,
+    renditions: List[Rendition],
+    out_dir: Path,
+    stem: str,
+    has_audio: bool = True,
+    hls: bool = False,
+    segment_seconds: int = HLS_SEGMENT_SECONDS,
+) -> Tuple[List[str], List[Path]]:
+    """FFmpeg command encoding every rendition of ``src`` in one process, and the files it writes.
+
+    MP4 mode writes ``<stem>_<name>.mp4`` per rendition. HLS mode writes
+    ``<stem>_hls/<name>/`` playlists with CMAF segments and
+    ``<stem>_hls/master.m3u8``.
+    """
+    cmd = [FFMPEG, "-y", "-i", str(src), "-filter_complex", _filter_graph(renditions)]
+    # Identical GOP boundaries in every rendition
+    gop = ["-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})", "-sc_threshold", "0"]
+    video = ["-c:v", "libx264", "-preset", "medium", "-crf", "20", "-pix_fmt", "yuv420p"]
+    audio = ["-c:a", "aac", "-b:a", "192k", "-ac", "2"]
+
+    if not hls:
+        outputs = []
+        for i, rendition in enumerate(renditions):
+            output = out_dir / f"{stem}_{rendition.name}.mp4"
+            cmd += ["-map", f"[v{i}]", "-map", "0:a?", *video, *_encoder_args(0, rendition), *gop, *audio,
+                    "-movflags", "+faststart", str(output)]
+            outputs.append(output)
+        return cmd, outputs
+
+    hls_dir = out_dir / f"{stem}_hls"
+    streams = []
+    for i, rendition in enumerate(renditions):
+        cmd += ["-map", f"[v{i}]"]
+        if has_audio:
+            cmd += ["-map", "0:a:0"]
+        streams.append(f"v:{i},a:{i},name:{rendition.name}" if has_audio else f"v:{i},name:{rendition.name}")
+    cmd += [*video, *gop]
+    for i, rendition in enumerate(renditions):
+        cmd += _encoder_args(i, rendition)
+    if has_audio:
+        cmd += audio
+    cmd += [
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", "init.mp4",
+        "-hls_segment_filename", str(hls_dir / "%v" / "seg_%05d.m4s"),
+        "-master_pl_name", "master.m3u8",
+        "-var_stream_map", " ".join(streams),
+        str(hls_dir / "%v" / "index.m3u8"),
+    ]
+    return cmd, [hls_dir]
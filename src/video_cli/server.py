@@ -0,0 +1,282 @@
+"""Local HTTP/JSON service running pipeline jobs in one long-lived process.
+
+    POST /jobs               {"args": [CLI arguments]} or {"options": {"burn-in": true, ...}}
+    GET  /jobs               every job
+    GET  /jobs/<id>          status and latest progress
+    GET  /jobs/<id>/events   progress as server-sent events until the job ends
+    GET  /jobs/<id>/log      FFmpeg output of the job's last run
+    POST /jobs/<id>/cancel
+
+Jobs take the same options as the CLI (``cli.build_parser``) and wait in a
+persistent ``ExportQueue``, so they survive a restart; at most ``workers``
+run at once. The catalog and stage cache stay open between jobs, so probes,
+normalized clips and transcripts from earlier requests are reused.
+
+Start it with ``python -m src.video_cli.cli serve``.
+"""
+from __future__ import annotations
+import argparse
+import json
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .catalog import MediaCatalog
+from .cli import build_parser, check_args, run_args
+from .export_queue import CANCELLED, DONE, FAILED, ExportJob, ExportQueue, JobContext
+from .ffmpeg_progress import Progress
+from .logsink import LogSink
+from .pipeline import STDOUT, PipelineEvent
+from .stages import StageCache
+from .utils import cache_dir, ensure_dir
+
+
+DEFAULT_PORT = 8765
+JOB_KIND = "pipeline"
+_FINISHED = (DONE, FAILED, CANCELLED)
+
+
+def default_service_queue_path() -> Path:
+    return cache_dir() / "service_queue.json"
+
+
+def job_args(body: Dict[str, Any]) -> List[str]:
+    """CLI arguments from a request: ``args`` as given, or ``options`` as ``--name value`` pairs.
+
+    In ``options`` a true value is a bare flag, false or null leaves the option
+    out and a list gives several values.
+    """
+    if "args" in body:
+        args = body["args"]
+        if not isinstance(args, list) or not all(isinstance(a, str) for a in args):
+            raise ValueError("'args' must be a list of strings")
+        return list(args)
+    argv: List[str] = []
+    for name, value in (body.get("options") or {}).items():
+        flag = "--" + name.replace("_", "-")
+        if value is True:
+            argv.append(flag)
+        elif value is False or value is None:
+            continue
+        elif isinstance(value, list):
+            argv += [flag, *map(str, value)]
+        else:
+            argv += [flag, str(value)]
+    return argv
+
+
+def parse_job_args(argv: List[str]) -> argparse.Namespace:
+    """Validate job arguments like the CLI would; raises ``ValueError`` instead of exiting."""
+    parser = build_parser()
+
+    def error(message: str):
+        raise ValueError(message)
+
+    parser.error = error
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit:  # --help
+        raise ValueError("unsupported argument") from None
+    check_args(parser, args)
+    if args.plan:
+        raise ValueError("--plan is not available for jobs")
+    if args.output == STDOUT:
+        raise ValueError("jobs cannot write to stdout")
+    return args
+
+
+class JobService:
+    """Pipeline jobs on a persistent queue, with live progress for each."""
+
+    def __init__(
+        self,
+        queue_path: Optional[Path] = None,
+        workers: int = 1,
+        catalog: Optional[MediaCatalog] = None,
+        stage_cache: Optional[StageCache] = None,
+    ):
+        self.catalog = catalog
+        self.stage_cache = stage_cache
+        self.log_dir = cache_dir() / "jobs"
+        ensure_dir(self.log_dir)
+        # Per job: stage events and the latest progress event, for status and streaming
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._changed = threading.Condition()
+        self.queue = ExportQueue(queue_path or default_service_queue_path(), max_concurrent=workers,
+                                 runner=self._run_job)
+        self._closed = False
+        self._notifier = threading.Thread(target=self._notify, daemon=True)
+        self._notifier.start()
+        self.queue.start()
+
+    def submit(self, argv: List[str]) -> ExportJob:
+        args = parse_job_args(argv)
+        output = args.output or args.output_dir / "merged.mp4"
+        return self.queue.add(JOB_KIND, output, {"args": argv})
+
+    def status(self, job: ExportJob) -> Dict[str, Any]:
+        data = job.to_dict()
+        with self._changed:
+            events = self._events.get(job.id, [])
+            data["progress"] = events[-1] if events else None
+        return data
+
+    def events_since(self, job_id: str, index: int, timeout: float = 15.0) -> Tuple[List[Dict[str, Any]], bool]:
+        """Events after the first ``index`` (waiting up to ``timeout`` for some) and whether the job has ended."""
+        with self._changed:
+            def ready() -> bool:
+                job = self.queue.get(job_id)
+                return job is None or job.status in _FINISHED or len(self._events.get(job_id, [])) > index
+
+            self._changed.wait_for(ready, timeout)
+            job = self.queue.get(job_id)
+            return self._events.get(job_id, [])[index:], job is None or job.status in _FINISHED
+
+    def close(self) -> None:
+        self._closed = True
+        self.queue.shutdown()
+        self.queue.events.put("")
+
+    def _notify(self) -> None:
+        # The queue reports every status and progress change; wake streaming requests
+        while not self._closed:
+            self.queue.events.get()
+            with self._changed:
+                self._changed.notify_all()
+
+    def _record(self, job: ExportJob, ctx: JobContext, log: LogSink, event: PipelineEvent) -> None:
+        if event.kind == "output":
+            log.write(event.message)
+            return
+        item = {"kind": event.kind, "stage": event.stage, "message": event.message,
+                "fraction": round(event.fraction, 4), "eta": event.eta}
+        with self._changed:
+            events = self._events.setdefault(job.id, [])
+            # Keep every stage change but only the latest progress
+            if event.kind == "progress" and events and events[-1]["kind"] == "progress":
+                events[-1] = item
+            else:
+                events.append(item)
+        ctx.on_progress(Progress(0.0, event.fraction, None, event.eta))
+
+    def _run_job(self, job: ExportJob, ctx: JobContext) -> None:
+        args = parse_job_args(job.spec["args"])
+        with self._changed:
+            self._events[job.id] = []
+        log = LogSink(self.log_dir / f"{job.id}.log")
+        try:
+            run_args(args, None if args.no_catalog else self.catalog,
+                     None if args.no_stage_cache else self.stage_cache,
+                     on_event=lambda event: self._record(job, ctx, log, event), cancel=ctx)
+        finally:
+            log.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        parts = self.path.strip("/").split("/")
+        service = self.server.service
+        if parts == ["jobs"]:
+            return self._json(HTTPStatus.OK, {"jobs": [service.status(job) for job in service.queue.jobs()]})
+        job = service.queue.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+        if job is None:
+            return self._json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+        if len(parts) == 2:
+            return self._json(HTTPStatus.OK, service.status(job))
+        if parts[2:] == ["events"]:
+            return self._stream_events(job.id)
+        if parts[2:] == ["log"]:
+            try:
+                text = (service.log_dir / f"{job.id}.log").read_text(encoding="utf-8")
+            except OSError:
+                text = ""
+            return self._send(HTTPStatus.OK, "text/plain; charset=utf-8", text.encode("utf-8"))
+        return self._json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        parts = self.path.strip("/").split("/")
+        service = self.server.service
+        if parts == ["jobs"]:
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                job = service.submit(job_args(body))
+            except (ValueError, TypeError, AttributeError) as e:
+                return self._json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return self._json(HTTPStatus.CREATED, service.status(job))
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel" and service.queue.get(parts[1]):
+            service.queue.cancel(parts[1])
+            return self._json(HTTPStatus.ACCEPTED, service.status(service.queue.get(parts[1])))
+        return self._json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+
+    def _stream_events(self, job_id: str) -> None:
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        index = 0
+        finished = False
+        try:
+            while not finished:
+                events, finished = self.server.service.events_since(job_id, index)
+                index += len(events)
+                for event in events:
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                if not events and not finished:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+            job = self.server.service.queue.get(job_id)
+            end = {"kind": "end", "status": job.status if job else None, "message": job.message if job else ""}
+            self.wfile.write(f"event: end\ndata: {json.dumps(end)}\n\n".encode("utf-8"))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _json(self, status: HTTPStatus, data: Any) -> None:
+        self._send(status, "application/json", json.dumps(data).encode("utf-8"))
+
+    def _send(self, status: HTTPStatus, content_type: str, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], service: JobService):
+        super().__init__(address, _Handler)
+        self.service = service
+
+
+def make_server(service: JobService, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """An HTTP server for ``service``; call ``serve_forever`` on it. Port 0 picks a free port."""
+    return _Server((host, port), service)
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(prog="cli serve", description="Run pipeline jobs submitted over local HTTP.")
+    p.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    p.add_argument("--workers", type=int, default=1, help="Jobs run at the same time")
+    p.add_argument("--queue", type=Path, default=None, help="Job queue file (defaults to the user cache)")
+    p.add_argument("--catalog", type=Path, default=None, help="Media catalog database (defaults to the shared user cache)")
+    args = p.parse_args(argv)
+    service = JobService(args.queue, args.workers, MediaCatalog(args.catalog), StageCache())
+    server = make_server(service, args.host, args.port)
+    print(f"Serving on http://{server.server_address[0]}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
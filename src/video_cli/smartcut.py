@@ -0,0 +1,217 @@
+"""Frame-accurate trimming that re-encodes only the partial GOPs at the cuts.
+
+Whole GOPs inside the trim range are stream-copied. Only the frames between
+each cut point and the nearest keyframe inside the range are re-encoded,
+using an encoder, profile and level that match the source stream. The pieces
+are then spliced with the concat demuxer, so trimming an hour-long clip costs
+about two GOPs of encoding plus a file copy.
+
+The joined file keeps a single set of codec parameters (SPS/PPS), so this
+only works when the edges come out with the same parameters as the source,
+which also depend on the settings the source was encoded with. Sources
+without out-of-band parameters (Annex B, e.g. MPEG-TS) cannot be checked,
+so they are re-encoded in full straight away; otherwise the first edge is
+checked as soon as it is encoded, and on a mismatch the whole range is
+re-encoded instead. Either fallback is logged.
+"""
+from __future__ import annotations
+import bisect
+import logging
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from .catalog import MediaCatalog
+from .pipeline import FFMPEG, build_concat_file, probe_duration, probe_keyframes, probe_media, run
+
+
+log = logging.getLogger(__name__)
+
+# Slack for float timestamps when comparing cut points with keyframes
+KEYFRAME_EPSILON = 0.001
+
+VIDEO_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+AUDIO_ENCODERS = {"aac": "aac", "mp3": "libmp3lame", "opus": "libopus", "ac3": "ac3", "flac": "flac"}
+H264_PROFILES = {
+    "Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main",
+    "High": "high", "High 10": "high10", "High 4:2:2": "high422",
+}
+_MUXERS = {".mp4": "mp4", ".m4v": "mp4", ".mov": "mov", ".mkv": "matroska"}
+
+
+@dataclass(frozen=True)
+class CutSegment:
+    """``[start, end)`` seconds of the source, stream-copied or re-encoded."""
+
+    start: float
+    end: float
+    copy: bool
+
+
+def plan_smart_cut(keyframes: Sequence[float], start: float, end: float,
+                   duration: Optional[float] = None) -> List[CutSegment]:
+    """Split ``[start, end)`` into re-encoded edges around a stream-copied middle.
+
+    ``keyframes`` are sorted times relative to the start of the file. A cut at
+    or past ``duration`` counts as a GOP boundary, so an untrimmed end costs
+    nothing to re-encode.
+    """
+    i = bisect.bisect_left(keyframes, start - KEYFRAME_EPSILON)
+    copy_start = keyframes[i] if i < len(keyframes) else None
+    if duration is not None and end >= duration - KEYFRAME_EPSILON:
+        copy_end: Optional[float] = end
+    else:
+        j = bisect.bisect_right(keyframes, end + KEYFRAME_EPSILON) - 1
+        copy_end = keyframes[j] if j >= 0 else None
+    if copy_start is None or copy_end is None or copy_end - copy_start <= KEYFRAME_EPSILON:
+        return [CutSegment(start, end, copy=False)]
+
+    segments = []
+    if copy_start - start > KEYFRAME_EPSILON:
+        segments.append(CutSegment(start, copy_start, copy=False))
+    segments.append(CutSegment(copy_start, copy_end, copy=True))
+    if end - copy_end > KEYFRAME_EPSILON:
+        segments.append(CutSegment(copy_end, end, copy=False))
+    return segments
+
+
+def matching_encoder_args(probe: dict) -> List[str]:
+    """FFmpeg output options that re-encode to the same codecs and formats as the source.
+
+    Raises ``ValueError`` when the video codec has no matching encoder.
+    """
+    streams = probe.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None or video.get("codec_name") not in VIDEO_ENCODERS:
+        raise ValueError(f"No matching encoder for {video.get('codec_name') if video else 'missing video'}")
+    args = ["-c:v", VIDEO_ENCODERS[video["codec_name"]], "-crf", "18", "-preset", "fast",
+            "-pix_fmt", video.get("pix_fmt") or "yuv420p", "-fps_mode", "passthrough"]
+    if video["codec_name"] == "h264" and video.get("profile") in H264_PROFILES:
+        args += ["-profile:v", H264_PROFILES[video["profile"]]]
+    if video["codec_name"] == "h264" and int(video.get("level") or 0) > 0:
+        args += ["-level", str(video["level"])]
+    if video["codec_name"] == "hevc":
+        args += ["-tag:v", "hvc1"]
+    time_base = video.get("time_base", "")
+    if time_base.startswith("1/"):
+        args += ["-video_track_timescale", time_base[2:]]
+
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    if audio is not None:
+        args += ["-c:a", AUDIO_ENCODERS.get(audio.get("codec_name"), "aac")]
+        if audio.get("sample_rate"):
+            args += ["-ar", str(audio["sample_rate"])]
+        if audio.get("channels"):
+            args += ["-ac", str(audio["channels"])]
+        if audio.get("bit_rate"):
+            args += ["-b:a", str(audio["bit_rate"])]
+    return args
+
+
+def codec_parameters(probe: dict) -> Tuple[str, int, str]:
+    """Profile, level and extradata hash of the video stream in ``probe``."""
+    video = next((s for s in probe.get("streams", []) if s.get("codec_type") == "video"), {})
+    return video.get("profile") or "", int(video.get("level") or 0), video.get("extradata_hash") or ""
+
+
+def _run(cmd: List[str], duration: Optional[float], *outputs: Path) -> None:
+    run(cmd)
+
+
+def _cut_cmd(src: Path, segment: CutSegment) -> List[str]:
+    return [FFMPEG, "-y", "-v", "error", "-nostdin",
+            "-ss", f"{segment.start:.6f}", "-i", str(src), "-t", f"{segment.end - segment.start:.6f}",
+            "-map", "0:v:0", "-map", "0:a?"]
+
+
+def _copy_gops(src: Path, segment: CutSegment, out: Path, to_eof: bool,
+               runner: Callable[..., None] = _run) -> None:
+    """Stream-copy the GOPs in ``segment``, ending exactly at the keyframe at its end."""
+    # Starting just after the keyframe makes the demuxer seek to that keyframe
+    # and not the one before it.
+    start = segment.start + KEYFRAME_EPSILON
+    cmd = [FFMPEG, "-y", "-v", "error", "-nostdin", "-ss", f"{start:.6f}", "-i", str(src),
+           "-map", "0:v:0", "-map", "0:a?", "-c", "copy", "-avoid_negative_ts", "make_zero"]
+    length = segment.end - segment.start
+    if to_eof:
+        runner(cmd + [str(out)], length, out)
+        return
+    # -t alone cuts by timestamp and keeps reordered B-frames past the end
+    # keyframe; the segment muxer splits exactly at that keyframe instead.
+    pattern = out.with_name(out.stem + "_%d" + out.suffix)
+    runner(cmd + ["-t", f"{length + 1:.6f}", "-f", "segment",
+                  "-segment_times", f"{length - KEYFRAME_EPSILON:.6f}",
+                  "-segment_format", _MUXERS.get(out.suffix.lower(), "matroska"),
+                  "-reset_timestamps", "1", str(pattern)],
+           length + 1, *(out.with_name(f"{out.stem}_{i}{out.suffix}") for i in range(2)))
+    for piece in out.parent.glob(out.stem + "_*" + out.suffix):
+        if piece.name == out.stem + "_0" + out.suffix:
+            piece.replace(out)
+        else:
+            piece.unlink()
+
+
+def smart_cut(src: Path, start: float, end: float, output: Path,
+              catalog: Optional[MediaCatalog] = None, runner: Callable[..., None] = _run) -> List[CutSegment]:
+    """Write ``[start, end)`` seconds of ``src`` to ``output`` and return the plan used.
+
+    ``runner(cmd, duration, *outputs)`` runs each FFmpeg command, e.g.
+    ``JobContext.run_ffmpeg`` for progress and cancellation; by default they
+    run to completion with ``pipeline.run``.
+
+    Sources whose codec has no matching encoder are re-encoded in full to
+    H.264/AAC. If the re-encoded edges cannot share the source's codec
+    parameters, the range is re-encoded in full with the matching encoder.
+    """
+    probe = probe_media(src, catalog)
+    duration = probe_duration(src, catalog)
+    end = min(end, duration) if duration else end
+    try:
+        encode_args = matching_encoder_args(probe)
+    except ValueError:
+        segments = [CutSegment(start, end, copy=False)]
+        runner(_cut_cmd(src, segments[0]) + ["-c:v", "libx264", "-crf", "18", "-preset", "fast",
+                                             "-c:a", "aac", str(output)], end - start, output)
+        return segments
+
+    origin = float(probe.get("format", {}).get("start_time") or 0.0)
+    keyframes = [t - origin for t in probe_keyframes(src, catalog)]
+    segments = plan_smart_cut(keyframes, start, end, duration)
+
+    def reencode(reason: str) -> List[CutSegment]:
+        log.info("Re-encoding %s from %.3fs to %.3fs in full: %s", src, start, end, reason)
+        segment = CutSegment(start, end, copy=False)
+        runner(_cut_cmd(src, segment) + encode_args + [str(output)], end - start, output)
+        return [segment]
+
+    source_params = codec_parameters(probe)
+    spliced = len(segments) > 1
+    if spliced and not source_params[2]:
+        return reencode("the source has no codec parameters for the edges to match")
+
+    suffix = output.suffix if output.suffix.lower() in _MUXERS else ".mkv"
+    workdir = Path(tempfile.mkdtemp(prefix="smartcut_"))
+    try:
+        pieces = []
+        for i, segment in enumerate(segments):
+            piece = workdir / f"piece{i}{suffix}"
+            if segment.copy:
+                _copy_gops(src, segment, piece, duration > 0 and segment.end >= duration - KEYFRAME_EPSILON, runner)
+            else:
+                runner(_cut_cmd(src, segment) + encode_args + [str(piece)], segment.end - segment.start, piece)
+                # Stream-copied GOPs would be decoded with the edges' SPS/PPS
+                if spliced and codec_parameters(probe_media(piece)) != source_params:
+                    return reencode("the re-encoded edges do not reproduce the source's codec parameters")
+            pieces.append(piece)
+        if len(pieces) == 1 and suffix == output.suffix:
+            shutil.move(str(pieces[0]), str(output))
+        else:
+            concat_list = workdir / "pieces.txt"
+            build_concat_file(pieces, concat_list)
+            runner([FFMPEG, "-y", "-v", "error", "-nostdin", "-f", "concat", "-safe", "0",
+                    "-i", str(concat_list), "-map", "0", "-c", "copy", str(output)], end - start, output)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return segments
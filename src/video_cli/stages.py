@@ -0,0 +1,438 @@
+"""Pipeline stages as a dependency graph.
+
+A ``Stage`` names the artifacts it reads and the typed artifacts it
+produces, and a function that turns one into the other. ``StageGraph``
+orders stages by those names and runs each stage as soon as its inputs
+exist, on a small thread pool, so independent branches (clips being
+normalized, subtitles being merged) overlap. With a ``StageCache`` every
+stage is memoized under a key hashing its name, version and parameters
+together with the keys of its inputs: a source file's fingerprint, or the
+key of the stage that produced an intermediate artifact. Keys are therefore
+known before anything runs, and ``plan`` can tell which stages would be
+skipped.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .catalog import MediaCatalog, file_fingerprint
+from .ffmpeg_progress import CancelToken, FFmpegProcess, ProcessCancelled, Progress
+from .utils import cache_dir, ensure_dir
+
+
+def default_stage_cache_bytes() -> int:
+    """Cache cap from ``VIDEO_CLI_STAGE_CACHE_MB``, 10 GiB by default."""
+    return int(os.environ.get("VIDEO_CLI_STAGE_CACHE_MB", 10 * 1024)) << 20
+
+
+@dataclass(frozen=True)
+class PipelineEvent:
+    """Structured progress from ``run_pipeline`` for a UI."""
+
+    kind: str  # "stage" when a stage starts, "progress" while FFmpeg runs, "output" per FFmpeg log line, "done"
+    stage: str  # normalize, concat, captions, subtitles, bgm, output, renditions
+    message: str = ""
+    fraction: float = 0.0  # of the whole run
+    eta: Optional[float] = None  # of the running FFmpeg step, seconds
+
+
+@dataclass
+class Stage:
+    """One node: ``run(ctx)`` maps the ``inputs`` artifacts to the ``outputs`` ones.
+
+    ``outputs`` maps artifact names to their types; ``Path`` outputs must be
+    written inside ``ctx.workdir``. Stages with side effects outside it set
+    ``memoize`` to False.
+    """
+
+    name: str  # unique in the graph
+    run: Callable[["StageContext"], Dict[str, Any]]
+    inputs: Tuple[str, ...] = ()
+    outputs: Dict[str, type] = field(default_factory=dict)
+    params: Dict[str, Any] = field(default_factory=dict)  # anything else the result depends on
+    group: str = ""  # stage name in events; defaults to ``name``
+    label: str = ""  # message when the stage starts; stages without one run silently
+    weight: float = 0.0  # share of the run's progress
+    duration: Optional[float] = None  # expected output seconds of its FFmpeg steps
+    memoize: bool = True
+    version: int = 1  # bump when the stage's output changes for the same inputs
+
+
+@dataclass(frozen=True)
+class PlannedStage:
+    stage: Stage
+    key: str
+    cached: bool
+
+
+class StageContext:
+    """What a running stage gets: its inputs, a scratch directory and an FFmpeg runner."""
+
+    def __init__(self, stage: Stage, inputs: Dict[str, Any], workdir: Path, reporter: "_GraphReporter"):
+        self.stage = stage
+        self.inputs = inputs
+        self.workdir = workdir
+        self._reporter = reporter
+        self.fraction = 0.0
+
+    def __getitem__(self, name: str) -> Any:
+        return self.inputs[name]
+
+    @property
+    def cancel(self) -> CancelToken:
+        return self._reporter.cancel
+
+    def check_cancelled(self) -> None:
+        self._reporter.cancel.check_cancelled()
+
+    def report(self, fraction: float) -> None:
+        """Progress of work done elsewhere than ``run``, as a fraction of this stage."""
+        self._reporter.progress(self, Progress(0.0, fraction, None, None))
+
+    def run(self, cmd: List[str], cwd: Optional[Path] = None, outputs: Optional[List[Path]] = None,
+            stdout=None) -> None:
+        """Run FFmpeg under the run's cancellation, reporting its progress as this stage's."""
+        self.check_cancelled()
+        outputs = [Path(cmd[-1])] if outputs is None else outputs
+        reporter = self._reporter
+        self._reporter.cancel.run(FFmpegProcess(
+            cmd, self.stage.duration, outputs=outputs, cwd=cwd, stdout=stdout,
+            on_progress=lambda progress: reporter.progress(self, progress),
+            on_output=lambda line: reporter.output(self.stage, line),
+        ))
+
+
+class StageCache:
+    """Memoized stage outputs, one directory per stage key, capped at ``max_bytes``.
+
+    Entries pinned by a running graph are never evicted, so the cache may
+    exceed its cap until those runs finish and ``evict`` is called again.
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_bytes: Optional[int] = None):
+        self.root = Path(root) if root else cache_dir() / "stages"
+        self.max_bytes = default_stage_cache_bytes() if max_bytes is None else max_bytes
+        ensure_dir(self.root)
+        self._lock = threading.Lock()
+        self._pinned: Counter = Counter()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Outputs stored under ``key``, marking them as recently used."""
+        manifest = self.root / key / "manifest.json"
+        # Under the lock: eviction may be deleting this entry
+        with self._lock:
+            try:
+                with open(manifest, encoding="utf-8") as f:
+                    stored = json.load(f)
+            except (OSError, ValueError):
+                return None
+            outputs = {}
+            for name, (kind, value) in stored.items():
+                if kind == "path":
+                    path = self.root / key / value
+                    if not path.exists():
+                        return None
+                    outputs[name] = path
+                else:
+                    outputs[name] = value
+            os.utime(manifest)
+        return outputs
+
+    @contextmanager
+    def pinned(self, keys: Iterable[str]) -> Iterator[None]:
+        """Keep the entries for ``keys`` from being evicted while the block runs."""
+        keys = list(keys)
+        with self._lock:
+            self._pinned.update(keys)
+        try:
+            yield
+        finally:
+            with self._lock:
+                for key in keys:
+                    self._pinned[key] -= 1
+                    if self._pinned[key] <= 0:
+                        del self._pinned[key]
+
+    def workdir(self, key: str) -> Path:
+        """A fresh directory on the cache's filesystem for a stage about to run."""
+        return Path(tempfile.mkdtemp(prefix=f"{key}.part-", dir=self.root))
+
+    def put(self, key: str, workdir: Path, outputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep ``workdir`` as the entry for ``key``; returns the outputs at their cached location."""
+        entry = self.root / key
+        stored = {}
+        for name, value in outputs.items():
+            if isinstance(value, Path):
+                stored[name] = ("path", str(value.relative_to(workdir)))
+            else:
+                stored[name] = ("value", value)
+        with open(workdir / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        with self._lock:
+            if entry.exists():
+                shutil.rmtree(entry, ignore_errors=True)
+            os.replace(workdir, entry)
+        self.evict(keep=[entry])
+        return {name: entry / value.relative_to(workdir) if isinstance(value, Path) else value
+                for name, value in outputs.items()}
+
+    def evict(self, keep=()) -> List[Path]:
+        """Delete least recently used entries until the cache fits its cap."""
+        keep = set(map(Path, keep))
+        with self._lock:
+            entries = []
+            for entry in self.root.iterdir():
+                if ".part-" in entry.name:
+                    continue
+                manifest = entry / "manifest.json"
+                try:
+                    used = manifest.stat().st_mtime
+                except OSError:
+                    continue
+                size = sum(p.stat().st_size for p in entry.rglob("*") if p.is_file())
+                entries.append((used, size, entry))
+            total = sum(size for _, size, _ in entries)
+            removed = []
+            for _, size, entry in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if entry in keep or self._pinned[entry.name]:
+                    continue
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                removed.append(entry)
+            return removed
+
+
+def source_key(value: Any, catalog: Optional[MediaCatalog] = None) -> str:
+    """Key of a source artifact: files by fingerprint, anything else by value."""
+    if isinstance(value, Path):
+        try:
+            return (catalog.fingerprint(value) if catalog is not None else file_fingerprint(value)).key
+        except OSError:
+            return f"missing:{value}"
+    if isinstance(value, (list, tuple)):
+        return _digest([source_key(v, catalog) for v in value])
+    return _digest(value)
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class StageGraph:
+    """Stages wired together by artifact name."""
+
+    def __init__(self):
+        self.stages: List[Stage] = []
+        self._producers: Dict[str, Stage] = {}
+
+    def add(self, stage: Stage) -> Stage:
+        if any(s.name == stage.name for s in self.stages):
+            raise ValueError(f"Duplicate stage {stage.name!r}")
+        for name in stage.outputs:
+            if name in self._producers:
+                raise ValueError(f"{name!r} is produced by both {self._producers[name].name!r} and {stage.name!r}")
+            self._producers[name] = stage
+        self.stages.append(stage)
+        return stage
+
+    def produces(self, name: str) -> bool:
+        return name in self._producers
+
+    def order(self, sources: Dict[str, Any]) -> List[Stage]:
+        """Stages in a runnable order (insertion order where there is a choice)."""
+        available = set(sources)
+        ordered: List[Stage] = []
+        remaining = list(self.stages)
+        while remaining:
+            ready = [s for s in remaining if all(name in available for name in s.inputs)]
+            if not ready:
+                missing = sorted({n for s in remaining for n in s.inputs if n not in available and n not in self._producers})
+                if missing:
+                    raise ValueError(f"No source or stage provides {', '.join(missing)}")
+                raise ValueError(f"Stages form a cycle: {', '.join(s.name for s in remaining)}")
+            stage = ready[0]
+            remaining.remove(stage)
+            ordered.append(stage)
+            available.update(stage.outputs)
+        return ordered
+
+    def keys(self, sources: Dict[str, Any], catalog: Optional[MediaCatalog] = None) -> Dict[str, str]:
+        """Memoization key of every stage, computed without running anything."""
+        artifact_keys = {name: source_key(value, catalog) for name, value in sources.items()}
+        keys = {}
+        for stage in self.order(sources):
+            key = _digest([stage.name, stage.version, stage.params, [artifact_keys[n] for n in stage.inputs]])
+            keys[stage.name] = key
+            for name in stage.outputs:
+                artifact_keys[name] = _digest([key, name])
+        return keys
+
+    def plan(self, sources: Dict[str, Any], cache: Optional[StageCache] = None,
+             catalog: Optional[MediaCatalog] = None) -> List[PlannedStage]:
+        keys = self.keys(sources, catalog)
+        return [PlannedStage(stage, keys[stage.name],
+                             cache is not None and stage.memoize and cache.get(keys[stage.name]) is not None)
+                for stage in self.order(sources)]
+
+    def run(
+        self,
+        sources: Dict[str, Any],
+        tmpdir: Path,
+        cache: Optional[StageCache] = None,
+        catalog: Optional[MediaCatalog] = None,
+        on_event: Optional[Callable[[PipelineEvent], None]] = None,
+        cancel: Optional[CancelToken] = None,
+        jobs: int = 2,
+    ) -> Dict[str, Any]:
+        """Run every stage, at most ``jobs`` at a time; returns all artifacts by name.
+
+        If a stage fails the others are cancelled and its error is raised.
+        Every cache entry of the graph is pinned while it runs, so results a
+        later stage still has to read are not evicted.
+        """
+        order = self.order(sources)
+        keys = self.keys(sources, catalog) if cache is not None else {}
+        reporter = _GraphReporter(sum(s.weight for s in order), on_event, cancel)
+        artifacts = dict(sources)
+        pending = list(order)
+        running: Dict[Future, Stage] = {}
+        error: Optional[BaseException] = None
+        with cache.pinned(keys.values()) if cache is not None else nullcontext(), \
+                ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            while (pending and error is None) or running:
+                for stage in list(pending):
+                    if error is not None or len(running) >= max(1, jobs):
+                        break
+                    if not all(name in artifacts for name in stage.inputs):
+                        continue
+                    pending.remove(stage)
+                    cached = cache.get(keys[stage.name]) if cache is not None and stage.memoize else None
+                    if cached is not None and set(cached) == set(stage.outputs):
+                        reporter.skipped(stage)
+                        artifacts.update(cached)
+                        continue
+                    if reporter.cancel.cancelled:
+                        error = ProcessCancelled("cancelled")
+                        break
+                    inputs = {name: artifacts[name] for name in stage.inputs}
+                    running[pool.submit(self._run_stage, stage, inputs, tmpdir, keys.get(stage.name), cache,
+                                        reporter)] = stage
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+                    try:
+                        artifacts.update(future.result())
+                    except BaseException as e:
+                        # Keep the first real failure; the others were cancelled because of it
+                        if error is None or isinstance(error, ProcessCancelled):
+                            error = e
+                        reporter.cancel.cancel()
+        if error is not None:
+            raise error
+        return artifacts
+
+    def _run_stage(self, stage: Stage, inputs: Dict[str, Any], tmpdir: Path, key: Optional[str],
+                   cache: Optional[StageCache], reporter: "_GraphReporter") -> Dict[str, Any]:
+        memoized = cache is not None and stage.memoize
+        workdir = cache.workdir(key) if memoized else Path(tempfile.mkdtemp(prefix=f"{stage.name}-", dir=tmpdir))
+        ctx = StageContext(stage, inputs, workdir, reporter)
+        reporter.started(ctx)
+        try:
+            outputs = stage.run(ctx)
+            if set(outputs) != set(stage.outputs):
+                raise TypeError(f"Stage {stage.name!r} returned {sorted(outputs)}, expected {sorted(stage.outputs)}")
+            for name, kind in stage.outputs.items():
+                if not isinstance(outputs[name], kind):
+                    raise TypeError(f"Stage {stage.name!r} output {name!r} is not a {kind.__name__}")
+            if memoized:
+                outputs = cache.put(key, workdir, outputs)
+        except BaseException:
+            if memoized:
+                shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        reporter.finished(ctx)
+        return outputs
+
+
+def format_plan(plan: List[PlannedStage]) -> str:
+    """Human-readable ``--plan`` output."""
+    width = max((len(p.stage.name) for p in plan), default=0)
+    lines = []
+    for p in plan:
+        if p.cached:
+            action = "cached"
+        elif p.stage.memoize:
+            action = "run"
+        else:
+            action = "run (always)"
+        flow = f"{', '.join(p.stage.inputs) or '-'} -> {', '.join(p.stage.outputs) or '-'}"
+        lines.append(f"{p.stage.name:<{width}}  {action:<12}  {p.key[:10]}  {flow}")
+    skipped = sum(p.cached for p in plan)
+    lines.append(f"{len(plan)} stages, {skipped} cached, {len(plan) - skipped} to run")
+    return "\n".join(lines)
+
+
+class _GraphReporter:
+    """Weighted overall progress over the stages of one run, and its cancellation.
+
+    Stage weights are estimates of the media seconds each stage processes,
+    with cheap stream copies counting a fraction of their duration. Stages
+    running at the same time each contribute their own fraction.
+    """
+
+    def __init__(self, total_weight: float, on_event: Optional[Callable[[PipelineEvent], None]],
+                 cancel: Optional[CancelToken]):
+        self.total_weight = total_weight or 1.0
+        self.on_event = on_event
+        self.cancel = cancel or CancelToken()
+        self.completed = 0.0
+        self.running: List[StageContext] = []
+        self._lock = threading.Lock()
+
+    def started(self, ctx: StageContext) -> None:
+        with self._lock:
+            self.running.append(ctx)
+            if ctx.stage.label:
+                self._emit("stage", ctx.stage, ctx.stage.label)
+
+    def skipped(self, stage: Stage) -> None:
+        with self._lock:
+            self.completed += stage.weight
+            if stage.label:
+                self._emit("stage", stage, f"{stage.label} (cached)")
+
+    def finished(self, ctx: StageContext) -> None:
+        with self._lock:
+            self.running.remove(ctx)
+            self.completed += ctx.stage.weight
+
+    def progress(self, ctx: StageContext, progress: Progress) -> None:
+        with self._lock:
+            # A stage may run several FFmpeg steps; never go backwards
+            ctx.fraction = max(ctx.fraction, progress.fraction or 0.0)
+            self._emit("progress", ctx.stage, "", progress.eta)
+
+    def output(self, stage: Stage, line: str) -> None:
+        if line:
+            with self._lock:
+                self._emit("output", stage, line)
+
+    def _emit(self, kind: str, stage: Stage, message: str, eta: Optional[float] = None) -> None:
+        if self.on_event is not None:
+            done = self.completed + sum(c.stage.weight * c.fraction for c in self.running)
+            fraction = min(1.0, done / self.total_weight)
+            self.on_event(PipelineEvent(kind, stage.group or stage.name, message, fraction, eta))
@@ -0,0 +1,53 @@
+"""Startup timing for the Tk front ends.
+
+Set ``VIDEO_CLI_STARTUP_TIMING=1`` to print how long each startup phase of
+``app_gui.py`` or ``gui.py`` took, up to the window being mapped. For a
+per-module breakdown of import cost run the GUI with ``python -X importtime``.
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+from typing import IO, List, Optional, Tuple
+
+STARTUP_TIMING_ENV = "VIDEO_CLI_STARTUP_TIMING"
+
+
+def startup_timing_enabled() -> bool:
+    return os.environ.get(STARTUP_TIMING_ENV, "").strip().lower() not in ("", "0", "false", "no")
+
+
+class StartupTimer:
+    """Named phase marks relative to when the timer was created."""
+
+    def __init__(self, enabled: Optional[bool] = None, stream: Optional[IO[str]] = None):
+        self.enabled = startup_timing_enabled() if enabled is None else enabled
+        self.stream = stream
+        self.start = time.perf_counter()
+        self.marks: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> float:
+        """Record ``phase`` as finished now; returns seconds since the timer started."""
+        elapsed = time.perf_counter() - self.start
+        self.marks.append((phase, elapsed))
+        return elapsed
+
+    def report(self) -> str:
+        parts, previous = [], 0.0
+        for phase, elapsed in self.marks:
+            parts.append(f"{phase} {1000 * (elapsed - previous):.0f} ms")
+            previous = elapsed
+        return f"startup: {', '.join(parts)} (total {1000 * previous:.0f} ms)"
+
+    def emit(self) -> None:
+        if self.enabled:
+            print(self.report(), file=self.stream or sys.stderr, flush=True)
+
+    def watch_window(self, root) -> None:
+        """Mark "window shown" and emit the report once ``root`` is first mapped."""
+        def on_map(event):
+            if event.widget is root and not any(phase == "window shown" for phase, _ in self.marks):
+                self.mark("window shown")
+                self.emit()
+
+        root.bind("<Map>", on_map, add="+")
@@ -0,0 +1,210 @@
+"""Normalization target chosen from the clips being joined.
+
+Clips are normalized to one format so they can be joined by stream copy.
+Instead of a fixed format, ``plan_target`` picks the resolution, frame
+rate, pixel format and audio layout that the most clips already have, within
+the configured ``Caps``. A batch of 25fps 720p clips stays 25fps 720p, so
+it is not resampled to another frame rate (which judders).
+
+A joined MP4 declares one set of H.264 parameters (profile, level, SPS and
+PPS) for the whole video, so copied video may only be joined with video
+encoded identically. ``plan_actions`` therefore copies video only when every
+clip is in the target format with the same profile, level and extradata;
+those clips are copied as is or have only their audio re-encoded. Otherwise
+every clip is transcoded.
+"""
+from __future__ import annotations
+import re
+from collections import Counter
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# What normalizing a clip takes
+COPY = "copy"            # already in the target format; stream copied
+AUDIO = "audio"          # video copied, audio re-encoded
+TRANSCODE = "transcode"  # video and audio re-encoded
+
+# Codecs a clip may be copied in; normalized clips are H.264/AAC
+VIDEO_CODEC = "h264"
+AUDIO_CODEC = "aac"
+
+_SIZE = re.compile(r"^(\d+)x(\d+)$")
+
+
+@dataclass(frozen=True)
+class Caps:
+    """Upper bounds for the target; clips above them are scaled or resampled down."""
+
+    max_width: int = 1920
+    max_height: int = 1080
+    max_fps: float = 30.0
+    pix_fmts: Tuple[str, ...] = ("yuv420p",)  # First one is used when no clip has an allowed format
+    max_sample_rate: int = 48000
+    max_channels: int = 2
+
+
+DEFAULT_CAPS = Caps()
+
+
+@dataclass(frozen=True)
+class NormalizeTarget:
+    """The format every clip is normalized to."""
+
+    width: int
+    height: int
+    fps: str  # Exact rate, e.g. "25/1" or "30000/1001"
+    pix_fmt: str = "yuv420p"
+    sample_rate: int = 48000
+    channels: int = 2
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+@dataclass(frozen=True)
+class ClipFormat:
+    """The parts of a clip's probe that decide whether it can be copied."""
+
+    width: int
+    height: int
+    fps: Optional[Fraction]  # None for variable frame rate
+    pix_fmt: str
+    video_codec: str
+    plain: bool  # square pixels and no rotation
+    profile: str = ""
+    level: int = 0
+    extradata: str = ""  # Hash of the codec parameters (avcC), "" if unknown
+    sample_rate: Optional[int] = None  # None without audio
+    channels: Optional[int] = None
+    audio_codec: Optional[str] = None
+
+    @classmethod
+    def from_probe(cls, info: Dict[str, Any]) -> Optional["ClipFormat"]:
+        """The format from ``probe_media`` output, or None without a video stream."""
+        streams = info.get("streams", [])
+        video = next((s for s in streams if s.get("codec_type") == "video"), None)
+        if video is None:
+            return None
+        audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+        rate, avg = _rate(video.get("r_frame_rate")), _rate(video.get("avg_frame_rate"))
+        rotated = any(side.get("rotation") for side in video.get("side_data_list", []))
+        rotated = rotated or (video.get("tags") or {}).get("rotate") not in (None, "0")
+        return cls(
+            width=int(video.get("width") or 0),
+            height=int(video.get("height") or 0),
+            fps=rate if rate is not None and rate == avg else None,
+            pix_fmt=video.get("pix_fmt") or "",
+            video_codec=video.get("codec_name") or "",
+            plain=video.get("sample_aspect_ratio") in (None, "1:1", "0:1") and not rotated,
+            profile=video.get("profile") or "",
+            level=int(video.get("level") or 0),
+            extradata=video.get("extradata_hash") or "",
+            sample_rate=int(audio.get("sample_rate") or 0) if audio else None,
+            channels=int(audio.get("channels") or 0) if audio else None,
+            audio_codec=audio.get("codec_name") if audio else None,
+        )
+
+    def capped(self, caps: Caps) -> Tuple[int, int, Fraction, str]:
+        """The video format this clip would be normalized to on its own."""
+        scale = 1.0
+        if self.width and self.height:
+            scale = min(scale, caps.max_width / self.width, caps.max_height / self.height)
+        width, height = int(self.width * scale) // 2 * 2, int(self.height * scale) // 2 * 2
+        pix_fmt = self.pix_fmt if self.pix_fmt in caps.pix_fmts else caps.pix_fmts[0]
+        return width, height, _capped_rate(self.fps or Fraction(30), caps.max_fps), pix_fmt
+
+    def video_matches(self, target: NormalizeTarget) -> bool:
+        return (self.video_codec == VIDEO_CODEC and self.plain and self.fps == Fraction(target.fps)
+                and (self.width, self.height, self.pix_fmt) == (target.width, target.height, target.pix_fmt))
+
+    def audio_matches(self, target: NormalizeTarget) -> bool:
+        if self.sample_rate is None:
+            return True
+        return (self.audio_codec, self.sample_rate, self.channels) == (AUDIO_CODEC, target.sample_rate, target.channels)
+
+
+def _rate(value: Optional[str]) -> Optional[Fraction]:
+    try:
+        rate = Fraction(value or "")
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate if rate > 0 else None
+
+
+def _capped_rate(rate: Fraction, max_fps: float) -> Fraction:
+    # Drop whole frames (60 -> 30, 50 -> 25) rather than resample to an unrelated rate
+    divisor = 1
+    while rate / divisor > max_fps:
+        divisor += 1
+    return rate / divisor
+
+
+def parse_size(spec: str) -> Tuple[int, int]:
+    """Parse ``WIDTHxHEIGHT``, e.g. ``1920x1080``."""
+    match = _SIZE.match(spec.strip())
+    if not match or int(match.group(1)) < 2 or int(match.group(2)) < 2:
+        raise ValueError(f"Bad size {spec!r}; expected e.g. 1920x1080")
+    return int(match.group(1)), int(match.group(2))
+
+
+def plan_target(clips: List[Optional[ClipFormat]], caps: Caps = DEFAULT_CAPS) -> NormalizeTarget:
+    """The target within ``caps`` that the most ``clips`` can be copied to.
+
+    Every clip's own format (capped) is a candidate. Candidates are ranked by
+    how many clips already match them, then by how many clips would be
+    scaled or resampled to them anyway, then by size. The audio layout is
+    chosen the same way among the clips whose video can be copied.
+    """
+    known = [clip for clip in clips if clip is not None]
+    votes: Counter = Counter()
+    native: Counter = Counter()
+    for clip in known:
+        width, height, fps, pix_fmt = candidate = clip.capped(caps)
+        votes[candidate] += 1
+        native[candidate] += clip.video_matches(NormalizeTarget(width, height, str(fps), pix_fmt))
+    if votes:
+        width, height, fps, pix_fmt = max(votes, key=lambda c: (native[c], votes[c], c[0] * c[1], c[2]))
+    else:
+        width, height, fps, pix_fmt = (caps.max_width // 2 * 2, caps.max_height // 2 * 2,
+                                       _capped_rate(Fraction(30), caps.max_fps), caps.pix_fmts[0])
+    video = NormalizeTarget(width, height, str(fps), pix_fmt)
+
+    # Audio only decides between COPY and AUDIO for clips whose video is copied
+    layouts: Counter = Counter()
+    copyable: Counter = Counter()
+    for clip in known:
+        if clip.sample_rate:
+            layout = (min(clip.sample_rate, caps.max_sample_rate), min(clip.channels or 2, caps.max_channels))
+            layouts[layout] += 1
+            if clip.video_matches(video):
+                copyable[layout] += clip.audio_matches(NormalizeTarget(width, height, str(fps), pix_fmt, *layout))
+    if not layouts:
+        return video
+    sample_rate, channels = max(layouts, key=lambda layout: (copyable[layout], layouts[layout], layout))
+    return NormalizeTarget(width, height, str(fps), pix_fmt, sample_rate, channels)
+
+
+def action_for(clip: Optional[ClipFormat], target: NormalizeTarget) -> str:
+    """``COPY``, ``AUDIO`` or ``TRANSCODE``: what normalizing ``clip`` to ``target`` takes on its own.
+
+    Whether its video can be joined to the other clips is up to ``plan_actions``.
+    """
+    if clip is None or not clip.video_matches(target):
+        return TRANSCODE
+    return COPY if clip.audio_matches(target) else AUDIO
+
+
+def plan_actions(clips: List[Optional[ClipFormat]], target: NormalizeTarget) -> List[str]:
+    """What normalizing each of ``clips`` to ``target`` takes, as a batch.
+
+    Video is copied only if all of it can be, with one profile, level and
+    extradata; a mix would join differently encoded H.264 under one set of
+    parameters, which strict and hardware decoders need not play.
+    """
+    actions = [action_for(clip, target) for clip in clips]
+    params = {(clip.profile, clip.level, clip.extradata) for clip in clips if clip is not None}
+    if TRANSCODE in actions or len(params) != 1 or not next(iter(params))[2]:
+        return [TRANSCODE] * len(clips)
+    return actions
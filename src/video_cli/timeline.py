@@ -0,0 +1,112 @@
+"""Background probing of clip durations and thumbnail filmstrips for timelines.
+
+Work runs on a small thread pool (each task is an ffprobe/ffmpeg subprocess)
+and results are posted to a queue as they finish, so a Tk timeline can drain
+them from an ``after()`` timer and never block. Results are cached in the
+media catalog by file fingerprint, which makes a second load instant.
+"""
+from __future__ import annotations
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from .catalog import MediaCatalog
+from .pipeline import extract_thumbnail, probe_duration
+
+
+def filmstrip_times(duration: float, count: int) -> List[float]:
+    """Timestamps at the middle of ``count`` equal slices of the clip."""
+    if duration <= 0 or count <= 0:
+        return [0.0] if count > 0 else []
+    step = duration / count
+    return [round(step * (i + 0.5), 3) for i in range(count)]
+
+
+class TimelineAnalyzer:
+    """Probe durations and extract filmstrips for clips on a worker pool.
+
+    Events put on ``events`` are tuples:
+
+    * ``("duration", path, seconds)``
+    * ``("thumbnail", path, slot, count, jpeg_bytes)``
+    * ``("error", path, message)``
+
+    ``filmstrip_count`` maps a clip duration to the number of thumbnails to
+    extract for it, letting the caller size strips to its own pixel scale.
+    ``source_for`` maps a clip to the file thumbnails are decoded from, such
+    as a ready proxy; it is called on the worker threads.
+    """
+
+    def __init__(
+        self,
+        catalog: Optional[MediaCatalog] = None,
+        filmstrip_count: Callable[[float], int] = lambda duration: 1,
+        thumb_width: int = 128,
+        max_workers: Optional[int] = None,
+        source_for: Callable[[Path], Optional[Path]] = lambda path: None,
+    ):
+        self.catalog = catalog
+        self.filmstrip_count = filmstrip_count
+        self.source_for = source_for
+        self.thumb_width = thumb_width
+        self.events: "queue.Queue[Tuple]" = queue.Queue()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or min(4, os.cpu_count() or 1),
+            thread_name_prefix="timeline",
+        )
+        self._lock = threading.Lock()
+        self._submitted: Set[Path] = set()
+
+    def submit(self, paths: Iterable[Path]) -> None:
+        """Queue analysis for clips not seen before.
+
+        All duration probes are queued ahead of the filmstrips so the timeline
+        gets its real layout first and fills in pictures afterwards.
+        """
+        new: List[Path] = []
+        with self._lock:
+            for p in map(Path, paths):
+                if p not in self._submitted:
+                    self._submitted.add(p)
+                    new.append(p)
+        for path in new:
+            self._pool.submit(self._probe_duration, path)
+        for path in new:
+            self._pool.submit(self._extract_filmstrip, path)
+
+    def forget(self, path: Path) -> None:
+        """Allow ``path`` to be analyzed again by a later ``submit``."""
+        with self._lock:
+            self._submitted.discard(Path(path))
+
+    def drain(self, limit: int = 64) -> List[Tuple]:
+        """Return up to ``limit`` finished events without blocking."""
+        events = []
+        while len(events) < limit:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _probe_duration(self, path: Path) -> None:
+        try:
+            self.events.put(("duration", path, probe_duration(path, self.catalog)))
+        except Exception as e:
+            self.events.put(("error", path, str(e)))
+
+    def _extract_filmstrip(self, path: Path) -> None:
+        try:
+            duration = probe_duration(path, self.catalog)
+            times = filmstrip_times(duration, self.filmstrip_count(duration))
+            for slot, t in enumerate(times):
+                data = extract_thumbnail(path, t, self.thumb_width, self.catalog, self.source_for(path))
+                self.events.put(("thumbnail", path, slot, len(times), data))
+        except Exception as e:
+            self.events.put(("error", path, str(e)))
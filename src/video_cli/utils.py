@@ -1,5 +1,6 @@
 """Utility functions for file system operations and directory management."""
 from __future__ import annotations
+import os
 from pathlib import Path
 from typing import List, Optional
 
@@ -22,3 +23,19 @@ def pick_bgm_file(bgm_dir: Path) -> Optional[Path]:
         return None
     candidates = find_files_sorted(bgm_dir, [".mp3", ".wav", ".m4a", ".flac", ".aac", ".ogg"])
     return candidates[0] if candidates else None
+
+
+def cache_dir() -> Path:
+    """Return the per-user cache directory shared by the CLI and both GUIs.
+
+    Overridable with the ``VIDEO_CLI_CACHE_DIR`` environment variable.
+    """
+    override = os.environ.get("VIDEO_CLI_CACHE_DIR")
+    if override:
+        base = Path(override)
+    elif os.name == "nt":
+        base = Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local")) / "video_cli"
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "video_cli"
+    ensure_dir(base)
+    return base
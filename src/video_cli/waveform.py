@@ -0,0 +1,171 @@
+"""Multi-resolution waveform peaks for drawing audio at any zoom level.
+
+Audio is decoded once by FFmpeg to mono PCM and streamed through NumPy
+min/max reductions. Level 0 holds the min and max of every ``base_block``
+samples; each further level reduces the previous one by ``factor``. Drawing
+picks the coarsest level that still has at least one block per pixel column,
+so a two-hour track renders from a few thousand values. Pyramids are saved
+to the user cache per file fingerprint and are never rebuilt for an
+unchanged file.
+"""
+from __future__ import annotations
+import subprocess
+import threading
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .catalog import MediaCatalog, file_fingerprint
+from .pipeline import FFMPEG
+from .utils import cache_dir, ensure_dir
+
+
+PEAK_SAMPLE_RATE = 22050
+PEAK_BASE_BLOCK = 64
+PEAK_FACTOR = 4
+_READ_BYTES = 1 << 20
+
+
+@dataclass
+class PeakPyramid:
+    """Per-level ``(mins, maxs)`` arrays of int16 peaks."""
+
+    sample_rate: int
+    base_block: int
+    factor: int
+    mins: List[np.ndarray]
+    maxs: List[np.ndarray]
+
+    @property
+    def duration(self) -> float:
+        if not self.mins:
+            return 0.0
+        return len(self.mins[0]) * self.base_block / self.sample_rate
+
+    def block_seconds(self, level: int) -> float:
+        return self.base_block * self.factor ** level / self.sample_rate
+
+    def peaks(self, start: float, end: float, columns: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Min/max per pixel column for ``[start, end)`` seconds, normalized to -1..1.
+
+        Columns outside the audio are zero.
+        """
+        columns = max(1, columns)
+        out_min = np.zeros(columns, dtype=np.float32)
+        out_max = np.zeros(columns, dtype=np.float32)
+        if not self.mins or end <= start:
+            return out_min, out_max
+        per_column = (end - start) / columns
+        level = 0
+        while level + 1 < len(self.mins) and self.block_seconds(level + 1) <= per_column:
+            level += 1
+        block = self.block_seconds(level)
+        mins, maxs = self.mins[level], self.maxs[level]
+        # Block range [first, last) covered by each column
+        edges = np.floor((start + np.arange(columns + 1) * per_column) / block).astype(np.int64)
+        first, last = edges[:-1], np.maximum(edges[1:], edges[:-1] + 1)
+        valid = (first >= 0) & (first < len(mins))
+        if not valid.any():
+            return out_min, out_max
+        first = first[valid]
+        end_block = min(int(last[valid][-1]), len(mins))
+        out_min[valid] = np.minimum.reduceat(mins[:end_block], first) / 32768.0
+        out_max[valid] = np.maximum.reduceat(maxs[:end_block], first) / 32768.0
+        return out_min, out_max
+
+    def save(self, path: Path) -> None:
+        ensure_dir(path.parent)
+        arrays = {f"min{i}": a for i, a in enumerate(self.mins)}
+        arrays.update({f"max{i}": a for i, a in enumerate(self.maxs)})
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(tmp, meta=np.array([self.sample_rate, self.base_block, self.factor, len(self.mins)]), **arrays)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "PeakPyramid":
+        with np.load(path) as data:
+            sample_rate, base_block, factor, levels = (int(v) for v in data["meta"])
+            mins = [data[f"min{i}"] for i in range(levels)]
+            maxs = [data[f"max{i}"] for i in range(levels)]
+        return cls(sample_rate, base_block, factor, mins, maxs)
+
+
+def build_levels(mins: np.ndarray, maxs: np.ndarray, factor: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """Reduce level-0 peaks by ``factor`` until a single block remains."""
+    all_mins, all_maxs = [mins], [maxs]
+    while len(all_mins[-1]) > 1:
+        prev_min, prev_max = all_mins[-1], all_maxs[-1]
+        pad = (-len(prev_min)) % factor
+        if pad:
+            prev_min = np.concatenate([prev_min, np.repeat(prev_min[-1:], pad)])
+            prev_max = np.concatenate([prev_max, np.repeat(prev_max[-1:], pad)])
+        all_mins.append(prev_min.reshape(-1, factor).min(axis=1))
+        all_maxs.append(prev_max.reshape(-1, factor).max(axis=1))
+    return all_mins, all_maxs
+
+
+def build_peak_pyramid(
+    path: Path,
+    sample_rate: int = PEAK_SAMPLE_RATE,
+    base_block: int = PEAK_BASE_BLOCK,
+    factor: int = PEAK_FACTOR,
+) -> PeakPyramid:
+    """Decode ``path`` once and compute its peak pyramid."""
+    cmd = [FFMPEG, "-v", "error", "-nostdin", "-i", str(path), "-vn", "-map", "0:a:0",
+           "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-acodec", "pcm_s16le", "-"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Drain stderr on the side so a file logging many decode errors never blocks on a full pipe
+    stderr_tail: deque = deque(maxlen=40)
+    drain = threading.Thread(target=lambda: stderr_tail.extend(proc.stderr), daemon=True)
+    drain.start()
+    mins: List[np.ndarray] = []
+    maxs: List[np.ndarray] = []
+    carry = np.empty(0, dtype=np.int16)
+    try:
+        assert proc.stdout is not None
+        while True:
+            data = proc.stdout.read(_READ_BYTES)
+            if not data:
+                break
+            samples = np.frombuffer(data[:len(data) - len(data) % 2], dtype="<i2")
+            if carry.size:
+                samples = np.concatenate([carry, samples])
+            usable = len(samples) - len(samples) % base_block
+            blocks = samples[:usable].reshape(-1, base_block)
+            mins.append(blocks.min(axis=1))
+            maxs.append(blocks.max(axis=1))
+            carry = samples[usable:].copy()
+    finally:
+        proc.wait()
+        drain.join()
+    if proc.returncode != 0:
+        stderr = b"".join(stderr_tail).decode(errors="ignore")
+        raise RuntimeError(f"Waveform decode failed for {path}: {stderr}")
+    if carry.size:
+        mins.append(carry.min(keepdims=True))
+        maxs.append(carry.max(keepdims=True))
+    level0_min = np.concatenate(mins) if mins else np.zeros(1, dtype=np.int16)
+    level0_max = np.concatenate(maxs) if maxs else np.zeros(1, dtype=np.int16)
+    all_mins, all_maxs = build_levels(level0_min, level0_max, factor)
+    return PeakPyramid(sample_rate, base_block, factor, all_mins, all_maxs)
+
+
+def waveform_cache_path(key: str) -> Path:
+    return cache_dir() / "waveforms" / f"{key}.npz"
+
+
+def load_peak_pyramid(path: Path, catalog: Optional[MediaCatalog] = None) -> PeakPyramid:
+    """Return the cached pyramid for ``path``, building and saving it on first use."""
+    fp = catalog.fingerprint(path) if catalog is not None else file_fingerprint(path)
+    cache_path = waveform_cache_path(fp.key)
+    if cache_path.exists():
+        try:
+            return PeakPyramid.load(cache_path)
+        except (OSError, KeyError, ValueError):
+            cache_path.unlink(missing_ok=True)
+    pyramid = build_peak_pyramid(path)
+    pyramid.save(cache_path)
+    return pyramid
@@ -0,0 +1,66 @@
+"""Unit tests for the audio-mastered preview clock."""
+import io
+import time
+
+from src.video_cli.audio_playback import AudioClock
+
+
+class FakeSink:
+    """Plays each chunk in real time; one chunk may be queued behind the current one."""
+
+    latency = 0.0
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self.playing = []  # (end_time, size)
+        self.submitted = 0
+
+    def _advance(self):
+        now = time.monotonic()
+        while self.playing and self.playing[0][0] <= now:
+            self.playing.pop(0)
+            if self.playing:
+                end, size = self.playing[0]
+                self.playing[0] = (now + size / self.bytes_per_second, size)
+
+    def submit(self, pcm):
+        self._advance()
+        self.submitted += len(pcm)
+        end = time.monotonic() + len(pcm) / self.bytes_per_second
+        self.playing.append((end, len(pcm)))
+
+    def pending(self):
+        self._advance()
+        return len(self.playing) > 1
+
+    def stop(self):
+        self.playing = []
+
+
+def test_clock_follows_audio_and_free_runs_after_eof():
+    rate = 8000
+    bytes_per_second = rate * 2 * 2
+    pcm = bytes(int(bytes_per_second * 0.2))  # 200 ms of silence
+    sink = FakeSink(bytes_per_second)
+    clock = AudioClock(25, lambda seconds: io.BytesIO(pcm), sink, sample_rate=rate, chunk_samples=400)
+    clock.start(50)  # 2.0 s
+    try:
+        time.sleep(0.1)
+        assert 2.03 <= clock.position() <= 2.2
+        time.sleep(0.3)
+        assert sink.submitted == len(pcm)
+        # Past the end of the audio the clock keeps running on wall time
+        assert clock.position() >= 2.3
+        assert abs(clock.drift()) < 0.1
+    finally:
+        clock.stop()
+
+
+def test_clock_without_audio_runs_on_wall_time():
+    clock = AudioClock(30, lambda seconds: None, FakeSink(1))
+    clock.start(30)
+    try:
+        time.sleep(0.05)
+        assert 1.04 <= clock.position() <= 1.2
+    finally:
+        clock.stop()
@@ -0,0 +1,41 @@
+"""Unit tests for the SQLite media catalog."""
+import os
+from pathlib import Path
+
+from src.video_cli.catalog import MediaCatalog, file_fingerprint
+
+
+def test_fields_round_trip_and_invalidate_on_change(tmp_path: Path):
+    """Stored metadata is returned until the file changes."""
+    media = tmp_path / 'clip.mp4'
+    media.write_bytes(b'x' * 1000)
+    with MediaCatalog(tmp_path / 'catalog.sqlite3') as catalog:
+        catalog.update(media, duration=2.5, has_audio=1, keyframes=[0.0, 1.0])
+        assert catalog.get(media, 'duration') == 2.5
+        assert catalog.get(media, 'keyframes') == [0.0, 1.0]
+        assert catalog.fingerprint(media) == file_fingerprint(media)
+
+        media.write_bytes(b'y' * 1000)
+        os.utime(media, ns=(1, 1))
+        assert catalog.get(media, 'duration') is None
+
+
+def test_thumbnails_and_search(tmp_path: Path):
+    """Thumbnails are stored as blobs and search works without the files."""
+    a = tmp_path / 'a.mp4'
+    b = tmp_path / 'b.mp4'
+    a.write_bytes(b'a')
+    b.write_bytes(b'b')
+    with MediaCatalog(tmp_path / 'catalog.sqlite3') as catalog:
+        catalog.update(a, duration=10.0, has_audio=1)
+        catalog.update(b, duration=200.0, has_audio=0)
+        catalog.put_thumbnail(a, 1.0, 160, b'\xff\xd8jpeg')
+        assert catalog.get_thumbnail(a, 1.0, 160) == b'\xff\xd8jpeg'
+
+    a.unlink()
+    b.unlink()
+    with MediaCatalog(tmp_path / 'catalog.sqlite3') as catalog:
+        assert len(catalog) == 2
+        long_clips = catalog.search(min_duration=60)
+        assert [Path(r['path']).name for r in long_clips] == ['b.mp4']
+        assert [Path(r['path']).name for r in catalog.search(has_audio=True)] == ['a.mp4']
@@ -0,0 +1,121 @@
+"""Unit tests for the persistent export queue."""
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src.video_cli.export_queue import (
+    CANCELLED, DONE, FAILED, QUEUED, ExportQueue, build_audio_export_cmd, build_video_export_cmd,
+)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+class BlockingRunner:
+    """Records run order; each job runs until released or cancelled."""
+
+    def __init__(self):
+        self.order = []
+        self.release = threading.Event()
+
+    def __call__(self, job, ctx):
+        self.order.append(job.output)
+        while not self.release.wait(0.01):
+            ctx.check_cancelled()
+        if job.spec.get('fail'):
+            raise RuntimeError('boom')
+
+
+def test_jobs_run_by_priority_then_submission(tmp_path: Path):
+    runner = BlockingRunner()
+    q = ExportQueue(tmp_path / 'queue.json', max_concurrent=1, runner=runner)
+    q.add('video', 'first', {})
+    wait_for(lambda: runner.order == ['first'])
+    q.add('video', 'low', {}, priority=0)
+    q.add('audio', 'high', {}, priority=5)
+    q.add('video', 'low2', {}, priority=0)
+    runner.release.set()
+    wait_for(lambda: all(j.status == DONE for j in q.jobs()))
+    assert runner.order == ['first', 'high', 'low', 'low2']
+
+
+def test_concurrency_limit(tmp_path: Path):
+    runner = BlockingRunner()
+    q = ExportQueue(tmp_path / 'queue.json', max_concurrent=2, runner=runner)
+    for name in 'abc':
+        q.add('video', name, {})
+    wait_for(lambda: len(runner.order) == 2)
+    time.sleep(0.05)
+    assert len(runner.order) == 2
+    q.set_max_concurrent(3)
+    wait_for(lambda: len(runner.order) == 3)
+    runner.release.set()
+
+
+def test_cancel_failure_and_retry(tmp_path: Path):
+    runner = BlockingRunner()
+    q = ExportQueue(tmp_path / 'queue.json', max_concurrent=1, runner=runner)
+    running = q.add('video', 'running', {})
+    waiting = q.add('video', 'waiting', {'fail': True})
+    wait_for(lambda: runner.order == ['running'])
+    q.cancel(running.id)
+    wait_for(lambda: running.status == CANCELLED)
+    runner.release.set()
+    wait_for(lambda: waiting.status == FAILED)
+    assert waiting.message == 'boom'
+    waiting.spec['fail'] = False
+    q.retry(waiting.id)
+    wait_for(lambda: waiting.status == DONE)
+
+
+def test_queue_survives_restart(tmp_path: Path):
+    path = tmp_path / 'queue.json'
+    runner = BlockingRunner()
+    q = ExportQueue(path, max_concurrent=1, runner=runner)
+    a = q.add('video', 'a', {'videos': ['x.mp4']}, priority=1)
+    b = q.add('audio', 'b', {'audio_tracks': ['y.mp3']})
+    wait_for(lambda: runner.order == ['a'])
+    q.shutdown()  # interrupts 'a'
+
+    reopened = ExportQueue(path, max_concurrent=1, runner=lambda job, ctx: None)
+    jobs = {j.id: j for j in reopened.jobs()}
+    assert jobs[a.id].status == QUEUED and jobs[b.id].status == QUEUED
+    assert jobs[a.id].spec == {'videos': ['x.mp4']}
+    reopened.start()
+    wait_for(lambda: all(j.status == DONE for j in reopened.jobs()))
+
+
+def test_export_commands():
+    cmd = build_audio_export_cmd(['a.mp3', 'b.mp3'], Path('out.mp3'))
+    assert 'amix=inputs=2:duration=first[a]' in cmd[cmd.index('-filter_complex') + 1]
+
+
+def test_video_export_copies_when_no_filters(tmp_path: Path):
+    cmd = build_video_export_cmd({}, [Path('a.mp4')], tmp_path, Path('out.mp4'))
+    assert cmd[-3:] == ['-c', 'copy', 'out.mp4']
+    cmd = build_video_export_cmd({'audio_tracks': ['m.mp3']}, [Path('a.mp4')], tmp_path, Path('out.mp4'))
+    assert '[0:a][1:a]amix=inputs=2:duration=first[a]' in cmd
+
+
+@pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')), reason='ffmpeg/ffprobe not available')
+def test_cancelling_during_a_trim_stops_it(tmp_path: Path):
+    # One keyframe, so the trim re-encodes nearly the whole clip and runs long enough to cancel
+    src = tmp_path / 'src.mp4'
+    subprocess.run(['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=640x360:rate=25:duration=120',
+                    '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '10000', str(src)], check=True)
+    out = tmp_path / 'out.mp4'
+    q = ExportQueue(tmp_path / 'queue.json', max_concurrent=1)
+    job = q.add('video', out, {'videos': [str(src)], 'trims': {str(src): [0.5, 119.5]}})
+    wait_for(lambda: job.progress is not None, timeout=60)
+    assert not out.exists()  # The progress is the trim's, not the final write's
+    q.cancel(job.id)
+    wait_for(lambda: job.status == CANCELLED, timeout=5)
+    assert not out.exists()
@@ -0,0 +1,150 @@
+"""Tests for farmed normalization over a shared spool directory."""
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src.video_cli.farm import Coordinator, LocalFarm, Worker
+from src.video_cli.pipeline import FFMPEG, probe_duration, run
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, reason="ffmpeg/ffprobe not installed"
+)
+
+
+def make_clips(base: Path, count: int):
+    clips = []
+    for i in range(count):
+        clip = base / f"clip{i}.mp4"
+        run([FFMPEG, "-y", "-f", "lavfi", "-i", "testsrc2=size=160x90:rate=25", "-f", "lavfi", "-i", "sine",
+             "-t", "1", "-c:v", "libx264", "-preset", "ultrafast", str(clip)])
+        clips.append(clip)
+    return clips
+
+
+def start_workers(spool: Path, count: int):
+    stop = threading.Event()
+    threads = [threading.Thread(target=Worker(spool, f"w{i}", heartbeat=0.2).run, args=(stop,), daemon=True)
+               for i in range(count)]
+    for t in threads:
+        t.start()
+    return stop
+
+
+def normalize_all(coordinator: Coordinator, clips, out_dir: Path):
+    results, errors = {}, []
+
+    def one(clip):
+        try:
+            results[clip] = coordinator.normalize(clip, out_dir / clip.name)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=one, args=(c,)) for c in clips]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(60)
+    return results, errors
+
+
+def test_workers_normalize_every_clip(tmp_path: Path):
+    clips = make_clips(tmp_path, 4)
+    spool = tmp_path / "spool"
+    coordinator = Coordinator(spool)
+    stop = start_workers(spool, 2)
+    try:
+        results, errors = normalize_all(coordinator, clips, tmp_path / "out")
+    finally:
+        stop.set()
+        coordinator.close()
+    assert errors == [] and len(results) == 4
+    assert all(0.9 <= probe_duration(p) <= 1.2 for p in results.values())
+    assert not any((spool / "outputs").iterdir()) and not any((spool / "running").iterdir())
+
+
+def test_failures_are_retried_then_reported(tmp_path: Path):
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(b"not a video")
+    spool = tmp_path / "spool"
+    coordinator = Coordinator(spool, max_attempts=2)
+    stop = start_workers(spool, 1)
+    try:
+        with pytest.raises(RuntimeError, match="failed 2 times"):
+            coordinator.normalize(broken, tmp_path / "out.mp4")
+    finally:
+        stop.set()
+        coordinator.close()
+
+
+def test_dead_worker_attempt_is_requeued(tmp_path: Path):
+    clip, = make_clips(tmp_path, 1)
+    spool = tmp_path / "spool"
+    coordinator = Coordinator(spool, stale_seconds=0.5)
+    # A worker that claims the task and dies without a heartbeat
+    claimed = threading.Event()
+
+    def die_after_claim():
+        while not claimed.is_set():
+            for task in (spool / "tasks").glob("*.json"):
+                task.rename(spool / "running" / task.name)
+                claimed.set()
+            time.sleep(0.05)
+
+    threading.Thread(target=die_after_claim, daemon=True).start()
+    threading.Thread(target=lambda: claimed.wait(5) and start_workers(spool, 1), daemon=True).start()
+    try:
+        out = coordinator.normalize(clip, tmp_path / "out.mp4")
+    finally:
+        coordinator.close()
+        (spool / "stop").touch()
+    assert claimed.is_set() and out.exists()
+
+
+def test_straggler_gets_a_speculative_copy(tmp_path: Path):
+    clips = make_clips(tmp_path, 3)
+    spool = tmp_path / "spool"
+    coordinator = Coordinator(spool, speculate_factor=1.0)
+    # A worker that claims the first task and heartbeats forever without finishing
+    stalled, stop_stall = [], threading.Event()
+
+    def stall():
+        while not stalled:
+            for task in sorted((spool / "tasks").glob("*.json")):
+                running = spool / "running" / task.name
+                task.rename(running)
+                stalled.append(running)
+                break
+            time.sleep(0.01)
+        beat = 0
+        while not stop_stall.wait(0.1):
+            beat += 1
+            running.write_text(f'{{"worker": "slow", "beat": {beat}}}')
+
+    threading.Thread(target=stall, daemon=True).start()
+    threading.Thread(target=lambda: time.sleep(0.5) or start_workers(spool, 1), daemon=True).start()
+    try:
+        results, errors = normalize_all(coordinator, clips, tmp_path / "out")
+    finally:
+        stop_stall.set()
+        coordinator.close()
+        (spool / "stop").touch()
+    assert errors == [] and len(results) == 3
+    # The stalled attempt was told to stop
+    assert (spool / "cancel" / stalled[0].stem).exists()
+
+
+def test_local_farm_processes(tmp_path: Path):
+    from src.video_cli.pipeline import run_pipeline
+
+    video_dir = tmp_path / "Video"
+    video_dir.mkdir()
+    make_clips(video_dir, 3)
+    with LocalFarm(2) as farm:
+        out = run_pipeline(video_dir, tmp_path / "Caption", tmp_path / "BGM", tmp_path / "Output", None, [".mp4"],
+                           None, 0.15, False, False, "en-US", 16000, False, farm=farm.coordinator)
+        assert len(farm.processes) == 2
+    assert 2.8 <= probe_duration(out) <= 3.5
+    assert all(proc.returncode == 0 for proc in farm.processes)
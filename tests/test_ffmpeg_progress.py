@@ -0,0 +1,71 @@
+"""Unit tests for FFmpeg progress parsing and managed processes."""
+import shutil
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.video_cli.ffmpeg_progress import FFmpegProcess, ProcessCancelled, parse_progress
+
+
+def test_parse_progress_percent_speed_and_eta():
+    p = parse_progress({'out_time_us': '5000000', 'speed': '2.5x', 'progress': 'continue'}, 20.0, 2.0)
+    assert p.out_time == 5.0 and p.fraction == 0.25 and p.speed == 2.5
+    assert p.eta == pytest.approx(6.0)
+    assert not p.done
+
+
+def test_parse_progress_without_speed_or_duration():
+    p = parse_progress({'out_time_us': '5000000', 'speed': 'N/A'}, 10.0, 4.0)
+    assert p.eta == pytest.approx(4.0)  # from elapsed wall time
+    p = parse_progress({'out_time_us': 'N/A', 'progress': 'end'}, None, 1.0)
+    assert p.out_time == 0.0 and p.fraction is None and p.done
+
+
+def lavfi_cmd(output: Path, duration: float, realtime: bool = False):
+    cmd = ['ffmpeg', '-y', '-v', 'error']
+    if realtime:
+        cmd.append('-re')
+    return cmd + ['-f', 'lavfi', '-i', f'testsrc2=size=160x90:rate=25:duration={duration}', str(output)]
+
+
+@pytest.mark.skipif(not shutil.which('ffmpeg'), reason='ffmpeg not available')
+def test_process_reports_progress_to_completion(tmp_path: Path):
+    reports = []
+    out = tmp_path / 'out.mp4'
+    FFmpegProcess(lavfi_cmd(out, 2), duration=2.0, outputs=[out], on_progress=reports.append).run()
+    assert out.exists()
+    assert reports[-1].done and reports[-1].fraction == 1.0
+
+
+@pytest.mark.skipif(not shutil.which('ffmpeg'), reason='ffmpeg not available')
+def test_cancel_kills_process_and_removes_output(tmp_path: Path):
+    out = tmp_path / 'out.mp4'
+    started = threading.Event()
+    process = FFmpegProcess(lavfi_cmd(out, 60, realtime=True), duration=60.0, outputs=[out],
+                            on_progress=lambda p: started.set())
+    threading.Thread(target=lambda: started.wait(10) and process.cancel(), daemon=True).start()
+    with pytest.raises(ProcessCancelled):
+        process.run()
+    assert not out.exists()
+
+
+@pytest.mark.skipif(not shutil.which('ffmpeg'), reason='ffmpeg not available')
+def test_failure_raises_with_ffmpeg_output(tmp_path: Path):
+    out = tmp_path / 'out.mp4'
+    with pytest.raises(RuntimeError, match='missing.mp4'):
+        FFmpegProcess(['ffmpeg', '-y', '-i', str(tmp_path / 'missing.mp4'), str(out)], outputs=[out]).run()
+
+
+@pytest.mark.skipif(not shutil.which('ffmpeg'), reason='ffmpeg not available')
+def test_media_on_stdout_keeps_progress_and_log(tmp_path: Path):
+    reports, log = [], []
+    sink = tmp_path / 'stream.mp4'
+    cmd = ['ffmpeg', '-y', '-f', 'lavfi', '-i', 'testsrc2=size=160x90:rate=25:duration=2',
+           '-movflags', '+frag_keyframe+empty_moov', '-f', 'mp4', 'pipe:1']
+    with open(sink, 'wb') as f:
+        FFmpegProcess(cmd, duration=2.0, on_progress=reports.append, on_output=log.append, stdout=f).run()
+    data = sink.read_bytes()
+    assert data[4:8] == b'ftyp' and b'moof' in data
+    assert reports[-1].done
+    assert not any(line.startswith('out_time') for line in log) and any('Output #0' in line for line in log)
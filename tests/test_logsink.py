@@ -0,0 +1,46 @@
+"""Unit tests for the batched GUI log sink."""
+import threading
+from pathlib import Path
+
+from src.video_cli.logsink import LOG_KEEP_FILES, LogSink, default_log_path
+
+
+def test_concurrent_writes_are_batched_and_bounded(tmp_path: Path):
+    sink = LogSink(tmp_path / 'run.log', scrollback=100)
+
+    def writer(n):
+        for i in range(1000):
+            sink.write(f'{n}:{i}')
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    batch = sink.drain()
+    assert len(batch) == 100  # only what the widget would keep
+    assert sink.drain() == []
+    sink.close()
+    lines = (tmp_path / 'run.log').read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 4000 and set(batch) <= set(lines)
+
+
+def test_write_after_close_still_reaches_ui():
+    sink = LogSink()
+    sink.close()
+    sink.write('late')
+    assert sink.drain() == ['late']
+
+
+def test_default_log_path_keeps_recent_sessions(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv('VIDEO_CLI_CACHE_DIR', str(tmp_path))
+    logs = tmp_path / 'logs'
+    logs.mkdir()
+    for i in range(LOG_KEEP_FILES + 5):
+        (logs / f'gui-20240101-{i:06d}.log').write_text('')
+    path = default_log_path('gui')
+    assert path.parent == logs and path.name.startswith('gui-')
+    remaining = sorted(logs.glob('gui-*.log'))
+    assert len(remaining) == LOG_KEEP_FILES - 1
+    assert remaining[0].name == f'gui-20240101-{6:06d}.log'
@@ -0,0 +1,98 @@
+"""Unit tests for the NumPy preview mixer."""
+import shutil
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.video_cli.mixer import AmixGainLaw, MixerStream, MixTrack, amix_filter, mix_blocks, track_envelope
+
+
+class ConstantStream:
+    """Stereo PCM of a constant value for ``samples`` samples."""
+
+    def __init__(self, value, samples):
+        self.data = np.full((samples, 2), value, dtype='<i2').tobytes()
+
+    def read(self, size):
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+    def close(self):
+        pass
+
+
+def test_gain_law_starts_at_one_over_n_and_ramps_after_dropout():
+    law = AmixGainLaw(2, sample_rate=100, dropout_transition=1.0)
+    assert np.allclose(law.scales(10), [0.5, 0.5])
+    law.end(1)
+    assert np.allclose(law.scales(50), [1 / 1.5, 0.0])
+    assert np.allclose(law.scales(100), [1.0, 0.0])
+
+
+def test_envelope_applies_gain_mute_and_fades():
+    track = MixTrack('a', gain=0.5, fade_in=1.0, fade_out=1.0, duration=4.0)
+    env = track_envelope(track, 0.0, 5, sample_rate=4)  # t = 0, .25, .5, .75, 1
+    assert np.allclose(env, [0, 0.125, 0.25, 0.375, 0.5])
+    assert np.allclose(track_envelope(track, 3.5, 1, sample_rate=4), [0.25])
+    track.mute = True
+    assert not track_envelope(track, 2.0, 3).any()
+
+
+def test_mix_blocks_clips_to_int16():
+    blocks = np.full((2, 3, 2), 30000, dtype=np.int16)
+    out = mix_blocks(blocks, np.ones((2, 3)), np.array([1.0, 1.0]))
+    assert out.dtype == np.int16 and (out == 32767).all()
+
+
+def test_stream_offsets_tracks_and_ends_with_first():
+    streams = {'a': (1000, 400), 'b': (2000, 1000)}
+    opened = {}
+
+    def open_stream(path, seconds):
+        opened[path.name] = seconds
+        return ConstantStream(*streams[path.name])
+
+    # 'b' starts 100 samples (0.1 s at 1 kHz) after the mix start
+    mixer = MixerStream([MixTrack('a'), MixTrack('b', offset=0.1)], 0.0, sample_rate=1000, open_stream=open_stream)
+    pcm = np.frombuffer(mixer.read(400 * 4), dtype='<i2').reshape(-1, 2)
+    assert opened == {'a': 0.0, 'b': 0.0}
+    assert (pcm[:100] == 500).all()  # b is silent but counts for normalization, like adelay
+    assert (pcm[100:] == 1500).all()
+    assert mixer.read(400) == b''
+
+
+def test_amix_filter_chains_settings():
+    graph = amix_filter(['[0:a]', '[1:a]'], [None, MixTrack('m', gain=0.5, offset=1.5, fade_in=2.0)])
+    assert graph == '[1:a]volume=0.5000,afade=t=in:st=0:d=2.000,adelay=1500:all=1[mix1];' \
+                    '[0:a][mix1]amix=inputs=2:duration=first[a]'
+
+
+@pytest.mark.skipif(not shutil.which('ffmpeg'), reason='ffmpeg not available')
+def test_preview_mix_matches_ffmpeg_amix(tmp_path: Path):
+    paths = []
+    for name, freq, duration in (('a', 220, 3), ('b', 330, 2)):
+        path = tmp_path / f'{name}.wav'
+        subprocess.run(['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', f'sine=frequency={freq}:duration={duration}',
+                        '-ac', '2', '-ar', '44100', str(path)], check=True)
+        paths.append(str(path))
+    tracks = [MixTrack(paths[0], gain=0.8, fade_in=0.5), MixTrack(paths[1], gain=1.5, offset=0.5)]
+
+    mixer = MixerStream(tracks, 0.0)
+    preview = b''
+    while True:
+        block = mixer.read(1024 * 4)
+        if not block:
+            break
+        preview += block
+    mixer.close()
+
+    cmd = ['ffmpeg', '-v', 'error', '-i', paths[0], '-i', paths[1],
+           '-filter_complex', amix_filter(['[0:a]', '[1:a]'], tracks), '-map', '[a]', '-f', 's16le', '-']
+    export = subprocess.run(cmd, capture_output=True, check=True).stdout
+    a = np.frombuffer(preview, dtype='<i2').astype(int)
+    b = np.frombuffer(export, dtype='<i2').astype(int)
+    assert len(a) == len(b)
+    # Identical gain law; only the block boundaries of the dropout ramp differ
+    assert np.abs(a - b).max() <= 0.02 * np.abs(b).max()
@@ -0,0 +1,35 @@
+"""Unit tests for cached subtitle sprites and alpha blending."""
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from src.video_cli.overlay import SpriteCache, SubtitleSprite, SubtitleStyle, blend_sprite
+
+
+def test_blend_matches_alpha_compositing_and_clips():
+    """Blending equals (dst*(255-a) + src*a)/255 and ignores off-frame pixels."""
+    frame = np.full((4, 4, 3), 100, dtype=np.uint8)
+    rgba = np.zeros((2, 2, 4), dtype=np.uint8)
+    rgba[..., :3] = 200
+    rgba[..., 3] = [[255, 128], [0, 255]]
+    sprite = SubtitleSprite.from_image(Image.fromarray(rgba, 'RGBA'))
+
+    blend_sprite(frame, sprite, 3, 3)
+    assert frame[3, 3].tolist() == [200, 200, 200]
+    assert (frame[:3] == 100).all()
+
+    blend_sprite(frame, sprite, 0, 0)
+    assert frame[0, 0].tolist() == [200, 200, 200]
+    assert frame[0, 1].tolist() == [150, 150, 150]
+    assert frame[1, 0].tolist() == [100, 100, 100]
+
+
+def test_sprite_cache_renders_once_per_text_and_style():
+    cache = SpriteCache(max_entries=2)
+    style = SubtitleStyle(font_size=20, color='#FFFF00')
+    first = cache.get('Hello', style)
+    assert cache.get('Hello', style) is first
+    assert cache.get('Hello', SubtitleStyle(font_size=20, color='#FFFFFF')) is not first
+    assert first.premult.shape[:2] == first.inv_alpha.shape[:2]
+    assert first.width > 0 and first.height > 0
@@ -1,10 +1,16 @@
 """Integration tests for the video processing pipeline."""
+import os
 import shutil
+import threading
 from pathlib import Path
 import subprocess
 import pytest
 
-from src.video_cli.pipeline import run_pipeline, probe_duration
+from src.video_cli.catalog import MediaCatalog
+from src.video_cli.ffmpeg_progress import CancelToken, ProcessCancelled
+from src.video_cli.pipeline import plan_pipeline, run_pipeline, probe_duration, probe_media
+from src.video_cli.previews import Previews
+from src.video_cli.renditions import parse_renditions
 
 FFMPEG = shutil.which("ffmpeg") or "ffmpeg"
 FFPROBE = shutil.which("ffprobe") or "ffprobe"
@@ -67,3 +73,237 @@ def test_pipeline_end_to_end(tmp_path: Path):
     assert result.exists()
     dur = probe_duration(result)
     assert 3.5 <= dur <= 5.0  # two 2s videos -> ~4s
+
+
+def pipeline_args(vdir, cdir, adir, outdir, out):
+    return dict(video_dir=vdir, caption_dir=cdir, bgm_dir=adir, output_dir=outdir, output_file=out, exts=[".mp4"],
+                bgm_file=None, bgm_volume=0.2, burn_in=False, generate_captions=False, language="en-US",
+                sample_rate=16000, keep_temp=False)
+
+
+def test_pipeline_reports_stages_and_progress(tmp_path: Path):
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path)
+    events = []
+    run_pipeline(**pipeline_args(vdir, cdir, adir, outdir, outdir / "merged.mp4"), on_event=events.append)
+
+    stages = [e.stage for e in events if e.kind == "stage"]
+    assert stages == ["normalize", "normalize", "concat", "subtitles", "bgm", "output"]
+    fractions = [e.fraction for e in events if e.kind != "output"]
+    assert fractions == sorted(fractions)
+    assert any(e.kind == "output" and "ffmpeg" in e.message.lower() for e in events)
+    assert any(e.kind == "progress" and 0 < e.fraction < 1 for e in events)
+    assert events[-1].kind == "done" and events[-1].fraction == 1.0
+
+
+def test_pipeline_cancel_stops_without_output(tmp_path: Path):
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path)
+    out = outdir / "merged.mp4"
+    token = CancelToken()
+
+    def on_event(event):
+        if event.stage == "concat":
+            token.cancel()
+
+    with pytest.raises(ProcessCancelled):
+        run_pipeline(**pipeline_args(vdir, cdir, adir, outdir, out), on_event=on_event, cancel=token)
+    assert not out.exists()
+
+
+def top_level_boxes(path: Path):
+    data, boxes, pos = path.read_bytes(), [], 0
+    while pos + 8 <= len(data):
+        size = int.from_bytes(data[pos:pos + 4], "big")
+        boxes.append(data[pos + 4:pos + 8].decode("latin-1"))
+        if size < 8:
+            break
+        pos += size
+    return boxes
+
+
+@pytest.mark.parametrize("mode", ["faststart", "fragmented"])
+def test_output_modes(tmp_path: Path, mode):
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path)
+    out = outdir / "merged.mp4"
+    run_pipeline(**pipeline_args(vdir, cdir, adir, outdir, out), output_mode=mode)
+    boxes = top_level_boxes(out)
+    assert boxes.index("moov") < boxes.index("mdat")
+    assert ("moof" in boxes) == (mode == "fragmented")
+    assert 3.5 <= probe_duration(out) <= 5.0
+
+
+def test_clips_in_the_common_format_are_copied(tmp_path: Path):
+    def normalize(vdir, cdir, adir, outdir):
+        events = []
+        out = outdir / "merged.mp4"
+        run_pipeline(**pipeline_args(vdir, cdir, adir, outdir, out), on_event=events.append)
+        video = next(s for s in probe_media(out)["streams"] if s["codec_type"] == "video")
+        assert (video["width"], video["height"]) == (320, 240)
+        return sorted(e.message for e in events if e.kind == "stage" and e.stage == "normalize"), out
+
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path / "same")
+    labels, out = normalize(vdir, cdir, adir, outdir)
+    assert labels == ["Copying A.mp4 (1/2)", "Copying B.mp4 (2/2)"]
+    video = next(s for s in probe_media(out)["streams"] if s["codec_type"] == "video")
+    assert video["avg_frame_rate"] == "30/1"
+    assert 3.5 <= probe_duration(out) <= 4.5
+
+    # A 25fps clip in a batch of 30fps ones is converted, and the rest with it
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path / "rate")
+    ff([FFMPEG, "-y", "-f", "lavfi", "-i", "testsrc2=size=640x360:rate=25", "-f", "lavfi", "-i", "sine=f=330",
+        "-c:v", "libx264", "-t", "1", str(vdir / "C.mp4")])
+    labels, out = normalize(vdir, cdir, adir, outdir)
+    assert labels == ["Normalizing A.mp4 (1/3)", "Normalizing B.mp4 (2/3)", "Normalizing C.mp4 (3/3)"]
+    assert 4.5 <= probe_duration(out) <= 5.5
+
+    # So is a clip in the common format but another H.264 profile
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path / "profile")
+    ff([FFMPEG, "-y", "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=30", "-f", "lavfi", "-i", "sine=f=330",
+        "-c:v", "libx264", "-profile:v", "baseline", "-t", "1", str(vdir / "C.mp4")])
+    labels, out = normalize(vdir, cdir, adir, outdir)
+    assert labels == ["Normalizing A.mp4 (1/3)", "Normalizing B.mp4 (2/3)", "Normalizing C.mp4 (3/3)"]
+    assert 4.5 <= probe_duration(out) <= 5.5
+
+
+def test_probes_without_extradata_stay_cached(tmp_path: Path):
+    clip = tmp_path / "clip.mp4"
+    ff([FFMPEG, "-y", "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=30", "-c:v", "libx264", "-t", "1", str(clip)])
+    with MediaCatalog(tmp_path / "catalog.sqlite3") as catalog:
+        fp = catalog.fingerprint(clip)
+        # A probe cached before the hash was recorded is probed again
+        catalog.update(fp, probe={"streams": [{"codec_type": "video", "codec_name": "h264"}]})
+        video = next(s for s in probe_media(clip, catalog)["streams"] if s["codec_type"] == "video")
+        assert video["extradata_hash"]
+        # A stream without extradata (like Annex B H.264) is recorded as such and served from the catalog
+        mjpeg = tmp_path / "clip.avi"
+        ff([FFMPEG, "-y", "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=30", "-c:v", "mjpeg", "-t", "1",
+            str(mjpeg)])
+        probe_media(mjpeg, catalog)
+        cached = catalog.get(mjpeg, "probe")
+        assert [s["extradata_hash"] for s in cached["streams"] if s["codec_type"] == "video"] == [None]
+        cached["format"]["served"] = "catalog"
+        catalog.update(mjpeg, probe=cached)
+        assert probe_media(mjpeg, catalog)["format"]["served"] == "catalog"
+
+
+def test_only_the_last_encode_is_lossy(tmp_path: Path):
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path)
+    ff([FFMPEG, "-y", "-f", "lavfi", "-i", "testsrc2=size=640x360:rate=25", "-c:v", "libx264", "-t", "1",
+        str(vdir / "C.mp4")])
+    args = pipeline_args(vdir, cdir, adir, outdir, outdir / "merged.mp4")
+
+    def encoder(**options):
+        options = {**args, **options}
+        del options["keep_temp"]
+        plan = plan_pipeline(**options)
+        return next(p.stage.params["encoder"] for p in plan if p.stage.name == "normalize[2]")
+
+    # Burning in subtitles re-encodes the joined clips, so normalizing before it is lossless
+    assert encoder(burn_in=True) == "lossless"
+    assert encoder(burn_in=True, intermediates="quality") == "delivery"
+    assert encoder() == "delivery"
+    # Renditions are encoded from the joined video, which is still delivered as the main output
+    assert encoder(renditions=parse_renditions("240p")) == "delivery"
+    assert encoder(burn_in=True, renditions=parse_renditions("240p")) == "lossless"
+
+    out = run_pipeline(**{**args, "burn_in": True})
+    video = next(s for s in probe_media(out)["streams"] if s["codec_type"] == "video")
+    assert video["profile"] == "High" and (video["width"], video["height"]) == (320, 240)
+    assert 4.5 <= probe_duration(out) <= 5.5
+
+
+def test_previews_written_with_output(tmp_path: Path):
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path)
+    out = outdir / "talk.mp4"
+    run_pipeline(**pipeline_args(vdir, cdir, adir, outdir, out), previews=Previews(interval=1, columns=2, rows=2))
+    preview_dir = outdir / "talk_preview"
+    assert sorted(p.name for p in preview_dir.iterdir()) == ["poster.jpg", "sprite_001.jpg", "thumbnails.vtt"]
+    assert (preview_dir / "thumbnails.vtt").read_text().count("sprite_001.jpg#xywh=") == 4
+    assert 3.5 <= probe_duration(out) <= 5.0
+
+
+def test_previews_ride_on_the_burn_in(tmp_path: Path):
+    from src.video_cli.stages import StageCache
+
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path)
+    out = outdir / "talk.mp4"
+    args = {**pipeline_args(vdir, cdir, adir, outdir, out), "burn_in": True,
+            "previews": Previews(interval=1, columns=2, rows=2)}
+    options = {k: v for k, v in args.items() if k != "keep_temp"}
+    stages = {p.stage.name: p.stage for p in plan_pipeline(**options)}
+    # The burn-in already decodes the video, so the output stays a plain copy
+    assert "preview_frames" in stages["subtitles"].outputs and "previews" not in stages["output"].params
+
+    cache = StageCache(tmp_path / "stages")
+    for _ in range(2):  # The second run publishes the previews from the cached burn-in
+        shutil.rmtree(outdir / "talk_preview", ignore_errors=True)
+        run_pipeline(**args, stage_cache=cache)
+        preview_dir = outdir / "talk_preview"
+        assert sorted(p.name for p in preview_dir.iterdir()) == ["poster.jpg", "sprite_001.jpg", "thumbnails.vtt"]
+        assert (preview_dir / "thumbnails.vtt").read_text().count("sprite_001.jpg#xywh=") == 4
+    assert [p.stage.name for p in plan_pipeline(cache, **options) if not p.cached] == ["output"]
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="named pipes need POSIX")
+@pytest.mark.parametrize("with_bgm", [True, False])
+def test_output_to_named_pipe(tmp_path: Path, with_bgm):
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path)
+    if not with_bgm:
+        (adir / "bgm.wav").unlink()
+    fifo = tmp_path / "out.pipe"
+    os.mkfifo(fifo)
+    received = tmp_path / "received.mp4"
+    reader = threading.Thread(target=lambda: received.write_bytes(fifo.read_bytes()))
+    reader.start()
+    events = []
+    run_pipeline(**{**pipeline_args(vdir, cdir, adir, outdir, fifo), "burn_in": True}, on_event=events.append)
+    reader.join(30)
+    # The last encode writes to the pipe itself rather than leaving a copy stage to do it
+    stages = [e.stage for e in events if e.kind == "stage"]
+    assert stages[-1] == ("bgm" if with_bgm else "subtitles") and "output" not in stages
+    assert fifo.exists() and "moof" in top_level_boxes(received)
+    assert 3.5 <= probe_duration(received) <= 5.0
+
+
+def test_silent_clips_with_bgm_stream_to_stdout(tmp_path: Path):
+    import sys
+
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path)
+    for name in ("A.mp4", "B.mp4"):
+        ff([FFMPEG, "-y", "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=30", "-c:v", "libx264", "-t", "2",
+            str(vdir / name)])
+    received = tmp_path / "received.mp4"
+    with open(received, "wb") as out:
+        proc = subprocess.run([sys.executable, "-m", "src.video_cli.cli", "--video-dir", str(vdir),
+                               "--caption-dir", str(cdir), "--bgm-dir", str(adir), "--output-dir", str(outdir),
+                               "--output", "-", "--no-catalog"],
+                              cwd=Path(__file__).resolve().parents[1], stdout=out, stderr=subprocess.PIPE,
+                              env={**os.environ, "VIDEO_CLI_CACHE_DIR": str(tmp_path / "cache")}, timeout=120)
+    assert proc.returncode == 0, proc.stderr.decode(errors="replace")
+    # The BGM mix writes the stream itself; its MP4 must reach stdout rather than the progress reader
+    assert "moof" in top_level_boxes(received)
+    assert any(s["codec_type"] == "audio" for s in probe_media(received)["streams"])
+    assert 3.5 <= probe_duration(received) <= 4.5
+
+
+def test_rerun_reuses_cached_stages(tmp_path: Path):
+    from src.video_cli.pipeline import plan_pipeline
+    from src.video_cli.stages import StageCache
+
+    vdir, cdir, adir, outdir = make_sample_inputs(tmp_path)
+    cache = StageCache(tmp_path / "stages")
+    args = pipeline_args(vdir, cdir, adir, outdir, outdir / "merged.mp4")
+    run_pipeline(**args, stage_cache=cache)
+
+    options = {k: v for k, v in args.items() if k != "keep_temp"}
+    plan = plan_pipeline(cache, **options)
+    assert [p.stage.name for p in plan if not p.cached] == ["output"]
+
+    events = []
+    (outdir / "merged.mp4").unlink()
+    run_pipeline(**args, stage_cache=cache, on_event=events.append)
+    cached = [e.message for e in events if e.kind == "stage" and e.message.endswith("(cached)")]
+    assert len(cached) == 5 and 3.5 <= probe_duration(outdir / "merged.mp4") <= 5.0
+
+    (cdir / "B.srt").write_text("1\n00:00:00,000 --> 00:00:01,000\nChanged\n\n")
+    assert [p.stage.name for p in plan_pipeline(cache, **options) if not p.cached] == [
+        "captions", "subtitles", "bgm", "output"]
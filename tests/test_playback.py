@@ -0,0 +1,158 @@
+"""Unit tests for the background preview decoder."""
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from src.video_cli.playback import (
+    CAP_PROP_POS_FRAMES, FFmpegFrameReader, FrameCache, FrameRingBuffer, KeyframeSeeker,
+    PlaybackClock, SequentialDecoder, fit_size,
+)
+
+
+class FakeCapture:
+    """Minimal stand-in for cv2.VideoCapture yielding frame numbers."""
+
+    def __init__(self, total):
+        self.total = total
+        self.pos = 0
+        self.seeks = []
+
+    def set(self, prop, value):
+        self.pos = int(value)
+        self.seeks.append(self.pos)
+        return True
+
+    def read(self):
+        if self.pos >= self.total:
+            return False, None
+        frame = self.pos
+        self.pos += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_ring_buffer_drops_late_frames():
+    """take() returns the newest due frame and counts the skipped ones."""
+    buf = FrameRingBuffer(capacity=8)
+    gen = buf.generation
+    for i in range(5):
+        assert buf.put((i, f"f{i}"), gen)
+    assert buf.take(3) == (3, "f3")
+    assert buf.dropped == 3
+    assert buf.take(3) is None
+    assert buf.take(10) == (4, "f4")
+
+
+def test_decoder_reads_sequentially_and_resets_on_seek():
+    """Frames arrive in order without per-frame seeks; seek() restarts the buffer."""
+    cap = FakeCapture(100)
+    decoder = SequentialDecoder(lambda: cap, start_frame=10, transform=lambda f: f * 2, capacity=4).start()
+    try:
+        wait_for(lambda: len(decoder.buffer) == 4)
+        assert decoder.buffer.take(11) == (11, 22)
+        assert cap.seeks == [10]
+
+        decoder.seek(50)
+        wait_for(lambda: len(decoder.buffer) == 4)
+        assert decoder.buffer.take(50) == (50, 100)
+        assert cap.seeks == [10, 50]
+    finally:
+        decoder.stop()
+
+
+def test_seek_racing_end_of_stream_is_not_finished():
+    """A seek landing between the failed read and the end-of-stream check resumes decoding."""
+    cap = FakeCapture(100)
+    cap.pos = 100
+    read = cap.read
+
+    def read_then_seek():
+        ok, frame = read()
+        if not ok and not cap.seeks[1:]:
+            decoder.seek(10)
+        return ok, frame
+
+    cap.read = read_then_seek
+    decoder = SequentialDecoder(lambda: cap, start_frame=100, capacity=4)
+    decoder.start()
+    try:
+        wait_for(lambda: len(decoder.buffer) == 4)
+        assert not decoder.finished
+        assert decoder.buffer.take(10) == (10, 10)
+    finally:
+        decoder.stop()
+
+
+def test_clock_reports_due_frame():
+    clock = PlaybackClock(fps=25)
+    clock.start(100)
+    assert clock.frame() in (100, 101)
+    assert 0 < clock.seconds_until(102) <= 0.08
+
+
+def test_seeker_decodes_forward_within_gop():
+    """Targets later in the current GOP are reached without another seek."""
+    cap = FakeCapture(100)
+    seeker = KeyframeSeeker(cap, keyframes=[0, 30, 60])
+    passed = []
+    assert seeker.read(40, on_frame=lambda i, f: passed.append(i)) == (True, 40)
+    assert cap.seeks == [30]
+    assert passed == list(range(30, 40))
+
+    assert seeker.read(45) == (True, 45)
+    assert cap.seeks == [30]
+    assert seeker.read(10) == (True, 10)
+    assert cap.seeks == [30, 0]
+
+
+def test_frame_cache_evicts_least_recently_used():
+    class Blob:
+        nbytes = 10
+
+    cache = FrameCache(max_bytes=30)
+    for i in range(3):
+        cache.put(i, Blob())
+    cache.get(0)
+    cache.put(3, Blob())
+    assert 1 not in cache
+    assert 0 in cache and 3 in cache
+    assert cache.nbytes == 30
+
+
+def test_fit_size_keeps_aspect_ratio():
+    assert fit_size(3840, 2160, 640, 480) == (640, 360)
+    assert fit_size(1080, 1920, 640, 360) == (202, 360)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ffmpeg_reader_decodes_at_preview_size(tmp_path):
+    """Frames come out scaled to the requested size, reusing pooled buffers."""
+    pytest.importorskip("numpy")
+    src = tmp_path / "src.mp4"
+    subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=25",
+                    "-t", "2", "-c:v", "libx264", str(src)], check=True)
+    reader = FFmpegFrameReader(str(src), (320, 180), 25, buffers=2)
+    try:
+        ok, first = reader.read()
+        assert ok and first.shape == (180, 320, 3)
+        ok, second = reader.read()
+        ok, third = reader.read()
+        assert third is first
+        assert reader.set(CAP_PROP_POS_FRAMES, 45)
+        frames = 0
+        while reader.read()[0]:
+            frames += 1
+        assert frames == 5
+    finally:
+        reader.release()
@@ -0,0 +1,51 @@
+"""Tests for poster and seek-preview sprite generation."""
+import shutil
+from pathlib import Path
+
+import pytest
+
+from src.video_cli.pipeline import FFMPEG, run
+from src.video_cli.previews import Previews, build_preview_args, parse_grid, write_vtt
+from src.video_cli.renditions import build_renditions_cmd, parse_renditions
+
+needs_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, reason="ffmpeg/ffprobe not installed"
+)
+
+
+def test_parse_grid():
+    assert parse_grid("5x4") == (5, 4)
+    for bad in ("5", "0x3", "5x", "axb"):
+        with pytest.raises(ValueError):
+            parse_grid(bad)
+    with pytest.raises(ValueError):
+        Previews(interval=0)
+
+
+def test_previews_branch_off_the_same_input(tmp_path: Path):
+    args = build_preview_args(Previews(interval=2, columns=3, rows=2, width=96), 20.0, tmp_path)
+    graph = args[args.index("-filter_complex") + 1]
+    assert graph.startswith("[0:v]split=2") and "gte(t\\,2.000)" in graph
+    assert graph.endswith("fps=1/2,scale=96:-2,tile=3x2[sprites]")
+    assert "-i" not in args
+
+
+@needs_ffmpeg
+def test_previews_with_renditions_in_one_process(tmp_path: Path):
+    src = tmp_path / "src.mp4"
+    run([FFMPEG, "-y", "-f", "lavfi", "-i", "testsrc2=size=320x180:rate=25", "-t", "7",
+         "-c:v", "libx264", "-preset", "ultrafast", str(src)])
+    previews = Previews(interval=2, columns=3, rows=1, width=64)
+    cmd, _ = build_renditions_cmd(src, parse_renditions("90p"), tmp_path, "out", has_audio=False)
+    preview_dir = tmp_path / "preview"
+    preview_dir.mkdir()
+    run(cmd + build_preview_args(previews, 7.0, preview_dir))
+    assert cmd.count("-i") == 1
+
+    vtt = write_vtt(previews, 7.0, preview_dir).read_text()
+    assert sorted(p.name for p in preview_dir.iterdir()) == ["poster.jpg", "sprite_001.jpg", "sprite_002.jpg",
+                                                             "thumbnails.vtt"]
+    assert vtt.startswith("WEBVTT\n")
+    assert "00:00:00.000 --> 00:00:02.000\nsprite_001.jpg#xywh=0,0,64,36\n" in vtt
+    assert "00:00:06.000 --> 00:00:07.000\nsprite_002.jpg#xywh=0,0,64,36\n" in vtt
+    assert "sprite_001.jpg#xywh=128,0,64,36" in vtt
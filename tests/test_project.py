@@ -0,0 +1,84 @@
+"""Unit tests for editor project files."""
+from pathlib import Path
+
+import pytest
+
+from src.video_cli import catalog as catalog_module
+from src.video_cli import pipeline
+from src.video_cli.catalog import MediaCatalog
+from src.video_cli.project import Project, collect_media, restore_media, stored_durations
+
+
+def make_project(tmp_path: Path, count: int = 100):
+    clips = []
+    for i in range(count):
+        clip = tmp_path / f'clip{i:03d}.mp4'
+        clip.write_bytes(bytes([i]) * 2048)
+        clips.append(clip)
+    probe = {'format': {'duration': '4.0'}, 'streams': [{'codec_type': 'video'}, {'codec_type': 'audio'}]}
+    with MediaCatalog(tmp_path / 'old.sqlite3') as catalog:
+        for clip in clips:
+            catalog.update(clip, probe=probe, duration=4.0, has_audio=1, keyframes=[0.0, 2.0])
+        project = Project(
+            timeline=[str(c) for c in clips],
+            current=3,
+            trims={str(clips[0]): (0.5, 3.0)},
+            audio_tracks=[{'path': str(clips[1]), 'type': 'bgm', 'gain': 0.5, 'fade_in': 1.0}],
+            subtitles={'text': 'Hello', 'font_size': 30},
+            settings={'bgm_volume': 0.2},
+        )
+        project.media = collect_media(project.sources(), catalog)
+    return project, clips
+
+
+def test_round_trip(tmp_path: Path):
+    project, clips = make_project(tmp_path, 3)
+    path = tmp_path / 'edit.vcproj'
+    project.save(path)
+    loaded = Project.load(path)
+    assert loaded.timeline == project.timeline and loaded.current == 3
+    assert loaded.trims == {str(clips[0]): (0.5, 3.0)}
+    assert loaded.audio_tracks[0]['gain'] == 0.5 and loaded.subtitles['font_size'] == 30
+    ref = loaded.media[str(clips[0])]
+    assert ref.analysis['keyframes'] == [0.0, 2.0] and ref.key == project.media[str(clips[0])].key
+
+
+def test_reopen_with_empty_catalog_needs_no_probing_or_hashing(tmp_path: Path, monkeypatch):
+    project, clips = make_project(tmp_path)
+    project.save(tmp_path / 'edit.vcproj')
+    loaded = Project.load(tmp_path / 'edit.vcproj')
+
+    def forbidden(*args, **kwargs):
+        raise AssertionError('source was re-read')
+
+    monkeypatch.setattr(pipeline.subprocess, 'run', forbidden)
+    monkeypatch.setattr(catalog_module, 'partial_hash', forbidden)
+    with MediaCatalog(tmp_path / 'new.sqlite3') as catalog:
+        assert restore_media(loaded, catalog) == []
+        for clip in clips:
+            assert pipeline.probe_duration(clip, catalog) == 4.0
+            assert pipeline.probe_keyframes(clip, catalog) == [0.0, 2.0]
+    assert len(stored_durations(loaded)) == 100
+
+
+def test_changed_sources_are_stale(tmp_path: Path):
+    project, clips = make_project(tmp_path, 3)
+    clips[1].write_bytes(b'edited')
+    clips[2].unlink()
+    with MediaCatalog(tmp_path / 'new.sqlite3') as catalog:
+        assert restore_media(project, catalog) == [str(clips[1]), str(clips[2])]
+        assert catalog.get(clips[1], 'duration') is None
+    assert list(stored_durations(project)) == [str(clips[0])]
+
+
+def test_rejects_other_files(tmp_path: Path):
+    path = tmp_path / 'other.vcproj'
+    path.write_text('{"format": "something-else"}')
+    with pytest.raises(ValueError):
+        Project.load(path)
+    path.write_text('{"format": "video-cli-project", "version": 99}')
+    with pytest.raises(ValueError, match='newer'):
+        Project.load(path)
+    path.write_text('{not json')
+    with pytest.raises(ValueError, match='Corrupt'):
+        Project.load(path)
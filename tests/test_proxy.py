@@ -0,0 +1,63 @@
+"""Unit tests for proxy selection and the shared proxy cache."""
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from src.video_cli.proxy import ProxyCache, ProxyManager, needs_proxy
+
+
+def video_probe(height, codec='h264'):
+    return {'streams': [{'codec_type': 'audio'}, {'codec_type': 'video', 'height': height, 'codec_name': codec}]}
+
+
+def test_needs_proxy_for_large_or_heavy_sources():
+    assert needs_proxy(video_probe(2160))
+    assert needs_proxy(video_probe(720, 'hevc'))
+    assert not needs_proxy(video_probe(720))
+    assert not needs_proxy({'streams': [{'codec_type': 'audio'}]})
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path):
+    cache = ProxyCache(tmp_path, max_bytes=250)
+    for i, key in enumerate(['a', 'b', 'c']):
+        path = cache.path_for(key)
+        path.write_bytes(b'x' * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+    assert cache.get('a') is not None  # touch: 'b' is now the oldest
+    removed = cache.evict()
+    assert removed == [cache.path_for('b')]
+    assert cache.get('b') is None
+    assert cache.total_bytes() == 200
+
+
+def test_cache_never_evicts_kept_proxies(tmp_path: Path):
+    cache = ProxyCache(tmp_path, max_bytes=0)
+    path = cache.path_for('a')
+    path.write_bytes(b'x')
+    assert cache.evict(keep=[path]) == []
+
+
+@pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')), reason='ffmpeg/ffprobe not available')
+def test_manager_builds_proxy_with_same_frame_count(tmp_path: Path):
+    src = tmp_path / 'big.mp4'
+    subprocess.run(['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=1280x1080:rate=25:duration=1',
+                    '-c:v', 'libx264', str(src)], check=True)
+    manager = ProxyManager(ProxyCache(tmp_path / 'cache'), max_workers=1)
+    manager.submit([src, src])
+    manager._pool.shutdown(wait=True)
+    events = manager.drain()
+    assert [e[0] for e in events] == ['proxy']
+    proxy = manager.proxy_for(src)
+    assert proxy == events[0][2]
+
+    def frames_and_height(path):
+        out = subprocess.run(['ffprobe', '-v', 'error', '-count_frames', '-select_streams', 'v',
+                              '-show_entries', 'stream=nb_read_frames,height', '-of', 'csv=p=0', str(path)],
+                             capture_output=True, text=True, check=True).stdout.strip()
+        height, frames = out.split(',')
+        return int(frames), int(height)
+
+    assert frames_and_height(proxy) == (frames_and_height(src)[0], 540)
@@ -0,0 +1,82 @@
+"""Tests for single-decode rendition ladders."""
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from src.video_cli.pipeline import FFMPEG, FFPROBE, run
+from src.video_cli.renditions import Rendition, build_renditions_cmd, parse_renditions
+
+needs_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, reason="ffmpeg/ffprobe not installed"
+)
+
+
+def test_parse_renditions():
+    ladder = parse_renditions("1080p, 720p,480p/1200k,9:16@1280p")
+    assert [r.name for r in ladder] == ["1080p", "720p", "480p", "9x16_1280p"]
+    assert ladder[2].max_kbps == 1200 and ladder[0].max_kbps == 6000
+    assert ladder[3] == Rendition(1280, (9, 16))
+    for bad in ("", "720", "720p,720p", "0:16@720p", "hd"):
+        with pytest.raises(ValueError):
+            parse_renditions(bad)
+
+
+def test_one_process_splits_the_decode(tmp_path: Path):
+    ladder = parse_renditions("720p,9:16@640p")
+    cmd, outputs = build_renditions_cmd(tmp_path / "in.mp4", ladder, tmp_path, "out")
+    assert cmd.count("-i") == 1
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert graph.startswith("[0:v]split=2[s0][s1];")
+    assert "[s1]crop=" in graph and graph.endswith("scale=-2:640[v1]")
+    assert outputs == [tmp_path / "out_720p.mp4", tmp_path / "out_9x16_640p.mp4"]
+    assert all(str(p) in cmd for p in outputs)
+
+
+def frame_size(path: Path):
+    out = subprocess.run([FFPROBE, "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height",
+                          "-of", "csv=p=0", str(path)], stdout=subprocess.PIPE, text=True, check=True).stdout
+    return tuple(int(x) for x in out.strip().split(","))
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Path:
+    src = tmp_path / "src.mp4"
+    run([FFMPEG, "-y", "-f", "lavfi", "-i", "testsrc2=size=640x360:rate=30", "-f", "lavfi", "-i", "sine=f=440",
+         "-t", "3", "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", str(src)])
+    return src
+
+
+@needs_ffmpeg
+def test_mp4_renditions(tmp_path: Path, source: Path):
+    cmd, outputs = build_renditions_cmd(source, parse_renditions("360p,240p,9:16@320p"), tmp_path, "out")
+    run(cmd)
+    assert [frame_size(p) for p in outputs] == [(640, 360), (426, 240), (180, 320)]
+
+
+@needs_ffmpeg
+def test_hls_ladder(tmp_path: Path, source: Path):
+    cmd, outputs = build_renditions_cmd(source, parse_renditions("360p,240p"), tmp_path, "out",
+                                        hls=True, segment_seconds=1)
+    run(cmd)
+    master = (outputs[0] / "master.m3u8").read_text()
+    assert master.count("#EXT-X-STREAM-INF") == 2 and "240p/index.m3u8" in master
+    playlist = (outputs[0] / "240p" / "index.m3u8").read_text()
+    assert "#EXT-X-MAP:URI=\"init_1.mp4\"" in playlist and playlist.count(".m4s") == 3
+
+
+@needs_ffmpeg
+def test_pipeline_writes_renditions_next_to_output(tmp_path: Path, source: Path):
+    from src.video_cli.pipeline import run_pipeline
+
+    video_dir = tmp_path / "Video"
+    video_dir.mkdir()
+    shutil.move(str(source), str(video_dir / "a.mp4"))
+    events = []
+    out = run_pipeline(video_dir, tmp_path / "Caption", tmp_path / "BGM", tmp_path / "Output", None, [".mp4"],
+                       None, 0.15, False, False, "en-US", 16000, False, on_event=events.append,
+                       renditions=parse_renditions("240p"), hls=True)
+    assert [e.stage for e in events if e.kind == "stage"][-1] == "renditions"
+    assert (out.parent / "merged_hls" / "master.m3u8").exists()
+    assert sorted(p.name for p in out.parent.iterdir()) == ["merged.mp4", "merged_hls"]
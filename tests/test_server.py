@@ -0,0 +1,93 @@
+"""Tests for the local HTTP job service."""
+import json
+import shutil
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from src.video_cli.pipeline import FFMPEG, probe_duration, run
+from src.video_cli.server import JobService, job_args, make_server, parse_job_args
+from src.video_cli.stages import StageCache
+
+
+def test_job_args_from_options():
+    argv = job_args({"options": {"video_dir": "V", "burn-in": True, "keep_temp": False, "exts": [".mp4", ".mov"]}})
+    assert argv == ["--video-dir", "V", "--burn-in", "--exts", ".mp4", ".mov"]
+    assert job_args({"args": ["--hls"]}) == ["--hls"]
+    with pytest.raises(ValueError):
+        job_args({"args": "--hls"})
+
+
+def test_job_args_are_validated_like_the_cli():
+    assert parse_job_args(["--bgm-volume", "0.3"]).bgm_volume == 0.3
+    for bad in (["--no-such-option"], ["--bgm-volume", "loud"], ["--hls"], ["--plan"], ["--output", "-"], ["-h"]):
+        with pytest.raises(ValueError):
+            parse_job_args(bad)
+
+
+@pytest.fixture
+def service(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("VIDEO_CLI_CACHE_DIR", str(tmp_path / "cache"))
+    service = JobService(tmp_path / "queue.json", workers=1, stage_cache=StageCache(tmp_path / "stages"))
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield service, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def request(url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, method="POST" if data else "GET")) as r:
+            return r.status, json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_rejects_bad_jobs(service):
+    _, url = service
+    status, body = request(f"{url}/jobs", {"args": ["--bgm-volume", "loud"]})
+    assert status == 400 and "loud" in body["error"]
+    assert request(f"{url}/jobs/nope")[0] == 404
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, reason="ffmpeg not installed")
+def test_submit_stream_and_cancel(service, tmp_path: Path):
+    svc, url = service
+    video_dir = tmp_path / "Video"
+    video_dir.mkdir()
+    run([FFMPEG, "-y", "-f", "lavfi", "-i", "testsrc2=size=160x90:rate=25", "-f", "lavfi", "-i", "sine",
+         "-t", "1", "-c:v", "libx264", "-preset", "ultrafast", str(video_dir / "a.mp4")])
+    options = {"video-dir": str(video_dir), "caption-dir": str(tmp_path / "Caption"), "bgm-dir": str(tmp_path / "BGM"),
+               "output-dir": str(tmp_path / "Output"), "no-catalog": True}
+
+    status, first = request(f"{url}/jobs", {"options": options})
+    assert status == 201 and first["status"] in ("queued", "running")
+    # One worker: the second job waits and can be cancelled before it starts
+    _, second = request(f"{url}/jobs", {"options": {**options, "output": str(tmp_path / "Output" / "b.mp4")}})
+    status, cancelled = request(f"{url}/jobs/{second['id']}/cancel", {})
+    assert status == 202 and cancelled["status"] == "cancelled"
+
+    with urllib.request.urlopen(f"{url}/jobs/{first['id']}/events", timeout=60) as r:
+        stream = r.read().decode()
+    events = [json.loads(line[6:]) for line in stream.splitlines() if line.startswith("data: ")]
+    assert [e["stage"] for e in events if e["kind"] == "stage"] == ["normalize", "concat", "output"]
+    assert events[-1] == {"kind": "end", "status": "done", "message": ""}
+
+    _, done = request(f"{url}/jobs/{first['id']}")
+    assert done["status"] == "done" and done["progress"]["kind"] == "done"
+    assert 0.9 <= probe_duration(Path(done["output"])) <= 1.2
+    with urllib.request.urlopen(f"{url}/jobs/{first['id']}/log") as r:
+        assert "Output #0" in r.read().decode()
+    assert not (tmp_path / "Output" / "b.mp4").exists()
+
+    # The queue is persistent
+    _, listing = request(f"{url}/jobs")
+    assert {j["id"]: j["status"] for j in listing["jobs"]} == {first["id"]: "done", second["id"]: "cancelled"}
+    saved = json.loads((tmp_path / "queue.json").read_text())
+    assert len(saved["jobs"]) == 2
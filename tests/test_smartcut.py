@@ -0,0 +1,121 @@
+"""Unit tests for smart-cut planning and trimming."""
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from src.video_cli import smartcut
+from src.video_cli.pipeline import probe_media
+from src.video_cli.smartcut import CutSegment, codec_parameters, plan_smart_cut, smart_cut
+
+
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0, 8.0]
+
+
+def test_plan_copies_whole_gops_and_encodes_edges():
+    assert plan_smart_cut(KEYFRAMES, 1.5, 6.5, duration=10.0) == [
+        CutSegment(1.5, 2.0, copy=False),
+        CutSegment(2.0, 6.0, copy=True),
+        CutSegment(6.0, 6.5, copy=False),
+    ]
+
+
+def test_plan_cuts_on_keyframes_need_no_encode():
+    assert plan_smart_cut(KEYFRAMES, 2.0, 6.0, duration=10.0) == [CutSegment(2.0, 6.0, copy=True)]
+    # The end of the file is a GOP boundary too
+    assert plan_smart_cut(KEYFRAMES, 4.0, 10.0, duration=10.0) == [CutSegment(4.0, 10.0, copy=True)]
+
+
+def test_plan_within_one_gop_is_encoded():
+    assert plan_smart_cut(KEYFRAMES, 2.5, 3.5, duration=10.0) == [CutSegment(2.5, 3.5, copy=False)]
+    assert plan_smart_cut([], 1.0, 3.0) == [CutSegment(1.0, 3.0, copy=False)]
+
+
+def count_frames(path: Path) -> int:
+    out = subprocess.run(['ffprobe', '-v', 'error', '-count_frames', '-select_streams', 'v',
+                          '-show_entries', 'stream=nb_read_frames', '-of', 'csv=p=0', str(path)],
+                         capture_output=True, text=True, check=True).stdout
+    return int(out.strip())
+
+
+def make_source(path: Path, *encode_args: str, codec: str = 'libx264') -> Path:
+    subprocess.run(['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=320x180:rate=25:duration=6',
+                    '-f', 'lavfi', '-i', 'sine=duration=6', '-c:v', codec, '-g', '25', '-bf', '2',
+                    *encode_args, '-c:a', 'aac', '-shortest', str(path)], check=True)
+    return path
+
+
+def video_stream(path: Path) -> dict:
+    return next(s for s in probe_media(path)['streams'] if s['codec_type'] == 'video')
+
+
+@pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')), reason='ffmpeg/ffprobe not available')
+def test_smart_cut_is_frame_accurate(tmp_path: Path):
+    # Encoded with the edges' rate control, so the edges get the same SPS/PPS
+    src = make_source(tmp_path / 'src.mp4', '-crf', '18', '-preset', 'fast')
+    out = tmp_path / 'cut.mp4'
+    segments = smart_cut(src, 0.6, 4.4, out)
+    assert [s.copy for s in segments] == [False, True, False]
+    assert count_frames(out) == 95
+
+
+@pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')), reason='ffmpeg/ffprobe not available')
+def test_edges_match_the_source_profile(tmp_path: Path):
+    src = make_source(tmp_path / 'src.mp4', '-crf', '18', '-preset', 'fast', '-profile:v', 'baseline')
+    out = tmp_path / 'cut.mp4'
+    assert [s.copy for s in smart_cut(src, 0.6, 4.4, out)] == [False, True, False]
+    assert codec_parameters(probe_media(out)) == codec_parameters(probe_media(src))
+    assert video_stream(out)['profile'] == 'Constrained Baseline' and count_frames(out) == 95
+
+
+@pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')), reason='ffmpeg/ffprobe not available')
+def test_edges_that_cannot_match_reencode_the_range(tmp_path: Path):
+    # Other rate control settings change the PPS, so copied GOPs cannot be joined to the edges
+    src = make_source(tmp_path / 'src.mp4', '-crf', '28', '-preset', 'veryfast', '-profile:v', 'main')
+    out = tmp_path / 'cut.mp4'
+    assert smart_cut(src, 0.6, 4.4, out) == [CutSegment(0.6, 4.4, copy=False)]
+    assert video_stream(out)['profile'] == 'Main' and count_frames(out) == 95
+
+
+class RecordingRunner:
+    """Runs FFmpeg like ``smart_cut``'s default runner, recording each command's outputs."""
+
+    def __init__(self):
+        self.outputs = []
+
+    def __call__(self, cmd, duration, *outputs):
+        self.outputs.append([p.name for p in outputs])
+        subprocess.run(cmd, check=True)
+
+
+@pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')), reason='ffmpeg/ffprobe not available')
+def test_source_without_codec_parameters_is_reencoded_at_once(tmp_path: Path, monkeypatch, caplog):
+    # As probed from Annex B H.264 (e.g. MPEG-TS), whose SPS/PPS are only in-band: nothing to match the edges to
+    def probe_without_extradata(path, catalog=None):
+        info = probe_media(path, catalog)
+        for stream in info['streams']:
+            stream.pop('extradata_hash', None)
+        return info
+
+    monkeypatch.setattr(smartcut, 'probe_media', probe_without_extradata)
+    src = make_source(tmp_path / 'src.mp4', '-crf', '18', '-preset', 'fast')
+    out = tmp_path / 'cut.mp4'
+    runner = RecordingRunner()
+    with caplog.at_level('INFO', logger='src.video_cli.smartcut'):
+        assert smart_cut(src, 0.6, 4.4, out, runner=runner) == [CutSegment(0.6, 4.4, copy=False)]
+    assert runner.outputs == [['cut.mp4']]  # No edges were encoded first
+    assert 'no codec parameters' in caplog.text and count_frames(out) == 95
+
+
+@pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')), reason='ffmpeg/ffprobe not available')
+def test_mismatched_edge_stops_the_splice(tmp_path: Path, caplog):
+    # x265 stores its settings in the extradata, so edges encoded otherwise never match
+    src = make_source(tmp_path / 'src.mp4', '-tag:v', 'hvc1', '-x265-params', 'log-level=error', codec='libx265')
+    out = tmp_path / 'cut.mp4'
+    runner = RecordingRunner()
+    with caplog.at_level('INFO', logger='src.video_cli.smartcut'):
+        assert smart_cut(src, 0.6, 4.4, out, runner=runner) == [CutSegment(0.6, 4.4, copy=False)]
+    # Only the first edge was encoded before falling back
+    assert runner.outputs == [['piece0.mp4'], ['cut.mp4']]
+    assert 'do not reproduce' in caplog.text and count_frames(out) == 95
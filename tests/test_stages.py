@@ -0,0 +1,142 @@
+"""Unit tests for the stage graph executor."""
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.video_cli.ffmpeg_progress import CancelToken, ProcessCancelled
+from src.video_cli.stages import Stage, StageCache, StageGraph, format_plan
+
+
+def write_stage(name, inputs, output, calls, text=None, barrier=None):
+    def run(ctx):
+        calls.append(name)
+        if barrier is not None:
+            barrier.wait(5)  # only passes if the other branch runs at the same time
+        path = ctx.workdir / f"{output}.txt"
+        parts = [ctx[n].read_text() if isinstance(ctx[n], Path) else str(ctx[n]) for n in inputs]
+        path.write_text(text or "+".join(parts))
+        return {output: path}
+    return Stage(name, run, inputs=tuple(inputs), outputs={output: Path}, params={"text": text})
+
+
+def diamond(calls, barrier=None, text="a"):
+    graph = StageGraph()
+    graph.add(write_stage("join", ["left", "right"], "joined", calls))
+    graph.add(write_stage("left", ["src"], "left", calls, barrier=barrier))
+    graph.add(write_stage("right", ["src"], "right", calls, text=text, barrier=barrier))
+    return graph
+
+
+def test_independent_branches_run_concurrently(tmp_path: Path):
+    calls = []
+    graph = diamond(calls, threading.Barrier(2))
+    artifacts = graph.run({"src": 7}, tmp_path, jobs=2)
+    assert artifacts["joined"].read_text() == "7+a"
+    assert calls[-1] == "join" and set(calls[:2]) == {"left", "right"}
+
+
+def test_memoized_by_input_keys(tmp_path: Path):
+    cache = StageCache(tmp_path / "cache")
+    calls = []
+    diamond(calls).run({"src": 7}, tmp_path, cache=cache)
+    assert len(calls) == 3
+
+    calls.clear()
+    plan = diamond(calls).plan({"src": 7}, cache)
+    assert all(p.cached for p in plan) and "3 stages, 3 cached, 0 to run" in format_plan(plan)
+    artifacts = diamond(calls).run({"src": 7}, tmp_path, cache=cache)
+    assert calls == [] and artifacts["joined"].read_text() == "7+a"
+
+    # A changed parameter reruns that stage and everything downstream of it
+    assert [p.cached for p in diamond(calls, text="b").plan({"src": 7}, cache)] == [True, False, False]
+    diamond(calls, text="b").run({"src": 7}, tmp_path, cache=cache)
+    assert sorted(calls) == ["join", "right"]
+
+
+def test_source_files_keyed_by_fingerprint(tmp_path: Path):
+    cache = StageCache(tmp_path / "cache")
+    src = tmp_path / "src.txt"
+    src.write_text("one")
+    graph = StageGraph()
+    graph.add(write_stage("copy", ["src"], "copy", []))
+    assert not graph.plan({"src": src}, cache)[0].cached
+    graph.run({"src": src}, tmp_path, cache=cache)
+    assert graph.plan({"src": src}, cache)[0].cached
+    src.write_text("two!")
+    assert not graph.plan({"src": src}, cache)[0].cached
+
+
+def test_failure_cancels_and_caches_nothing(tmp_path: Path):
+    cache = StageCache(tmp_path / "cache")
+
+    def fail(ctx):
+        raise RuntimeError("boom")
+
+    graph = StageGraph()
+    graph.add(Stage("fail", fail, inputs=("src",), outputs={"x": Path}))
+    graph.add(write_stage("after", ["x"], "y", []))
+    with pytest.raises(RuntimeError, match="boom"):
+        graph.run({"src": 1}, tmp_path, cache=cache)
+    assert list((tmp_path / "cache").iterdir()) == []
+
+
+def test_cancelled_before_start(tmp_path: Path):
+    token = CancelToken()
+    token.cancel()
+    calls = []
+    with pytest.raises(ProcessCancelled):
+        diamond(calls).run({"src": 1}, tmp_path, cancel=token)
+    assert calls == []
+
+
+def test_graph_errors(tmp_path: Path):
+    graph = StageGraph()
+    graph.add(write_stage("a", ["b_out"], "a_out", []))
+    graph.add(write_stage("b", ["a_out"], "b_out", []))
+    with pytest.raises(ValueError, match="cycle"):
+        graph.order({})
+    lonely = StageGraph()
+    lonely.add(write_stage("c", ["missing_input"], "c_out", []))
+    with pytest.raises(ValueError, match="missing_input"):
+        lonely.order({})
+    with pytest.raises(ValueError, match="produced by both"):
+        graph.add(write_stage("d", [], "a_out", []))
+
+
+def test_outputs_are_type_checked(tmp_path: Path):
+    graph = StageGraph()
+    graph.add(Stage("bad", lambda ctx: {"x": "not a path"}, outputs={"x": Path}))
+    with pytest.raises(TypeError, match="not a Path"):
+        graph.run({}, tmp_path)
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path):
+    cache = StageCache(tmp_path / "cache", max_bytes=1500)
+    for i in range(3):
+        workdir = cache.workdir(f"k{i}")
+        (workdir / "data").write_bytes(b"x" * 600)
+        cache.put(f"k{i}", workdir, {"data": workdir / "data"})
+    assert cache.get("k0") is None and cache.get("k2") is not None
+
+
+def test_running_graph_is_not_evicted(tmp_path: Path):
+    # Three 600-byte results and their join exceed the cap before the join has read them
+    cache = StageCache(tmp_path / "cache", max_bytes=1500)
+
+    def big(name):
+        def run(ctx):
+            path = ctx.workdir / f"{name}.bin"
+            path.write_bytes(name.encode() * 600)
+            return {name: path}
+        return Stage(name, run, inputs=("src",), outputs={name: Path})
+
+    graph = StageGraph()
+    for name in "abc":
+        graph.add(big(name))
+    graph.add(write_stage("join", ["a", "b", "c"], "joined", []))
+    artifacts = graph.run({"src": 1}, tmp_path, cache=cache, jobs=1)
+    assert artifacts["joined"].read_text() == "+".join(name * 600 for name in "abc")
+    # Once the run is over the cap applies again
+    assert len(cache.evict()) >= 2
+    assert sum(p.stat().st_size for p in (tmp_path / "cache").rglob("*") if p.is_file()) <= 1500
@@ -0,0 +1,98 @@
+"""Startup cost of the Tk front ends."""
+import importlib.util
+import io
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from src.video_cli.startup import StartupTimer
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = ('cv2', 'numpy', 'PIL', 'pygame')
+TIME_TO_WINDOW_BUDGET = 3.0  # seconds, from interpreter launch to the window being mapped
+
+HAS_TK = importlib.util.find_spec('tkinter') is not None
+
+needs_tk = pytest.mark.skipif(not HAS_TK, reason='tkinter not available')
+
+
+@pytest.fixture(scope='module')
+def display():
+    """Environment for a Tk window: the current display, or a private Xvfb server on headless Linux."""
+    if not HAS_TK:
+        pytest.skip('tkinter not available')
+    if not sys.platform.startswith('linux') or os.environ.get('DISPLAY'):
+        yield {}
+        return
+    if shutil.which('Xvfb') is None:
+        pytest.skip('no display and Xvfb is not installed')
+    read_fd, write_fd = os.pipe()
+    server = subprocess.Popen(['Xvfb', '-displayfd', str(write_fd), '-screen', '0', '1280x800x24', '-nolisten', 'tcp'],
+                              pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        number = f.readline().strip()
+    try:
+        if not number:
+            pytest.skip('Xvfb did not start')
+        yield {'DISPLAY': f':{number}'}
+    finally:
+        server.terminate()
+        server.wait(10)
+
+
+def run_python(code: str, tmp_path: Path, env_extra=None) -> subprocess.CompletedProcess:
+    env = dict(os.environ, VIDEO_CLI_CACHE_DIR=str(tmp_path), **(env_extra or {}))
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, timeout=60, check=True)
+
+
+def test_timer_reports_phases():
+    out = io.StringIO()
+    timer = StartupTimer(enabled=True, stream=out)
+    timer.marks = [('Tk', 0.010), ('widgets', 0.150)]
+    timer.emit()
+    assert out.getvalue() == 'startup: Tk 10 ms, widgets 140 ms (total 150 ms)\n'
+    StartupTimer(enabled=False, stream=out).emit()
+    assert out.getvalue().count('\n') == 1
+
+
+@needs_tk
+@pytest.mark.parametrize('module', ['app_gui', 'gui'])
+def test_import_does_not_load_heavy_modules(module, tmp_path: Path):
+    result = run_python(f'import sys, {module}; print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))',
+                        tmp_path)
+    assert result.stdout.strip() == ''
+
+
+@pytest.mark.parametrize('module, cls', [('app_gui', 'VideoEditorGUI'), ('gui', 'VideoCLIGUI')])
+def test_builds_against_withdrawn_root(module, cls, tmp_path: Path, display):
+    code = (
+        f'import tkinter as tk, {module}\n'
+        'root = tk.Tk()\n'
+        'root.withdraw()\n'
+        f'app = {module}.{cls}(root)\n'
+        'root.update_idletasks()\n'
+        'getattr(app, "on_closing", root.destroy)()\n'
+    )
+    run_python(code, tmp_path, display)
+
+
+@pytest.mark.parametrize('module, cls', [('app_gui', 'VideoEditorGUI'), ('gui', 'VideoCLIGUI')])
+def test_time_to_window(module, cls, tmp_path: Path, display):
+    code = (
+        f'import tkinter as tk, {module}\n'
+        'root = tk.Tk()\n'
+        f'app = {module}.{cls}(root)\n'
+        'close = getattr(app, "on_closing", root.destroy)\n'
+        'root.bind("<Map>", lambda e: e.widget is root and root.after(0, close))\n'
+        'root.mainloop()\n'
+    )
+    start = time.perf_counter()
+    run_python(code, tmp_path, display)
+    assert time.perf_counter() - start < TIME_TO_WINDOW_BUDGET
@@ -0,0 +1,84 @@
+"""Tests for choosing the normalization target from the input clips."""
+from pathlib import Path
+
+import pytest
+
+from src.video_cli.pipeline import normalize_cmd
+from src.video_cli.targets import (AUDIO, COPY, TRANSCODE, Caps, ClipFormat, NormalizeTarget, action_for,
+                                   parse_size, plan_actions, plan_target)
+
+
+def probe(width=1280, height=720, rate="25/1", avg=None, pix_fmt="yuv420p", codec="h264",
+          audio=(48000, 2, "aac"), profile="High", level=31, extradata="md5:0123", **video):
+    streams = [{"codec_type": "video", "codec_name": codec, "width": width, "height": height, "pix_fmt": pix_fmt,
+                "r_frame_rate": rate, "avg_frame_rate": avg or rate, "sample_aspect_ratio": "1:1",
+                "profile": profile, "level": level, "extradata_hash": extradata, **video}]
+    if audio:
+        streams.append({"codec_type": "audio", "codec_name": audio[2], "sample_rate": str(audio[0]),
+                        "channels": audio[1]})
+    return ClipFormat.from_probe({"streams": streams})
+
+
+def test_majority_format_is_kept():
+    clips = [probe(), probe(), probe(), probe(1920, 1080, "30/1")]
+    target = plan_target(clips)
+    assert target == NormalizeTarget(1280, 720, "25", "yuv420p", 48000, 2)
+    assert [action_for(c, target) for c in clips] == [COPY, COPY, COPY, TRANSCODE]
+    # Copied video is only joined to video encoded alike, so one odd clip transcodes the batch
+    assert plan_actions(clips, target) == [TRANSCODE] * 4
+    assert plan_actions(clips[:3], target) == [COPY] * 3
+
+
+def test_caps_are_upper_bounds():
+    target = plan_target([probe(3840, 2160, "60/1"), probe(3840, 2160, "60/1"), probe(1280, 720, "50/1")])
+    assert (target.width, target.height, target.fps) == (1920, 1080, "30")
+    # Rates above the cap are halved rather than resampled
+    assert plan_target([probe(rate="50/1")], Caps(max_fps=30)).fps == "25"
+    assert plan_target([probe(rate="30000/1001")], Caps(max_fps=30)).fps == "30000/1001"
+    assert plan_target([probe()], Caps(max_width=640, max_height=360)).width == 640
+
+
+def test_only_audio_reencoded_when_video_matches():
+    clips = [probe(), probe(), probe(audio=(44100, 1, "mp3"))]
+    target = plan_target(clips)
+    assert (target.sample_rate, target.channels) == (48000, 2)
+    assert action_for(clips[2], target) == AUDIO
+    assert action_for(probe(audio=None), target) == COPY
+    assert plan_actions(clips, target) == [COPY, COPY, AUDIO]
+
+
+def test_clips_that_cannot_be_copied():
+    target = plan_target([probe()])
+    for clip in (probe(avg="24/1"),  # variable frame rate
+                 probe(side_data_list=[{"rotation": -90}]),
+                 probe(codec="hevc"),
+                 probe(pix_fmt="yuv422p10le"),
+                 None):
+        assert action_for(clip, target) == TRANSCODE
+    assert plan_target([]) == NormalizeTarget(1920, 1080, "30")
+
+
+def test_clips_encoded_differently_are_transcoded():
+    target = plan_target([probe()])
+    for odd in (probe(profile="Constrained Baseline"), probe(level=40), probe(extradata="md5:4567")):
+        assert action_for(odd, target) == COPY
+        assert plan_actions([probe(), odd], target) == [TRANSCODE, TRANSCODE]
+    # Without the codec parameters there is no telling whether clips match
+    assert plan_actions([probe(extradata=""), probe(extradata="")], target) == [TRANSCODE, TRANSCODE]
+
+
+def test_normalize_cmd_by_action(tmp_path: Path):
+    target = NormalizeTarget(1280, 720, "25", "yuv420p", 48000, 2)
+    src, out = tmp_path / "in.mov", tmp_path / "out.mp4"
+    assert normalize_cmd(src, out, target, COPY)[-4:] == ["0:a:0?", "-c", "copy", str(out)]
+    assert "-c:v" in normalize_cmd(src, out, target, AUDIO) and "-vf" not in normalize_cmd(src, out, target, AUDIO)
+    cmd = normalize_cmd(src, out, target, TRANSCODE)
+    assert "pad=1280:720" in cmd[cmd.index("-vf") + 1] and "fps=25" in cmd[cmd.index("-vf") + 1]
+    assert cmd[cmd.index("-ar") + 1] == "48000"
+    assert "-qp" in normalize_cmd(src, out, target, TRANSCODE, encoder="lossless")
+
+
+def test_parse_size():
+    assert parse_size("1280x720") == (1280, 720)
+    with pytest.raises(ValueError):
+        parse_size("720p")
@@ -0,0 +1,21 @@
+"""Unit tests for background timeline analysis."""
+from pathlib import Path
+
+from src.video_cli.timeline import TimelineAnalyzer, filmstrip_times
+
+
+def test_filmstrip_times_are_slice_midpoints():
+    assert filmstrip_times(10.0, 4) == [1.25, 3.75, 6.25, 8.75]
+    assert filmstrip_times(0.0, 3) == [0.0]
+    assert filmstrip_times(5.0, 0) == []
+
+
+def test_analyzer_reports_errors_as_events(tmp_path: Path):
+    """Failures surface on the event queue instead of raising in the pool."""
+    analyzer = TimelineAnalyzer(max_workers=1)
+    missing = tmp_path / 'missing.mp4'
+    analyzer.submit([missing, missing])
+    analyzer._pool.shutdown(wait=True)
+    events = analyzer.drain()
+    assert [e[0] for e in events] == ['error', 'error']
+    assert all(e[1] == missing for e in events)
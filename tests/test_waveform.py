@@ -0,0 +1,72 @@
+"""Unit tests for waveform peak pyramids."""
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.video_cli.waveform import PeakPyramid, build_levels, build_peak_pyramid
+
+
+def make_pyramid(samples, base_block=4, factor=2, sample_rate=8):
+    blocks = samples[:len(samples) - len(samples) % base_block].reshape(-1, base_block)
+    mins, maxs = build_levels(blocks.min(axis=1), blocks.max(axis=1), factor)
+    return PeakPyramid(sample_rate, base_block, factor, mins, maxs)
+
+
+def test_levels_reduce_to_single_block():
+    mins, maxs = build_levels(np.array([-1, -5, -2], dtype=np.int16), np.array([3, 1, 7], dtype=np.int16), 2)
+    assert [len(m) for m in mins] == [3, 2, 1]
+    assert mins[-1][0] == -5 and maxs[-1][0] == 7
+
+
+def test_peaks_keep_extremes_at_every_zoom():
+    samples = np.zeros(8 * 64, dtype=np.int16)
+    samples[100] = 32000
+    samples[300] = -32000
+    pyramid = make_pyramid(samples)
+    for columns in (1, 4, 16, 128):
+        mins, maxs = pyramid.peaks(0.0, pyramid.duration, columns)
+        assert len(mins) == columns
+        assert maxs.max() == pytest.approx(32000 / 32768)
+        assert mins.min() == pytest.approx(-32000 / 32768)
+
+
+def test_peaks_outside_audio_are_silent():
+    pyramid = make_pyramid(np.full(64, 1000, dtype=np.int16))
+    mins, maxs = pyramid.peaks(-8.0, 0.0, 10)
+    assert not maxs.any() and not mins.any()
+    mins, maxs = pyramid.peaks(-pyramid.duration, pyramid.duration, 2)
+    assert maxs[0] == 0 and maxs[1] > 0
+
+
+def test_save_and_load_round_trip(tmp_path: Path):
+    pyramid = make_pyramid(np.arange(-512, 512, dtype=np.int16))
+    pyramid.save(tmp_path / 'peaks.npz')
+    loaded = PeakPyramid.load(tmp_path / 'peaks.npz')
+    assert loaded.base_block == pyramid.base_block and len(loaded.mins) == len(pyramid.mins)
+    assert all(np.array_equal(a, b) for a, b in zip(loaded.maxs, pyramid.maxs))
+
+
+@pytest.mark.skipif(not shutil.which('ffmpeg'), reason='ffmpeg not available')
+def test_build_from_ffmpeg(tmp_path: Path):
+    import subprocess
+
+    tone = tmp_path / 'tone.wav'
+    subprocess.run(['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', 'sine=frequency=440:duration=2',
+                    str(tone)], check=True)
+    pyramid = build_peak_pyramid(tone, sample_rate=8000, base_block=64)
+    assert pyramid.duration == pytest.approx(2.0, abs=0.02)
+    mins, maxs = pyramid.peaks(0.0, 2.0, 50)
+    assert (maxs > 0.05).all() and (mins < -0.05).all()
+
+
+@pytest.mark.skipif(shutil.which("sh") is None, reason="needs a POSIX shell")
+def test_chatty_decoder_does_not_deadlock(tmp_path: Path, monkeypatch):
+    # Far more stderr than a pipe buffer holds, written before any samples
+    fake = tmp_path / "ffmpeg"
+    fake.write_text("#!/bin/sh\nhead -c 1000000 /dev/zero | tr '\\0' x >&2\nhead -c 16000 /dev/zero\n")
+    fake.chmod(0o755)
+    monkeypatch.setattr("src.video_cli.waveform.FFMPEG", str(fake))
+    pyramid = build_peak_pyramid(tmp_path / "any.mp4", sample_rate=8000, base_block=64)
+    assert pyramid.duration == pytest.approx(1.0, abs=0.01)